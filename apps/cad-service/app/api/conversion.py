@@ -1,24 +1,53 @@
 """
 CAD File Conversion API
 Supports STEP, IGES to STL/OBJ conversion using OpenCASCADE
+
+Uploads up to SYNC_CONVERT_MAX_BYTES are converted within the request. Larger
+ones (or any with mode=async) become Celery jobs: POST /convert returns a task
+id, GET /convert/jobs/{task_id} reports progress and
+GET /convert/jobs/{task_id}/download serves the result. Both paths share the
+result store, keyed by (file hash, format, linear/angular deflection).
+
+Async jobs hand the upload to the worker through the result store, so they
+need a store every host can see: RESULT_CACHE_BACKEND=redis, or a disk store
+on a shared volume with RESULT_CACHE_SHARED=1. Without one, async requests
+are refused with 503.
 """
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+import asyncio
+import hashlib
 import tempfile
+import threading
 import os
+import shutil
+import struct
 from pathlib import Path
 import logging
-from typing import Literal
-import io
+from typing import Iterator, Literal, Optional, Tuple
+
+import numpy as np
+
+from ..loaders.triangulation import (
+    AUTO_ANGULAR_DEFLECTION,
+    TessellationCancelled,
+    auto_tessellate,
+    iter_face_meshes,
+    mesh_shape as tessellate,
+    triangle_count,
+)
+from ..utils.result_cache import ResultStore, build_result_key, get_result_store
+from ..utils.singleflight import run_once_sync
+from ..workers.celery import celery_app
+from ..workers.routing import MemoryBudgetExceeded, route_for_source
 
 try:
     from OCC.Core.STEPControl import STEPControl_Reader
     from OCC.Core.IGESControl import IGESControl_Reader
-    from OCC.Core.StlAPI import StlAPI_Writer
     from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
     from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Transform
-    from OCC.Extend.DataExchange import write_stl_file, write_obj_file
     from OCC.Core.gp import gp_Trsf, gp_Pnt
     from OCC.Core.Bnd import Bnd_Box
     from OCC.Core.BRepBndLib import brepbndlib_Add
@@ -30,14 +59,54 @@ except ImportError:
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+OUTPUT_CHUNK_BYTES = 1024 * 1024
+STL_HEADER = b"cad-service binary STL".ljust(80, b" ")
+# Binary STL triangle record: normal, three vertices, attribute byte count (50 bytes, unpadded)
+STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+SYNC_CONVERT_MAX_BYTES = int(os.getenv("SYNC_CONVERT_MAX_BYTES", str(20 * 1024 * 1024)))
+MEDIA_TYPES = {"stl": "application/sla", "obj": "text/plain"}
+# Triangle budgets when the deflection is sized to the part (no explicit linear_deflection)
+QUALITY_TRIANGLE_BUDGET = {"low": 100_000, "medium": 400_000, "high": 1_500_000}
+DEFAULT_ANGULAR_DEFLECTION = 0.1  # with an explicit linear deflection, as before auto-tuning
+DISCONNECT_POLL_S = 0.5
+
+
+def resolve_angular_deflection(linear_deflection: Optional[float], angular_deflection: Optional[float]) -> float:
+    if angular_deflection is not None:
+        return angular_deflection
+    return AUTO_ANGULAR_DEFLECTION if linear_deflection is None else DEFAULT_ANGULAR_DEFLECTION
+
+
+def conversion_cache_key(
+    file_sha: str,
+    output_format: str,
+    linear_deflection: Optional[float],
+    angular_deflection: float,
+    quality: str = "medium",
+) -> str:
+    if linear_deflection is None:
+        return build_result_key("convert", file_sha, output_format, f"auto-{quality}", angular_deflection)
+    return build_result_key("convert", file_sha, output_format, linear_deflection, angular_deflection)
+
+
+def source_cache_key(file_sha: str) -> str:
+    return build_result_key("convert-source", file_sha)
+
+
+def cancel_flag_key(task_id: str) -> str:
+    return f"convert-cancel-{task_id}"
+
 
 @router.post("/convert")
 async def convert_cad_file(
+    request: Request,
     file: UploadFile = File(...),
     output_format: Literal["stl", "obj"] = Form("stl"),
     quality: Literal["low", "medium", "high"] = Form("medium"),
-    linear_deflection: float = Form(0.1),
-    angular_deflection: float = Form(0.1),
+    linear_deflection: Optional[float] = Form(None),
+    angular_deflection: Optional[float] = Form(None),
+    mode: Literal["auto", "sync", "async"] = Form("auto"),
 ):
     """
     Convert STEP/IGES files to STL/OBJ format
@@ -45,12 +114,15 @@ async def convert_cad_file(
     Args:
         file: CAD file (STEP, STP, IGES, IGS)
         output_format: Target format (stl or obj)
-        quality: Quality preset (low, medium, high)
-        linear_deflection: Linear deflection for tessellation (smaller = higher quality)
+        quality: Quality preset (low, medium, high); sets the triangle budget when
+            linear_deflection is omitted
+        linear_deflection: Linear deflection for tessellation (smaller = higher quality);
+            omitted = sized to the part's bounding box and the quality budget
         angular_deflection: Angular deflection for tessellation (smaller = higher quality)
+        mode: sync, async, or auto (async above SYNC_CONVERT_MAX_BYTES)
     
     Returns:
-        Converted file in requested format
+        Converted file in requested format, or 202 with a job id in async mode
     """
     if not HAS_OCC:
         raise HTTPException(
@@ -66,17 +138,40 @@ async def convert_cad_file(
             detail="Unsupported file format. Only STEP and IGES files are supported."
         )
     
+    temp_input_path = None
     try:
-        # Save uploaded file to temp directory
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(filename).suffix) as temp_input:
-            content = await file.read()
-            temp_input.write(content)
-            temp_input_path = temp_input.name
-        
+        # Spool the upload to disk in chunks, hashing as it goes
+        temp_input_path, file_sha = await spool_upload(file, Path(filename).suffix)
+        file_size = os.path.getsize(temp_input_path)
+
+        media_type = MEDIA_TYPES[output_format]
+        filename_out = f"{Path(filename).stem}.{output_format}"
+        headers = {"Content-Disposition": f'attachment; filename="{filename_out}"'}
+
+        # Identical uploads with identical tessellation settings reuse the cached output
+        angular_deflection = resolve_angular_deflection(linear_deflection, angular_deflection)
+        store = get_result_store()
+        cache_key = conversion_cache_key(file_sha, output_format, linear_deflection, angular_deflection, quality)
+        cached = cached_response(store, cache_key, media_type, headers)
+        if cached is not None:
+            logger.info(f"Conversion cache hit: {filename} -> {filename_out}")
+            return cached
+
+        if mode == "async" or (mode == "auto" and file_size > SYNC_CONVERT_MAX_BYTES):
+            return await submit_conversion(
+                temp_input_path, file_sha, file_size, filename_out, output_format,
+                linear_deflection, angular_deflection, quality,
+            )
+        if file_size > SYNC_CONVERT_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Files over {SYNC_CONVERT_MAX_BYTES} bytes must be converted with mode=async",
+            )
+
         logger.info(f"Converting {filename} to {output_format} (quality: {quality})")
         
         # Read CAD file
-        shape = read_cad_file(temp_input_path)
+        shape = await run_in_threadpool(read_cad_file, temp_input_path)
         
         if shape is None:
             raise HTTPException(
@@ -84,36 +179,27 @@ async def convert_cad_file(
                 detail="Failed to read CAD file. File may be corrupted or invalid."
             )
         
-        # Tessellate (convert to mesh)
-        mesh_shape(shape, linear_deflection, angular_deflection)
-        
-        # Convert to target format
-        output_buffer = io.BytesIO()
+        # Tessellate (convert to mesh); abandoned if the client goes away
+        try:
+            await mesh_until_disconnect(request, shape, linear_deflection, angular_deflection, quality)
+        except TessellationCancelled:
+            logger.info(f"Client disconnected, conversion of {filename} cancelled")
+            return Response(status_code=499)
         
+        # Output is generated face by face while it is sent, and copied into the cache on the way
         if output_format == "stl":
-            write_stl_to_buffer(shape, output_buffer)
-            media_type = "application/sla"
-            filename_out = f"{Path(filename).stem}.stl"
+            count = await run_in_threadpool(triangle_count, shape)
+            chunks = stream_stl(shape, count)
+            headers["Content-Length"] = str(len(STL_HEADER) + 4 + count * STL_RECORD.itemsize)
         else:  # obj
-            write_obj_to_buffer(shape, output_buffer)
-            media_type = "text/plain"
-            filename_out = f"{Path(filename).stem}.obj"
+            chunks = stream_obj(shape)
         
-        # Cleanup
-        os.unlink(temp_input_path)
-        
-        # Return as streaming response
-        output_buffer.seek(0)
-        
-        logger.info(f"Conversion complete: {filename} -> {filename_out}")
+        logger.info(f"Streaming conversion: {filename} -> {filename_out}")
         
         return StreamingResponse(
-            output_buffer,
+            cache_through(chunks, store, cache_key),
             media_type=media_type,
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename_out}"',
-                "X-Conversion-Time": "calculated-by-backend",
-            }
+            headers={**headers, "X-Conversion-Cache": "miss"},
         )
         
     except HTTPException:
@@ -124,6 +210,272 @@ async def convert_cad_file(
             status_code=500,
             detail=f"Conversion failed: {str(e)}"
         )
+    finally:
+        # The shape is in memory by now; the upload is no longer needed
+        if temp_input_path:
+            remove_quietly(temp_input_path)
+
+
+async def submit_conversion(
+    input_path: str,
+    file_sha: str,
+    file_size: int,
+    filename_out: str,
+    output_format: str,
+    linear_deflection: Optional[float],
+    angular_deflection: Optional[float],
+    quality: str,
+) -> JSONResponse:
+    """Hand a conversion to the Celery workers; the upload travels through the result store."""
+    store = get_result_store()
+    if not store.shared:
+        # A per-container /tmp store would leave the worker without the upload
+        raise HTTPException(
+            status_code=503,
+            detail="Async conversion needs a shared result store "
+                   "(RESULT_CACHE_BACKEND=redis or RESULT_CACHE_SHARED=1 on a shared volume)",
+        )
+    try:
+        route = route_for_source(input_path, None, file_size)
+    except MemoryBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if not store.exists(source_cache_key(file_sha)):
+        try:
+            await run_in_threadpool(store.put_file, source_cache_key(file_sha), input_path)
+        except ValueError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    task = convert_file.apply_async(
+        (file_sha, Path(input_path).suffix, output_format, linear_deflection, angular_deflection, filename_out, quality),
+        **route,
+    )
+    logger.info(f"Queued conversion {task.id}: {filename_out}")
+    return JSONResponse(
+        status_code=202,
+        content={
+            "task_id": task.id,
+            "status": "queued",
+            "status_url": f"/api/convert/jobs/{task.id}",
+            "download_url": f"/api/convert/jobs/{task.id}/download",
+        },
+    )
+
+
+@celery_app.task(bind=True)
+def convert_file(
+    self,
+    file_sha: str,
+    suffix: str,
+    output_format: str,
+    linear_deflection: Optional[float],
+    angular_deflection: Optional[float],
+    filename_out: str,
+    quality: str = "medium",
+):
+    """Convert an uploaded source from the result store and cache the output."""
+    store = get_result_store()
+    cache_key = conversion_cache_key(file_sha, output_format, linear_deflection, angular_deflection, quality)
+    result = {"cache_key": cache_key, "filename": filename_out, "format": output_format}
+
+    def compute() -> dict:
+        if store.exists(cache_key):
+            return result
+        input_path, temporary = materialize_source(store, file_sha, suffix)
+        try:
+            self.update_state(state="PROGRESS", meta={"stage": "reading"})
+            shape = read_cad_file(input_path)
+        finally:
+            if temporary:
+                remove_quietly(input_path)
+        if shape is None:
+            raise ValueError("Failed to read CAD file. File may be corrupted or invalid.")
+
+        def report(done: int, total: int) -> None:
+            self.update_state(state="PROGRESS", meta={"stage": "meshing", "faces_done": done, "faces_total": total})
+
+        self.update_state(state="PROGRESS", meta={"stage": "meshing"})
+        mesh_shape(
+            shape, linear_deflection, angular_deflection, quality,
+            progress=report, cancelled=lambda: store.exists(cancel_flag_key(self.request.id)),
+        )
+        self.update_state(state="PROGRESS", meta={"stage": "writing"})
+        chunks = stream_stl(shape, triangle_count(shape)) if output_format == "stl" else stream_obj(shape)
+        for _ in cache_through(chunks, store, cache_key):
+            pass
+        return result
+
+    try:
+        # Concurrent jobs for the same output wait for the first instead of meshing again
+        return run_once_sync(f"convert:{cache_key}", compute, ready=lambda: result if store.exists(cache_key) else None)
+    except TessellationCancelled as e:
+        logger.info(f"Conversion job {self.request.id} cancelled: {str(e)}")
+        return {"error": "Conversion cancelled", "cancelled": True}
+    except Exception as e:
+        logger.error(f"Conversion job failed: {str(e)}", exc_info=True)
+        return {"error": str(e)}
+
+
+def materialize_source(store: ResultStore, file_sha: str, suffix: str) -> Tuple[str, bool]:
+    """Local path of a stored upload; the flag says whether it is a temp copy to delete."""
+    key = source_cache_key(file_sha)
+    path = store.local_path(key)
+    if path is not None and path.suffix.lower() == suffix.lower():
+        return str(path), False
+    # Readers dispatch on the extension, so copy the blob to a temp file that has one
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        if path is not None:
+            with open(path, "rb") as src:
+                shutil.copyfileobj(src, tmp, UPLOAD_CHUNK_BYTES)
+        elif not store.copy_to(key, tmp):
+            remove_quietly(tmp.name)
+            raise ValueError("Uploaded source is no longer available; resubmit the conversion")
+    return tmp.name, True
+
+
+def job_result(task) -> Optional[dict]:
+    """Outcome of a finished job, None while it runs.
+
+    Revoked jobs (cancelled while queued) and jobs whose task raised or whose
+    worker died (e.g. recycled over its memory ceiling) become error results
+    instead of re-raising from ``task.get()``.
+    """
+    if not task.ready():
+        return None
+    if task.state == "REVOKED":
+        return {"error": "Conversion cancelled", "cancelled": True}
+    if not task.successful():
+        return {"error": f"Conversion job failed: {task.result!r}"}
+    result = task.result
+    return result if isinstance(result, dict) else {"error": "Conversion job returned no result"}
+
+
+@router.get("/convert/jobs/{task_id}")
+async def conversion_status(task_id: str):
+    """Status of an async conversion job"""
+    task = convert_file.AsyncResult(task_id)
+    body = {"task_id": task_id, "status": task.state.lower()}
+    if task.state == "PROGRESS" and isinstance(task.info, dict):
+        body.update(task.info)
+    result = job_result(task)
+    if result is not None:
+        if "error" in result:
+            body.update(status="cancelled" if result.get("cancelled") else "failed", error=result["error"])
+        else:
+            body.update(status="done", download_url=f"/api/convert/jobs/{task_id}/download")
+    return body
+
+
+@router.delete("/convert/jobs/{task_id}")
+async def cancel_conversion(task_id: str):
+    """Cancel an async conversion job; a running job stops at its next face batch"""
+    try:
+        get_result_store().put(cancel_flag_key(task_id), b"1")
+    except Exception as e:
+        logger.warning(f"Failed to flag conversion {task_id} for cancellation: {str(e)}")
+    # Jobs still in the queue are dropped by the workers
+    celery_app.control.revoke(task_id)
+    return {"task_id": task_id, "status": "cancelling"}
+
+
+@router.get("/convert/jobs/{task_id}/download")
+async def download_conversion(task_id: str):
+    """Converted file of a finished async job"""
+    task = convert_file.AsyncResult(task_id)
+    result = job_result(task)
+    if result is None:
+        raise HTTPException(status_code=202, detail="Conversion in progress")
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    response = cached_response(
+        get_result_store(),
+        result["cache_key"],
+        MEDIA_TYPES[result["format"]],
+        {"Content-Disposition": f'attachment; filename="{result["filename"]}"'},
+    )
+    if response is None:
+        raise HTTPException(status_code=410, detail="Converted file has expired from the cache; resubmit")
+    return response
+
+
+async def mesh_until_disconnect(
+    request: Request,
+    shape,
+    linear_deflection: Optional[float],
+    angular_deflection: Optional[float],
+    quality: str,
+) -> None:
+    """Mesh in the threadpool while watching the connection; raises TessellationCancelled on disconnect."""
+    disconnected = threading.Event()
+
+    async def watch() -> None:
+        while not disconnected.is_set():
+            if await request.is_disconnected():
+                disconnected.set()
+                return
+            await asyncio.sleep(DISCONNECT_POLL_S)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        await run_in_threadpool(
+            mesh_shape, shape, linear_deflection, angular_deflection, quality, cancelled=disconnected.is_set
+        )
+    finally:
+        watcher.cancel()
+
+
+async def spool_upload(file: UploadFile, suffix: str) -> Tuple[str, str]:
+    """Copy an upload to a temp file in chunks; returns (path, sha256)."""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            tmp.write(chunk)
+            digest.update(chunk)
+    return tmp.name, digest.hexdigest()
+
+
+def remove_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def cached_response(store: ResultStore, cache_key: str, media_type: str, headers: dict):
+    """Serve a cached conversion from disk when possible; None on a miss."""
+    headers = {**headers, "X-Conversion-Cache": "hit"}
+    try:
+        path = store.local_path(cache_key)
+    except Exception:
+        path = None
+    if path is not None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    data = store.get(cache_key)
+    if data is None:
+        return None
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+def cache_through(chunks: Iterator[bytes], store: ResultStore, cache_key: str) -> Iterator[bytes]:
+    """Pass chunks through to the client while spooling them for the result store.
+    Only a fully sent output is cached; a disconnect discards the spool.
+    """
+    fd, spool_path = tempfile.mkstemp(suffix=".convert")
+    complete = False
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+                yield chunk
+        complete = True
+    finally:
+        if complete:
+            try:
+                store.put_file(cache_key, spool_path)
+            except Exception as e:
+                logger.warning(f"Failed to cache conversion output: {str(e)}")
+        remove_quietly(spool_path)
 
 
 def read_cad_file(file_path: str):
@@ -164,78 +516,89 @@ def read_cad_file(file_path: str):
         return None
 
 
-def mesh_shape(shape, linear_deflection: float, angular_deflection: float):
+def mesh_shape(
+    shape,
+    linear_deflection: Optional[float],
+    angular_deflection: Optional[float],
+    quality: str = "medium",
+    *,
+    progress=None,
+    cancelled=None,
+):
     """
     Tessellate shape (convert to triangular mesh)
     
     Args:
         shape: OpenCASCADE shape
-        linear_deflection: Maximum distance between mesh and actual surface (mm)
+        linear_deflection: Maximum distance between mesh and actual surface (mm);
+            None sizes it to the bounding-box diagonal and the quality's triangle budget
         angular_deflection: Maximum angular deviation (radians)
+        quality: Quality preset, used only when linear_deflection is None
+        progress: Optional callback(faces_done, faces_total)
+        cancelled: Optional check; meshing stops with TessellationCancelled when it returns True
     """
+    angular_deflection = resolve_angular_deflection(linear_deflection, angular_deflection)
     try:
-        # Create incremental mesh
-        mesh = BRepMesh_IncrementalMesh(
-            shape,
-            linear_deflection,
-            False,  # relative
-            angular_deflection,
-            True    # in parallel
-        )
-        mesh.Perform()
-        
-        if not mesh.IsDone():
-            logger.warning("Mesh generation incomplete")
-        
+        if linear_deflection is None:
+            plan = auto_tessellate(
+                shape, QUALITY_TRIANGLE_BUDGET[quality],
+                angular_deflection=angular_deflection, progress=progress, cancelled=cancelled,
+            )
+            logger.info(
+                f"Auto tessellation: deflection {plan.linear_deflection:.4f} mm "
+                f"(diagonal {plan.diagonal_mm:.1f} mm), {plan.triangles} triangles for a budget of {plan.target_triangles}"
+            )
+        else:
+            # Absolute deflection; faces are meshed on OCC's thread pool
+            tessellate(
+                shape, linear_deflection, angular_deflection,
+                relative=False, progress=progress, cancelled=cancelled,
+            )
+    except TessellationCancelled:
+        raise
     except Exception as e:
         logger.error(f"Meshing failed: {str(e)}", exc_info=True)
         raise
 
 
-def write_stl_to_buffer(shape, buffer: io.BytesIO):
-    """Write shape to STL format in buffer"""
-    try:
-        # Create temporary file (StlAPI_Writer requires file path)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.stl') as temp_file:
-            temp_path = temp_file.name
-        
-        # Write STL file
-        stl_writer = StlAPI_Writer()
-        stl_writer.SetASCIIMode(False)  # Binary STL is smaller
-        stl_writer.Write(shape, temp_path)
-        
-        # Read file into buffer
-        with open(temp_path, 'rb') as f:
-            buffer.write(f.read())
-        
-        # Cleanup
-        os.unlink(temp_path)
-        
-    except Exception as e:
-        logger.error(f"STL write failed: {str(e)}", exc_info=True)
-        raise
+def stream_stl(shape, count: int) -> Iterator[bytes]:
+    """Binary STL: header, triangle count, then ``count`` 50-byte records, built one face at a time"""
+    yield STL_HEADER + struct.pack("<I", count)
+    pending, size = [], 0
+    for _, vertices, triangles in iter_face_meshes(shape):
+        tri = vertices[triangles]
+        normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+        length = np.linalg.norm(normals, axis=1, keepdims=True)
+        records = np.zeros(len(tri), dtype=STL_RECORD)
+        records["normal"] = np.divide(normals, length, out=np.zeros_like(normals), where=length > 0)
+        records["vertices"] = tri
+        pending.append(records.tobytes())
+        size += records.nbytes
+        if size >= OUTPUT_CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
 
 
-def write_obj_to_buffer(shape, buffer: io.BytesIO):
-    """Write shape to OBJ format in buffer"""
-    try:
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.obj') as temp_file:
-            temp_path = temp_file.name
-        
-        # Write OBJ file using OCC utility
-        write_obj_file(shape, temp_path)
-        
-        # Read file into buffer
-        with open(temp_path, 'rb') as f:
-            buffer.write(f.read())
-        
-        # Cleanup
-        os.unlink(temp_path)
-        
-    except Exception as e:
-        logger.error(f"OBJ write failed: {str(e)}", exc_info=True)
-        raise
+def stream_obj(shape) -> Iterator[bytes]:
+    """OBJ text, one group per B-rep face, built one face at a time"""
+    yield b"# cad-service OBJ\n"
+    pending, size = [], 0
+    offset = 1  # OBJ indices are 1-based and global
+    for face_id, vertices, triangles in iter_face_meshes(shape):
+        lines = [f"g face_{face_id}"]
+        lines.extend("v %.6f %.6f %.6f" % (x, y, z) for x, y, z in vertices.tolist())
+        lines.extend("f %d %d %d" % (a, b, c) for a, b, c in (triangles + offset).tolist())
+        offset += len(vertices)
+        chunk = ("\n".join(lines) + "\n").encode()
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= OUTPUT_CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
 
 
 def get_bounding_box(shape):
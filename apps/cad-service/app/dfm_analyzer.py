@@ -0,0 +1,395 @@
+"""DFM rule engine for the legacy /dfm endpoints.
+
+Rules are compiled from dfm_config.json (material, process and global
+thresholds) into plain check functions over a ``PartGeometry`` probe.
+Rules run one after another in the calling thread: they share one OCC shape,
+which is not thread-safe. Rules that can block run first, and once one
+reports a blocker the rest are skipped instead of spending time on a part
+that cannot be quoted anyway.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .dfm_config import load_dfm_config, resolve_material, resolve_process
+from .utils.units import scale_to_mm
+
+CheckResult = Dict[str, Any]
+
+SUPPORTED_EXTENSIONS = ("step", "stp", "iges", "igs", "stl", "obj")
+MESH_EXTENSIONS = ("stl", "obj")
+BREP_EXTENSIONS = ("step", "stp")
+# Parts outside this envelope are most likely exported in the wrong units
+MIN_SANE_DIMENSION_MM = 1.0
+MAX_SANE_DIMENSION_MM = 5000.0
+MAX_HIGHLIGHTS = 50
+
+
+def check(
+    rule_id: str,
+    title: str,
+    status: str,
+    message: str,
+    *,
+    metrics: Optional[Dict[str, Any]] = None,
+    suggestions: Optional[List[str]] = None,
+    face_ids: Sequence[int] = (),
+) -> CheckResult:
+    return {
+        "id": rule_id,
+        "title": title,
+        "status": status,
+        "message": message,
+        "metrics": metrics,
+        "suggestions": suggestions or [],
+        "highlights": {"face_ids": [int(f) for f in face_ids][:MAX_HIGHLIGHTS], "edge_ids": []},
+    }
+
+
+class PartGeometry:
+    """Lazily extracted geometry shared by all rules of one analysis.
+
+    Each property is computed at most once and reused by every rule that
+    needs it (e.g. holes for diameter and depth ratio).
+    """
+
+    def __init__(self, path: Optional[str], *, file_name: str, units: Optional[str] = None):
+        self.path = path
+        self.file_name = file_name
+        self.extension = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
+        self.scale = scale_to_mm(units)
+        self._values: Dict[str, Any] = {}
+
+    def _get(self, name: str, compute: Callable[[], Any]) -> Any:
+        if name not in self._values:
+            self._values[name] = compute()
+        return self._values[name]
+
+    @property
+    def loadable(self) -> bool:
+        if not self.path or self.extension not in MESH_EXTENSIONS + BREP_EXTENSIONS:
+            return False
+        if self.extension in BREP_EXTENSIONS:
+            from .loaders.step_loader import occ_available
+            return occ_available()
+        return True
+
+    @property
+    def loaded(self) -> bool:
+        return "mesh" in self._values or "shape" in self._values
+
+    @property
+    def mesh(self):
+        def load():
+            from .loaders.stl_loader import load_stl
+            return load_stl(self.path, scale=self.scale)
+        return self._get("mesh", load)
+
+    @property
+    def shape(self):
+        def load():
+            from .loaders.step_loader import load_step_shape
+            return load_step_shape(self.path)
+        return self._get("shape", load)
+
+    @property
+    def index(self):
+        def build():
+            from .extractors.topology import ShapeIndex
+            return ShapeIndex.build(self.shape)
+        return self._get("index", build)
+
+    @property
+    def is_mesh(self) -> bool:
+        return self.extension in MESH_EXTENSIONS
+
+    @property
+    def bbox_mm(self) -> List[float]:
+        """[xmin, ymin, zmin, xmax, ymax, zmax] in millimetres."""
+        def compute():
+            if self.is_mesh:
+                lo, hi = self.mesh.bounds
+                return [float(v) for v in (*lo, *hi)]
+            from OCC.Core.Bnd import Bnd_Box
+            from OCC.Core.BRepBndLib import brepbndlib_Add
+            box = Bnd_Box()
+            brepbndlib_Add(self.shape, box)
+            return [float(v) for v in box.Get()]
+        return self._get("bbox", compute)
+
+    @property
+    def dimensions_mm(self) -> List[float]:
+        b = self.bbox_mm
+        return [b[3] - b[0], b[4] - b[1], b[5] - b[2]]
+
+    @property
+    def mass_props(self) -> tuple:
+        def compute():
+            if self.is_mesh:
+                from .loaders.stl_loader import mesh_mass_props
+                return mesh_mass_props(self.mesh)
+            from .loaders.step_loader import shape_mass_props
+            return shape_mass_props(self.shape)
+        return self._get("mass_props", compute)
+
+    @property
+    def shell_count(self) -> int:
+        def compute():
+            if self.is_mesh:
+                return int(self.mesh.body_count)
+            from OCC.Core.TopAbs import TopAbs_SHELL
+            from OCC.Core.TopExp import topexp_MapShapes
+            from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+            shells = TopTools_IndexedMapOfShape()
+            topexp_MapShapes(self.shape, TopAbs_SHELL, shells)
+            return int(shells.Size())
+        return self._get("shell_count", compute)
+
+    @property
+    def holes(self) -> list:
+        def compute():
+            if self.is_mesh:
+                return []
+            from .extractors.holes import extract_holes_from_shape
+            return extract_holes_from_shape(self.shape, self.index)
+        return self._get("holes", compute)
+
+    @property
+    def pockets(self) -> list:
+        def compute():
+            if self.is_mesh:
+                return []
+            from .extractors.pockets import extract_pockets_from_shape
+            return extract_pockets_from_shape(self.shape, self.index)
+        return self._get("pockets", compute)
+
+    @property
+    def min_wall(self):
+        """MinWallData for meshes; None for B-rep input (no tessellation here)."""
+        def compute():
+            if not self.is_mesh:
+                return None
+            from .extractors.min_wall import min_wall_mesh
+            return min_wall_mesh(self.mesh)
+        return self._get("min_wall", compute)
+
+    def geom_props(self) -> Dict[str, Any]:
+        vol_mm3, area_mm2 = self.mass_props
+        bbox = self.bbox_mm
+        return {
+            "bbox_mm": [round(v, 4) for v in bbox],
+            # Axis-aligned until an oriented box is computed
+            "obb_mm": [round(v, 4) for v in bbox],
+            "vol_mm3": round(vol_mm3, 3),
+            "area_mm2": round(area_mm2, 3),
+        }
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    title: str
+    fn: Callable[[PartGeometry], Optional[CheckResult]]
+    needs_geometry: bool = True
+    # Rules that can report blockers run first so short-circuiting kicks in early
+    can_block: bool = False
+
+
+def compile_rules(material_name: Optional[str], process_name: Optional[str], config: Optional[dict] = None) -> List[Rule]:
+    """Bind dfm_config thresholds for one material/process into check functions."""
+    config = config or load_dfm_config()
+    material = resolve_material(config, material_name)
+    process = resolve_process(config, process_name)
+    thresholds = config.get("global_thresholds", {})
+
+    max_shells = int(thresholds.get("max_shell_count", 1))
+    travel = sorted(process.get("max_travel_mm", {}).values())
+    max_finish = float(process.get("max_finish_size_mm", math.inf))
+    min_hole = float(material.get("min_hole_diameter_mm", 0.0))
+    min_tool = float(process.get("min_tool_diameter_mm", 0.0))
+    max_hole_ratio = float(process.get("max_hole_depth_ratio", math.inf))
+    max_pocket_ratio = float(process.get("max_pocket_depth_ratio", math.inf))
+    min_wall = float(material.get("min_wall_thickness_mm", 0.0))
+
+    def file_type(geom: PartGeometry) -> CheckResult:
+        ext = geom.extension
+        metrics = {"file_extension": f".{ext}"}
+        if ext in SUPPORTED_EXTENSIONS:
+            return check("file_type", "File Type", "passed",
+                         f"{ext.upper()} file format is supported for CNC machining.", metrics=metrics)
+        return check("file_type", "File Type", "blocker", f"{ext.upper()} file format is not supported.",
+                     metrics=metrics, suggestions=["Convert to STEP, IGES, or STL format"])
+
+    def units_and_scale(geom: PartGeometry) -> CheckResult:
+        dims = geom.dimensions_mm
+        metrics = {"bbox_mm": geom.bbox_mm}
+        if max(dims) < MIN_SANE_DIMENSION_MM or max(dims) > MAX_SANE_DIMENSION_MM:
+            return check("units_and_scale", "Units & Scale Check", "warning",
+                         f"Largest dimension is {max(dims):.2f} mm; the model may be in the wrong units.",
+                         metrics=metrics, suggestions=["Verify the export units (mm vs inch)."])
+        return check("units_and_scale", "Units & Scale Check", "passed",
+                     "Model dimensions are within acceptable range.", metrics=metrics)
+
+    def machine_travel(geom: PartGeometry) -> CheckResult:
+        # Compare sorted extents so the part may be re-oriented on the machine
+        dims = sorted(geom.dimensions_mm)
+        metrics = {"dimensions_mm": [round(d, 3) for d in geom.dimensions_mm],
+                   "max_travel_mm": process.get("max_travel_mm")}
+        if travel and any(d > t for d, t in zip(dims, travel)):
+            return check("machine_travel", "Machine Travel", "blocker",
+                         f"Part does not fit the {process.get('name')} work envelope in any orientation.",
+                         metrics=metrics, suggestions=["Split the part into smaller components."])
+        if dims[-1] > max_finish:
+            return check("machine_travel", "Machine Travel", "warning",
+                         f"Largest dimension exceeds the {max_finish:g} mm finishing size.",
+                         metrics=metrics, suggestions=["Expect reduced finish quality or manual finishing."])
+        return check("machine_travel", "Machine Travel", "passed",
+                     "Part fits the machine work envelope.", metrics=metrics)
+
+    def floating_parts(geom: PartGeometry) -> CheckResult:
+        shells = geom.shell_count
+        metrics = {"shell_count": shells, "max_shell_count": max_shells}
+        if shells > max_shells:
+            return check("floating_parts", "Floating Parts Check", "blocker",
+                         f"{shells} separate shells detected; at most {max_shells} are allowed.",
+                         metrics=metrics, suggestions=["Merge or remove disconnected bodies."])
+        if shells > 1:
+            return check("floating_parts", "Floating Parts Check", "warning",
+                         f"{shells} separate shells detected.", metrics=metrics,
+                         suggestions=["Confirm the model is a single part."])
+        return check("floating_parts", "Floating Parts Check", "passed",
+                     "Single solid body detected - no floating parts.", metrics=metrics)
+
+    def hole_diameter(geom: PartGeometry) -> Optional[CheckResult]:
+        holes = geom.holes
+        if not holes:
+            return None
+        small = [h for h in holes if h.diameter_mm < min_hole]
+        metrics = {"hole_count": len(holes), "min_diameter_mm": round(min(h.diameter_mm for h in holes), 3),
+                   "limit_mm": min_hole}
+        if not small:
+            return check("hole_diameter", "Hole Diameter", "passed", "All holes meet the minimum diameter.",
+                         metrics=metrics)
+        status = "blocker" if any(h.diameter_mm < min_tool for h in small) else "warning"
+        return check("hole_diameter", "Hole Diameter", status,
+                     f"{len(small)} hole(s) are below the {min_hole:g} mm minimum diameter.",
+                     metrics=metrics, suggestions=["Enlarge small holes or specify them as drilled features."],
+                     face_ids=[f for h in small for f in (h.entry_face_id, h.exit_face_id) if f])
+
+    def hole_depth(geom: PartGeometry) -> Optional[CheckResult]:
+        holes = [h for h in geom.holes if h.diameter_mm > 0]
+        if not holes:
+            return None
+        ratios = [h.depth_mm / h.diameter_mm for h in holes]
+        deep = [h for h, r in zip(holes, ratios) if r > max_hole_ratio]
+        metrics = {"max_depth_ratio": round(max(ratios), 2), "limit": max_hole_ratio}
+        if not deep:
+            return check("hole_depth_ratio", "Hole Depth", "passed",
+                         "Hole depth-to-diameter ratios are machinable.", metrics=metrics)
+        return check("hole_depth_ratio", "Hole Depth", "warning",
+                     f"{len(deep)} hole(s) exceed a {max_hole_ratio:g}:1 depth-to-diameter ratio.",
+                     metrics=metrics, suggestions=["Reduce hole depth or increase the diameter."],
+                     face_ids=[f for h in deep for f in (h.entry_face_id, h.exit_face_id) if f])
+
+    def pocket_depth(geom: PartGeometry) -> Optional[CheckResult]:
+        pockets = [p for p in geom.pockets if p.mouth_area_mm2 > 0 and p.depth_mm > 0]
+        if not pockets:
+            return None
+        # aspect_ratio is depth over a width approximated from the floor area
+        ratios = [p.aspect_ratio for p in pockets]
+        deep = [p for p, r in zip(pockets, ratios) if r > max_pocket_ratio]
+        metrics = {"pocket_count": len(pockets), "max_depth_ratio": round(max(ratios), 2), "limit": max_pocket_ratio}
+        if not deep:
+            return check("pocket_depth_ratio", "Pocket Depth", "passed",
+                         "Pocket depth-to-width ratios are machinable.", metrics=metrics)
+        return check("pocket_depth_ratio", "Pocket Depth", "warning",
+                     f"{len(deep)} pocket(s) exceed a {max_pocket_ratio:g}:1 depth-to-width ratio.",
+                     metrics=metrics, suggestions=["Make pockets shallower or wider."],
+                     face_ids=[f for p in deep for f in p.planar_face_ids])
+
+    def wall_thickness(geom: PartGeometry) -> Optional[CheckResult]:
+        data = geom.min_wall
+        if data is None or data.global_min_mm <= 0:
+            return None
+        thin = [fid for fid, t in data.face_min_mm.items() if t < min_wall]
+        metrics = {"min_wall_mm": round(data.global_min_mm, 3), "limit_mm": min_wall}
+        if data.global_min_mm >= min_wall:
+            return check("min_wall", "Minimum Wall Thickness", "passed",
+                         "Wall thickness meets the material minimum.", metrics=metrics)
+        status = "blocker" if data.global_min_mm < 0.5 * min_wall else "warning"
+        return check("min_wall", "Minimum Wall Thickness", status,
+                     f"Walls as thin as {data.global_min_mm:.2f} mm found; minimum is {min_wall:g} mm.",
+                     metrics=metrics, suggestions=["Thicken thin walls or choose a stiffer material."],
+                     face_ids=sorted(thin))
+
+    return [
+        Rule("file_type", "File Type", file_type, needs_geometry=False, can_block=True),
+        Rule("machine_travel", "Machine Travel", machine_travel, can_block=True),
+        Rule("floating_parts", "Floating Parts Check", floating_parts, can_block=True),
+        Rule("units_and_scale", "Units & Scale Check", units_and_scale),
+        Rule("hole_diameter", "Hole Diameter", hole_diameter, can_block=True),
+        Rule("hole_depth_ratio", "Hole Depth", hole_depth),
+        Rule("pocket_depth_ratio", "Pocket Depth", pocket_depth),
+        Rule("min_wall", "Minimum Wall Thickness", wall_thickness, can_block=True),
+    ]
+
+
+def evaluate_rules(rules: Sequence[Rule], geom: PartGeometry) -> List[CheckResult]:
+    """Run rules in order, blocking rules first; skip the rest after the first blocker.
+
+    Results are returned in rule order. A rule that raises is reported as a
+    warning rather than failing the whole analysis.
+    """
+    has_geometry = geom.loadable
+    runnable = [r for r in rules if has_geometry or not r.needs_geometry]
+    results: Dict[str, CheckResult] = {}
+    for rule in sorted(runnable, key=lambda r: not r.can_block):
+        try:
+            result = rule.fn(geom)
+        except Exception as exc:
+            result = check(rule.id, rule.title, "warning", f"Check could not be evaluated: {exc}")
+        if result is None:
+            continue
+        results[rule.id] = result
+        if result["status"] == "blocker":
+            break
+
+    checks = [results[r.id] for r in rules if r.id in results]
+    checks.append(model_fidelity(geom, has_geometry))
+    return checks
+
+
+def model_fidelity(geom: PartGeometry, has_geometry: bool) -> CheckResult:
+    if has_geometry and geom.loaded:
+        return check("model_fidelity", "Model Fidelity", "passed", "Model geometry was loaded and analyzed.",
+                     metrics={"geometry": "analyzed"})
+    if has_geometry:
+        return check("model_fidelity", "Model Fidelity", "blocker", "Model geometry could not be read.",
+                     metrics={"geometry": "invalid"},
+                     suggestions=["Re-export the model and check it for errors."])
+    return check("model_fidelity", "Model Fidelity", "warning",
+                 "Geometry was not available for analysis; only file-level checks were run.",
+                 metrics={"geometry": "unavailable"},
+                 suggestions=["Upload a STEP or STL file so geometry checks can run."])
+
+
+def run_dfm_checks(
+    path: Optional[str],
+    file_name: str,
+    *,
+    material: Optional[str] = None,
+    process: Optional[str] = None,
+    units: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Extract geometry and evaluate all rules; returns plain dicts (pool-safe)."""
+    geom = PartGeometry(path, file_name=file_name, units=units)
+    checks = evaluate_rules(compile_rules(material, process), geom)
+    geom_props = None
+    if geom.loaded:
+        try:
+            geom_props = geom.geom_props()
+        except Exception:
+            geom_props = None
+    return {"checks": checks, "geom_props": geom_props}
@@ -0,0 +1,44 @@
+"""Loader for dfm_config.json (materials, processes, rules, global thresholds)."""
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CONFIG_PATH = Path(__file__).with_name("dfm_config.json")
+DEFAULT_MATERIAL = "aluminum"
+DEFAULT_PROCESS = "cnc_milling"
+
+# Process names used by callers (quote lines, legacy API) -> config keys
+PROCESS_ALIASES = {
+    "cnc": "cnc_milling",
+    "milling": "cnc_milling",
+    "turning": "cnc_turning",
+    "lathe": "cnc_turning",
+}
+
+
+@lru_cache(maxsize=4)
+def load_dfm_config(path: Optional[str] = None) -> Dict[str, Any]:
+    with open(path or CONFIG_PATH, "r") as fh:
+        return json.load(fh)
+
+
+def resolve_material(config: Dict[str, Any], name: Optional[str]) -> Dict[str, Any]:
+    """Match a free-form material name ("Aluminum 6061-T6") to a config entry."""
+    materials = config.get("materials", {})
+    key = (name or "").strip().lower()
+    if key in materials:
+        return materials[key]
+    for material_key, material in materials.items():
+        if material_key in key:
+            return material
+    return materials[DEFAULT_MATERIAL]
+
+
+def resolve_process(config: Dict[str, Any], name: Optional[str]) -> Dict[str, Any]:
+    processes = config.get("processes", {})
+    key = (name or "").strip().lower().replace("-", "_").replace(" ", "_")
+    key = PROCESS_ALIASES.get(key, key)
+    return processes.get(key, processes[DEFAULT_PROCESS])
@@ -0,0 +1,230 @@
+"""Persistent DFM task/result store for the legacy DFM endpoints in main.py.
+
+Replaces the process-global ``dfm_tasks``/``dfm_results`` dicts so polling
+works across uvicorn workers and restarts, and entries expire instead of
+accumulating forever. Backends are selected by ``DFM_STORE_URL``:
+
+- ``redis://...``   one hash per task with a TTL
+- ``sqlite:///...`` single table, pruned by age and row count (local/dev)
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional
+
+DEFAULT_SQLITE_PATH = "/tmp/cad-dfm-tasks.sqlite3"
+TASK_TTL_SECONDS = int(os.getenv("DFM_TASK_TTL_SECONDS", str(24 * 3600)))
+MAX_TASKS = int(os.getenv("DFM_TASK_MAX_ROWS", "50000"))
+COMPRESS_MIN_BYTES = 1024
+# Stay under SQLite's bound-parameter limit (999 before 3.32)
+SQLITE_MAX_PARAMS = 900
+
+_RAW = b"j"
+_ZLIB = b"z"
+
+
+def pack_result(result_json: str) -> bytes:
+    """Compact wire form for stored results: zlib-compressed once it pays off."""
+    raw = result_json.encode()
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(raw, 6)
+    return _RAW + raw
+
+
+def unpack_result(blob: Optional[bytes]) -> Optional[str]:
+    if not blob:
+        return None
+    tag, body = blob[:1], blob[1:]
+    if tag == _ZLIB:
+        body = zlib.decompress(body)
+    return body.decode()
+
+
+class DFMTaskStore(ABC):
+    """Task records are dicts with ``status``, ``request`` and ``created_at``."""
+
+    @abstractmethod
+    def create_task(self, task_id: str, request: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def set_status(self, task_id: str, status: str) -> None:
+        ...
+
+    @abstractmethod
+    def set_result(self, task_id: str, status: str, result_json: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_result(self, task_id: str) -> Optional[str]:
+        ...
+
+    def get_many(self, task_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return ``{task_id: {"status": ..., "result": json or None}}`` for known ids."""
+        out = {}
+        for task_id in task_ids:
+            task = self.get_task(task_id)
+            if task is not None:
+                out[task_id] = {"status": task["status"], "result": self.get_result(task_id)}
+        return out
+
+
+class RedisDFMTaskStore(DFMTaskStore):
+    def __init__(self, url: str, *, prefix: str = "cad:dfm", ttl_seconds: int = TASK_TTL_SECONDS):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, task_id: str) -> str:
+        return f"{self.prefix}:{task_id}"
+
+    def create_task(self, task_id: str, request: Dict[str, Any]) -> None:
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(task_id), mapping={
+            "status": "Queued",
+            "request": json.dumps(request, separators=(",", ":"), default=str),
+            "created_at": time.time(),
+        })
+        pipe.expire(self._key(task_id), self.ttl_seconds)
+        pipe.execute()
+
+    def set_status(self, task_id: str, status: str) -> None:
+        # An HSET on an expired record recreates the key without a TTL; re-apply it
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(task_id), "status", status)
+        pipe.expire(self._key(task_id), self.ttl_seconds)
+        pipe.execute()
+
+    def set_result(self, task_id: str, status: str, result_json: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(task_id), mapping={"status": status, "result": pack_result(result_json)})
+        pipe.expire(self._key(task_id), self.ttl_seconds)
+        pipe.execute()
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        status, request, created_at = self.client.hmget(self._key(task_id), "status", "request", "created_at")
+        if status is None:
+            return None
+        return {
+            "status": status.decode(),
+            "request": json.loads(request) if request else None,
+            "created_at": float(created_at or 0),
+        }
+
+    def get_result(self, task_id: str) -> Optional[str]:
+        return unpack_result(self.client.hget(self._key(task_id), "result"))
+
+    def get_many(self, task_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        ids = list(task_ids)
+        pipe = self.client.pipeline()
+        for task_id in ids:
+            pipe.hmget(self._key(task_id), "status", "result")
+        out = {}
+        for task_id, (status, result) in zip(ids, pipe.execute()):
+            if status is not None:
+                out[task_id] = {"status": status.decode(), "result": unpack_result(result)}
+        return out
+
+
+class SQLiteDFMTaskStore(DFMTaskStore):
+    def __init__(self, path: str, *, ttl_seconds: int = TASK_TTL_SECONDS, max_rows: int = MAX_TASKS):
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        # WAL lets several uvicorn workers share the file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dfm_tasks ("
+            " task_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " request TEXT,"
+            " created_at REAL NOT NULL,"
+            " result BLOB)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS dfm_tasks_created ON dfm_tasks(created_at)")
+        self._conn.commit()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        self._conn.execute("DELETE FROM dfm_tasks WHERE created_at < ?", (cutoff,))
+        self._conn.execute(
+            "DELETE FROM dfm_tasks WHERE task_id IN ("
+            " SELECT task_id FROM dfm_tasks ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+    def create_task(self, task_id: str, request: Dict[str, Any]) -> None:
+        with self._lock:
+            self._prune()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dfm_tasks (task_id, status, request, created_at) VALUES (?, ?, ?, ?)",
+                (task_id, "Queued", json.dumps(request, separators=(",", ":"), default=str), time.time()),
+            )
+            self._conn.commit()
+
+    def set_status(self, task_id: str, status: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE dfm_tasks SET status = ? WHERE task_id = ?", (status, task_id))
+            self._conn.commit()
+
+    def set_result(self, task_id: str, status: str, result_json: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE dfm_tasks SET status = ?, result = ? WHERE task_id = ?",
+                (status, pack_result(result_json), task_id),
+            )
+            self._conn.commit()
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, request, created_at FROM dfm_tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+        if row is None or row[2] < time.time() - self.ttl_seconds:
+            return None
+        return {"status": row[0], "request": json.loads(row[1]) if row[1] else None, "created_at": row[2]}
+
+    def get_result(self, task_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM dfm_tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return unpack_result(row[0]) if row else None
+
+    def get_many(self, task_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        ids = list(dict.fromkeys(task_ids))
+        rows = []
+        with self._lock:
+            for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+                chunk = ids[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ",".join("?" for _ in chunk)
+                rows += self._conn.execute(
+                    f"SELECT task_id, status, result, created_at FROM dfm_tasks WHERE task_id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+        cutoff = time.time() - self.ttl_seconds
+        return {
+            task_id: {"status": status, "result": unpack_result(result)}
+            for task_id, status, result, created_at in rows
+            if created_at >= cutoff
+        }
+
+
+def create_dfm_store(url: Optional[str] = None) -> DFMTaskStore:
+    url = url or os.getenv("DFM_STORE_URL") or f"sqlite://{DEFAULT_SQLITE_PATH}"
+    if url.startswith(("redis://", "rediss://")):
+        return RedisDFMTaskStore(url)
+    if url.startswith("sqlite://"):
+        return SQLiteDFMTaskStore(url[len("sqlite://"):] or DEFAULT_SQLITE_PATH)
+    raise ValueError(f"Unsupported DFM_STORE_URL: {url}")
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from typing import Tuple
+
+import numpy as np
+
+LEAF_SIZE = 8
+RAY_BATCH = 4096
+_EPS = 1e-9
+
+
+class TriangleBVH:
+    """Axis-aligned bounding volume hierarchy over a triangle soup.
+
+    Nodes are stored as flat arrays. Rays are traversed in batches as
+    (ray, node) frontier pairs, so every slab and triangle test is a NumPy
+    operation rather than a Python loop per ray.
+    """
+
+    def __init__(self, triangles: np.ndarray, *, leaf_size: int = LEAF_SIZE):
+        tris = np.asarray(triangles, dtype=np.float64)
+        self.v0 = tris[:, 0]
+        self.e1 = tris[:, 1] - tris[:, 0]
+        self.e2 = tris[:, 2] - tris[:, 0]
+        self._build(tris, leaf_size)
+
+    def _build(self, tris: np.ndarray, leaf_size: int) -> None:
+        n = tris.shape[0]
+        tri_min = tris.min(axis=1)
+        tri_max = tris.max(axis=1)
+        centroids = tris.mean(axis=1)
+        order = np.arange(n)
+
+        node_min, node_max, left, right, start, count = [], [], [], [], [], []
+
+        def new_node(lo: int, hi: int) -> int:
+            idx = order[lo:hi]
+            node_min.append(tri_min[idx].min(axis=0))
+            node_max.append(tri_max[idx].max(axis=0))
+            left.append(-1)
+            right.append(-1)
+            start.append(lo)
+            count.append(hi - lo)
+            return len(left) - 1
+
+        if n:
+            stack = [(new_node(0, n), 0, n)]
+            while stack:
+                node, lo, hi = stack.pop()
+                if hi - lo <= leaf_size:
+                    continue
+                idx = order[lo:hi]
+                c = centroids[idx]
+                axis = int(np.argmax(c.max(axis=0) - c.min(axis=0)))
+                mid = (hi - lo) // 2
+                part = np.argpartition(c[:, axis], mid)
+                order[lo:hi] = idx[part]
+                l_node = new_node(lo, lo + mid)
+                r_node = new_node(lo + mid, hi)
+                left[node], right[node] = l_node, r_node
+                count[node] = 0
+                stack.append((l_node, lo, lo + mid))
+                stack.append((r_node, lo + mid, hi))
+
+        self.node_min = np.asarray(node_min, dtype=np.float64).reshape(-1, 3)
+        self.node_max = np.asarray(node_max, dtype=np.float64).reshape(-1, 3)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.start = np.asarray(start, dtype=np.int64)
+        self.count = np.asarray(count, dtype=np.int64)
+        self.order = order
+
+    def intersects_first(self, origins: np.ndarray, directions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (distance, triangle index) of the nearest hit per ray; (inf, -1) on miss."""
+        origins = np.asarray(origins, dtype=np.float64)
+        directions = np.asarray(directions, dtype=np.float64)
+        dist = np.full(len(origins), np.inf)
+        tri = np.full(len(origins), -1, dtype=np.int64)
+        if len(self.left) == 0:
+            return dist, tri
+        for s in range(0, len(origins), RAY_BATCH):
+            sl = slice(s, s + RAY_BATCH)
+            dist[sl], tri[sl] = self._traverse(origins[sl], directions[sl])
+        return dist, tri
+
+    def _traverse(self, origins: np.ndarray, directions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(origins)
+        best_t = np.full(n, np.inf)
+        best_tri = np.full(n, -1, dtype=np.int64)
+        safe = np.where(np.abs(directions) < _EPS, _EPS, directions)
+        inv_d = 1.0 / safe
+
+        ray = np.arange(n)
+        node = np.zeros(n, dtype=np.int64)
+        while ray.size:
+            # Slab test, pruned by the best hit found so far
+            o = origins[ray]
+            inv = inv_d[ray]
+            t0 = (self.node_min[node] - o) * inv
+            t1 = (self.node_max[node] - o) * inv
+            t_near = np.minimum(t0, t1).max(axis=1)
+            t_far = np.maximum(t0, t1).min(axis=1)
+            keep = (t_far >= np.maximum(t_near, 0.0)) & (t_near < best_t[ray])
+            ray, node = ray[keep], node[keep]
+
+            leaf = self.left[node] < 0
+            if leaf.any():
+                self._intersect_leaves(ray[leaf], node[leaf], origins, directions, best_t, best_tri)
+            inner_ray, inner_node = ray[~leaf], node[~leaf]
+            ray = np.concatenate([inner_ray, inner_ray])
+            node = np.concatenate([self.left[inner_node], self.right[inner_node]])
+        return best_t, best_tri
+
+    def _intersect_leaves(self, ray, node, origins, directions, best_t, best_tri) -> None:
+        counts = self.count[node]
+        total = int(counts.sum())
+        rr = np.repeat(ray, counts)
+        first = np.repeat(self.start[node] - (np.cumsum(counts) - counts), counts)
+        tri = self.order[first + np.arange(total)]
+
+        # Moller-Trumbore, two-sided
+        d = directions[rr]
+        e1 = self.e1[tri]
+        e2 = self.e2[tri]
+        p = np.cross(d, e2)
+        det = np.einsum("ij,ij->i", e1, p)
+        ok = np.abs(det) > _EPS
+        inv_det = np.where(ok, 1.0 / np.where(ok, det, 1.0), 0.0)
+        s = origins[rr] - self.v0[tri]
+        u = np.einsum("ij,ij->i", s, p) * inv_det
+        q = np.cross(s, e1)
+        v = np.einsum("ij,ij->i", d, q) * inv_det
+        t = np.einsum("ij,ij->i", e2, q) * inv_det
+        ok &= (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > _EPS)
+        if not ok.any():
+            return
+        rr, tri, t = rr[ok], tri[ok], t[ok]
+        np.minimum.at(best_t, rr, t)
+        nearest = t == best_t[rr]
+        best_tri[rr[nearest]] = tri[nearest]
@@ -1,115 +1,69 @@
 from __future__ import annotations
-from typing import List, Optional, Tuple
+from typing import List, Optional
+
+import numpy as np
 
 from ..models import HoleFeature
+from .topology import SURFACE_CYLINDER, SURFACE_PLANE, ShapeIndex
 
 
-def extract_holes_from_shape(shape) -> List[HoleFeature]:
+def extract_holes_from_shape(
+    shape, index: Optional[ShapeIndex] = None, faces: Optional[np.ndarray] = None
+) -> List[HoleFeature]:
     """Detect cylindrical holes and identify planar cap faces for entry/exit.
+    Pass a prebuilt ShapeIndex to share topology traversal with other extractors,
+    and ``faces`` (0-based indices) to only examine those faces.
     If pythonOCC is not available, returns [].
     """
-    try:
-        from OCC.Core.TopExp import TopExp_Explorer, TopExp
-        from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_EDGE
-        from OCC.Core.BRep import BRep_Tool
-        from OCC.Core.Geom import Geom_CylindricalSurface, Geom_Plane
-        from OCC.Core.BRepTools import breptools_UVBounds
-        from OCC.Core.TopTools import TopTools_IndexedMapOfShape, TopTools_IndexedDataMapOfShapeListOfShape
-        from OCC.Core.gp import gp_Dir, gp_Pnt
-    except Exception:
+    if index is None:
+        index = ShapeIndex.build(shape)
+    if index is None:
         return []
 
-    face_map = TopTools_IndexedMapOfShape()
-    TopExp.MapShapes(shape, TopAbs_FACE, face_map)
-
-    # Edge -> Faces adjacency map
-    edge_faces = TopTools_IndexedDataMapOfShapeListOfShape()
-    TopExp.MapShapesAndAncestors(shape, TopAbs_EDGE, TopAbs_FACE, edge_faces)
-
     holes: List[HoleFeature] = []
     idx = 1
-    exp = TopExp_Explorer(shape, TopAbs_FACE)
-    while exp.More():
-        face = exp.Current()
-        exp.Next()
-        surf = BRep_Tool.Surface(face)
-        cyl = Geom_CylindricalSurface.DownCast(surf)
-        if cyl is None:
-            continue
-
-        radius = cyl.Cylinder().Radius()
+    candidates = index.faces_of_kind(SURFACE_CYLINDER)
+    if faces is not None:
+        candidates = np.intersect1d(candidates, faces)
+    for i in candidates:
+        radius = float(index.cyl_radius[i])
         if radius <= 0:
             continue
         diameter = float(2.0 * radius)
 
         # Cylinder axis direction
-        axis_dir = cyl.Cylinder().Axis().Direction()
-        axis_vec = (axis_dir.X(), axis_dir.Y(), axis_dir.Z())
+        axis = index.cyl_axis[i]
+        axis_vec = (float(axis[0]), float(axis[1]), float(axis[2]))
 
         # Estimate depth from param bounds as fallback
         depth_est = 0.0
-        try:
-            umin, umax, vmin, vmax = breptools_UVBounds(face)
-            depth_est = float(abs(vmax - vmin))
-        except Exception:
-            pass
+        uv = index.uv_bounds(i)
+        if uv is not None:
+            depth_est = float(abs(uv[3] - uv[2]))
 
         # Find adjacent planar caps whose normal aligns with axis
         entry_id: Optional[int] = None
         exit_id: Optional[int] = None
-        entry_plane_origin: Optional[Tuple[float, float, float]] = None
-        exit_plane_origin: Optional[Tuple[float, float, float]] = None
-
-        # Iterate edges of the cylindrical face and collect neighbor faces
-        edge_exp = TopExp_Explorer(face, TopAbs_EDGE)
-        neighbor_faces = set()
-        while edge_exp.More():
-            edge = edge_exp.Current()
-            edge_exp.Next()
-            if edge_faces.Contains(edge):
-                lst = edge_faces.FindFromKey(edge)
-                # Iterate faces sharing this edge
-                it = lst.cbegin()
-                while it.More():
-                    f2 = it.Value()
-                    it.Next()
-                    if f2.IsSame(face):
-                        continue
-                    neighbor_faces.add(f2)
-
-        def dot(a, b):
-            return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
-
-        for nf in neighbor_faces:
-            nsurf = BRep_Tool.Surface(nf)
-            plane = Geom_Plane.DownCast(nsurf)
-            if plane is None:
-                continue
-            n_dir = plane.Pln().Axis().Direction()
-            n_vec = (n_dir.X(), n_dir.Y(), n_dir.Z())
-            d = abs(dot(axis_vec, n_vec))
-            if d >= 0.9:
-                # Cap candidate
-                fid = face_map.FindIndex(nf)
-                loc = plane.Location()
-                origin = (loc.X(), loc.Y(), loc.Z())
-                s = dot(axis_vec, n_vec)
-                if s > 0:
+        entry_plane_origin: Optional[np.ndarray] = None
+        exit_plane_origin: Optional[np.ndarray] = None
+
+        nbrs = index.neighbors(i)
+        caps = nbrs[index.surface_kind[nbrs] == SURFACE_PLANE]
+        if caps.size:
+            s = index.plane_normal[caps] @ axis
+            for j, sj in zip(caps[np.abs(s) >= 0.9], s[np.abs(s) >= 0.9]):
+                if sj > 0:
                     # Normal points along axis -> exit
-                    exit_id = fid
-                    exit_plane_origin = origin
+                    exit_id = index.face_id(j)
+                    exit_plane_origin = index.plane_origin[j]
                 else:
-                    entry_id = fid
-                    entry_plane_origin = origin
+                    entry_id = index.face_id(j)
+                    entry_plane_origin = index.plane_origin[j]
 
         # Compute depth from cap plane origins if both present
         depth = depth_est
-        if entry_plane_origin and exit_plane_origin:
-            depth = abs(
-                (exit_plane_origin[0] - entry_plane_origin[0]) * axis_vec[0]
-                + (exit_plane_origin[1] - entry_plane_origin[1]) * axis_vec[1]
-                + (exit_plane_origin[2] - entry_plane_origin[2]) * axis_vec[2]
-            )
+        if entry_plane_origin is not None and exit_plane_origin is not None:
+            depth = abs(float((exit_plane_origin - entry_plane_origin) @ axis))
 
         hole_type = "through" if entry_id and exit_id else "blind"
 
@@ -123,6 +77,7 @@ def extract_holes_from_shape(shape) -> List[HoleFeature]:
                 entry_face_id=int(entry_id) if entry_id else None,
                 exit_face_id=int(exit_id) if exit_id else None,
                 tri_indices=[],
+                face_id=index.face_id(i),
             )
         )
         idx += 1
@@ -1,61 +1,124 @@
 from __future__ import annotations
-from typing import List, Tuple
+from typing import Callable, List, Optional
 import numpy as np
 
 from ..models import MinWallData, MinWallSample
+from .bvh import TriangleBVH
+
+MAX_REPORTED_SAMPLES = 50
+REFINE_MARGIN = 2.0  # refine faces whose coarse thickness is within 2x the threshold
+REFINE_SAMPLES_PER_FACE = 8
+
+RayCaster = Callable[[np.ndarray, np.ndarray], np.ndarray]
 
 
 def min_wall_mesh(mesh, *, samples: int = 5000, threshold_mm: float = 1.5) -> MinWallData:
-    """Approximate min-wall thickness on a mesh using ray casting along face normals.
-    This is a heuristic and depends on mesh quality.
+    """Approximate min-wall thickness on a mesh by casting rays inward along face normals.
+    A coarse pass samples up to ``samples`` faces; faces near ``threshold_mm`` are
+    then refined with extra points. This is a heuristic and depends on mesh quality.
     """
-    # Sample points uniformly on surface
-    pts, face_index = mesh.sample(samples, return_index=True)
-    face_normals = mesh.face_normals[face_index]
+    face_thickness = face_thickness_map(mesh, samples=samples, threshold_mm=threshold_mm)
+    return min_wall_from_thickness(mesh, face_thickness, threshold_mm=threshold_mm)
 
-    # Build ray intersector (triangle-based, no pyembree dependency)
-    try:
-        from trimesh.ray.ray_triangle import RayMeshIntersector
-        intersector = RayMeshIntersector(mesh)
-    except Exception:
-        # Fallback: no ray intersector available; return empty result
+
+def min_wall_from_thickness(mesh, face_thickness: Optional[np.ndarray], *, threshold_mm: float = 1.5) -> MinWallData:
+    """Summarize a per-face thickness map (see face_thickness_map) into MinWallData."""
+    if face_thickness is None:
+        return MinWallData(global_min_mm=0.0, samples=[])
+    finite = np.isfinite(face_thickness)
+    if not finite.any():
         return MinWallData(global_min_mm=0.0, samples=[])
 
-    # Cast rays forward and backward and measure first hit distances
-    origins = pts
-    directions_f = face_normals
-    directions_b = -face_normals
+    global_min = float(np.min(face_thickness[finite]))
+    # Collect sub-threshold faces, thinnest first
+    limit = max(threshold_mm, global_min)
+    thin = np.flatnonzero(finite & (face_thickness <= limit))
+    thin = thin[np.argsort(face_thickness[thin])]
 
-    # Add small epsilon to origins to avoid self-hit
-    eps = 1e-6
-    origins_f = origins + directions_f * eps
-    origins_b = origins + directions_b * eps
+    centers = mesh.triangles_center
+    samples_out: List[MinWallSample] = []
+    for f in thin[:MAX_REPORTED_SAMPLES]:
+        p = centers[f]
+        samples_out.append(
+            MinWallSample(
+                at=(float(p[0]), float(p[1]), float(p[2])),
+                thickness_mm=float(face_thickness[f]),
+                face_ids=[int(f)],
+            )
+        )
 
-    dists_f = _first_hit_distance(intersector, origins_f, directions_f)
-    dists_b = _first_hit_distance(intersector, origins_b, directions_b)
+    face_min = {int(f): float(face_thickness[f]) for f in thin}
+    return MinWallData(global_min_mm=global_min, samples=samples_out, face_min_mm=face_min)
 
-    total = dists_f + dists_b
-    # Filter valid finite values
-    valid = np.isfinite(total)
-    total = total[valid]
-    origins_valid = origins[valid]
 
-    if total.size == 0:
-        return MinWallData(global_min_mm=0.0, samples=[])
+def face_thickness_map(
+    mesh,
+    *,
+    samples: int = 5000,
+    threshold_mm: float = 1.5,
+    faces: Optional[np.ndarray] = None,
+) -> Optional[np.ndarray]:
+    """Return per-face wall thickness (mm); inf for faces whose inward ray escapes, nan if unsampled.
+    Pass ``faces`` to only measure those faces (the sampling budget then applies to them).
+    """
+    cast = build_ray_caster(mesh)
+    if cast is None:
+        return None
 
-    global_min = float(np.min(total))
-    # Collect sub-threshold samples
-    mask = total <= max(threshold_mm, global_min)
-    chosen_pts = origins_valid[mask]
-    chosen_d = total[mask]
+    n_faces = len(mesh.faces)
+    thickness = np.full(n_faces, np.nan)
+    normals = np.asarray(mesh.face_normals, dtype=float)
+    triangles = np.asarray(mesh.triangles, dtype=float)
 
-    samples_out: List[MinWallSample] = []
-    for i in range(min(50, chosen_pts.shape[0])):
-        p = chosen_pts[i]
-        t = float(chosen_d[i])
-        samples_out.append(MinWallSample(at=(float(p[0]), float(p[1]), float(p[2])), thickness_mm=t, face_ids=[]))
+    # Coarse pass: one ray per face centroid (area-weighted subset on dense meshes)
+    candidates = np.arange(n_faces) if faces is None else np.asarray(faces, dtype=np.int64)
+    if candidates.size <= samples:
+        faces = candidates
+    else:
+        area = np.asarray(mesh.area_faces, dtype=float)[candidates]
+        # Degenerate (zero-area) faces cannot be drawn, so the sample may be smaller than the budget
+        weighted = area > 0
+        candidates, area = candidates[weighted], area[weighted]
+        rng = np.random.default_rng(0)
+        size = min(samples, candidates.size)
+        faces = np.unique(rng.choice(candidates, size=size, replace=False, p=area / area.sum())) if size else candidates
+    points = triangles[faces].mean(axis=1)
+    thickness[faces] = _inward_distance(cast, points, normals[faces])
 
-    return MinWallData(global_min_mm=global_min, samples=samples_out)
+    # Refinement: extra barycentric samples only on faces near the threshold
+    near = faces[np.isfinite(thickness[faces]) & (thickness[faces] <= threshold_mm * REFINE_MARGIN)]
+    if near.size:
+        rr = np.repeat(near, REFINE_SAMPLES_PER_FACE)
+        rng = np.random.default_rng(1)
+        uv = rng.random((rr.size, 2))
+        flip = uv.sum(axis=1) > 1.0
+        uv[flip] = 1.0 - uv[flip]
+        tri = triangles[rr]
+        pts = tri[:, 0] + uv[:, :1] * (tri[:, 1] - tri[:, 0]) + uv[:, 1:] * (tri[:, 2] - tri[:, 0])
+        d = _inward_distance(cast, pts, normals[rr])
+        np.fmin.at(thickness, rr, d)
+    return thickness
+
+
+def build_ray_caster(mesh) -> Optional[RayCaster]:
+    """Return a first-hit distance function, preferring Embree when installed."""
+    try:
+        from trimesh.ray.ray_pyembree import RayMeshIntersector
+        intersector = RayMeshIntersector(mesh)
+        return lambda origins, directions: _first_hit_distance(intersector, origins, directions)
+    except Exception:
+        pass
+    try:
+        bvh = TriangleBVH(np.asarray(mesh.triangles, dtype=float))
+    except Exception:
+        return None
+    return lambda origins, directions: bvh.intersects_first(origins, directions)[0]
+
+
+def _inward_distance(cast: RayCaster, points: np.ndarray, normals: np.ndarray) -> np.ndarray:
+    # Offset origins slightly to avoid self-hits on the source face
+    eps = 1e-6
+    return cast(points - normals * eps, -normals)
 
 
 def _first_hit_distance(intersector, origins: np.ndarray, directions: np.ndarray) -> np.ndarray:
@@ -70,4 +133,3 @@ def _first_hit_distance(intersector, origins: np.ndarray, directions: np.ndarray
     d = np.linalg.norm(vec, axis=1)
     distances[index_ray] = d
     return distances
-
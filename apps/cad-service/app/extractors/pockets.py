@@ -1,98 +1,102 @@
 from __future__ import annotations
-from typing import List
+import math
+from typing import List, Optional
+
+import numpy as np
 
 from ..models import PocketFeature
+from .topology import SURFACE_PLANE, ShapeIndex
+
+CONCAVE_TOL_MM = 1e-3
 
 
-def extract_pockets_from_shape(shape) -> List[PocketFeature]:
-    """Detect simple planar pockets: planar floor with perpendicular side walls.
+def extract_pockets_from_shape(
+    shape, index: Optional[ShapeIndex] = None, faces: Optional[np.ndarray] = None
+) -> List[PocketFeature]:
+    """Detect simple planar pockets: planar floor enclosed by perpendicular side walls.
     Returns a conservative list to reduce false positives.
+    Pass a prebuilt ShapeIndex to share topology traversal with other extractors,
+    and ``faces`` (0-based indices) to only examine those faces.
     """
-    try:
-        from OCC.Core.TopExp import TopExp_Explorer, TopExp
-        from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_EDGE
-        from OCC.Core.BRep import BRep_Tool
-        from OCC.Core.Geom import Geom_Plane
-        from OCC.Core.TopTools import TopTools_IndexedMapOfShape, TopTools_IndexedDataMapOfShapeListOfShape
-        from OCC.Core.GProp import GProp_GProps
-        from OCC.Core.BRepGProp import brepgprop_SurfaceProperties
-    except Exception:
+    if index is None:
+        index = ShapeIndex.build(shape)
+    if index is None:
         return []
 
-    face_map = TopTools_IndexedMapOfShape()
-    TopExp.MapShapes(shape, TopAbs_FACE, face_map)
-
-    edge_faces = TopTools_IndexedDataMapOfShapeListOfShape()
-    TopExp.MapShapesAndAncestors(shape, TopAbs_EDGE, TopAbs_FACE, edge_faces)
-
     pockets: List[PocketFeature] = []
     idx = 1
 
-    exp = TopExp_Explorer(shape, TopAbs_FACE)
-    while exp.More():
-        face = exp.Current()
-        exp.Next()
-        surf = BRep_Tool.Surface(face)
-        plane = Geom_Plane.DownCast(surf)
-        if plane is None:
+    candidates = index.faces_of_kind(SURFACE_PLANE)
+    if faces is not None:
+        candidates = np.intersect1d(candidates, faces)
+    for i in candidates:
+        # Count vertical walls (planar neighbors with normals ~ perpendicular to floor)
+        nbrs = index.neighbors(i)
+        walls = nbrs[index.surface_kind[nbrs] == SURFACE_PLANE]
+        if walls.size < 2:
             continue
-
-        # Collect neighbor faces
-        neighbor_faces = set()
-        edge_exp = TopExp_Explorer(face, TopAbs_EDGE)
-        while edge_exp.More():
-            edge = edge_exp.Current()
-            edge_exp.Next()
-            if edge_faces.Contains(edge):
-                lst = edge_faces.FindFromKey(edge)
-                it = lst.cbegin()
-                while it.More():
-                    f2 = it.Value()
-                    it.Next()
-                    if f2.IsSame(face):
-                        continue
-                    neighbor_faces.add(f2)
-
-        # Count vertical walls (neighbor faces with normals ~ perpendicular to floor)
-        floor_n = plane.Pln().Axis().Direction()
-        fn = (floor_n.X(), floor_n.Y(), floor_n.Z())
-
-        def dot(a, b):
-            return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
-
-        vertical_neighbors = 0
-        for nf in neighbor_faces:
-            nsurf = BRep_Tool.Surface(nf)
-            p2 = Geom_Plane.DownCast(nsurf)
-            if p2 is None:
-                continue
-            n2 = p2.Pln().Axis().Direction()
-            n2v = (n2.X(), n2.Y(), n2.Z())
-            if abs(dot(fn, n2v)) <= 0.2:  # ~90 degrees
-                vertical_neighbors += 1
-
-        if vertical_neighbors < 2:
+        dots = index.plane_normal[walls] @ index.plane_normal[i]
+        vertical = walls[np.abs(dots) <= 0.2]  # ~90 degrees
+        if vertical.size < 2:
+            continue
+        # Outer faces of a block also have perpendicular neighbours; only walls that
+        # rise above the floor and face back over it make a pocket
+        vertical = pocket_walls(index, i, vertical)
+        if vertical.size < 2:
             continue
 
-        # Compute area as mouth area
-        props = GProp_GProps()
-        try:
-            brepgprop_SurfaceProperties(face, props)
-            mouth_area = float(props.Mass()) * 1e6  # m^2 -> mm^2
-        except Exception:
-            mouth_area = 0.0
-
-        # Depth is not trivial; placeholder 0.0 for now
-        floor_id = face_map.FindIndex(face)
+        depth = pocket_depth_mm(index, i, vertical)
+        mouth_area = index.face_area_mm2(i)
         pockets.append(
             PocketFeature(
                 id=f"P-{idx:03d}",
-                planar_face_ids=[int(floor_id)],
-                depth_mm=0.0,
+                planar_face_ids=[index.face_id(i)],
+                depth_mm=depth,
                 mouth_area_mm2=mouth_area,
-                aspect_ratio=0.0,
+                # Depth over a width approximated from the floor area
+                aspect_ratio=depth / math.sqrt(mouth_area) if mouth_area > 0 else 0.0,
             )
         )
         idx += 1
 
     return pockets
+
+
+def pocket_walls(index: ShapeIndex, floor: int, walls: np.ndarray) -> np.ndarray:
+    """Walls meeting the floor at a concave edge that bounds it.
+
+    A pocket wall rises from the floor on its open side (along the floor's
+    outward normal), and the whole floor lies in front of the wall rather than
+    around it (which would be the base of a boss).
+    """
+    floor_vertices = index.face_vertices(floor)
+    if floor_vertices.size == 0:
+        return walls[:0]
+    normal = index.outward_normal(floor)
+    keep = []
+    for w in walls:
+        w = int(w)
+        vertices = index.face_vertices(w)
+        if vertices.size == 0:
+            continue
+        heights = (vertices - index.plane_origin[floor]) @ normal
+        if heights.min() < -CONCAVE_TOL_MM or heights.max() <= CONCAVE_TOL_MM:
+            continue
+        ahead = (floor_vertices - index.plane_origin[w]) @ index.outward_normal(w)
+        if ahead.min() < -CONCAVE_TOL_MM:
+            continue
+        keep.append(w)
+    return np.asarray(keep, dtype=walls.dtype)
+
+
+def pocket_depth_mm(index: ShapeIndex, floor: int, walls: np.ndarray) -> float:
+    """Height of the tallest side wall above the floor plane, from the walls' vertices."""
+    depth = 0.0
+    normal = index.outward_normal(floor)
+    for w in walls:
+        vertices = index.face_vertices(int(w))
+        if vertices.size == 0:
+            continue
+        heights = (vertices - index.plane_origin[floor]) @ normal
+        depth = max(depth, float(heights.max()))
+    return depth
@@ -0,0 +1,310 @@
+"""Incremental re-analysis of revised parts.
+
+Analyses that name a base revision, or ask for ``keep_revision_state``, store
+a revision state next to their metrics: per-face fingerprints (see
+``ShapeIndex.fingerprints``; per-triangle for meshes) plus the per-face
+results. When a new revision names its predecessor, faces whose
+fingerprint is unchanged reuse the predecessor's results and only the changed
+region is recomputed:
+
+- holes/pockets are keyed by the fingerprints of their anchor face and its
+  neighbours, so a feature is reused only if none of the faces it was derived
+  from moved;
+- min-wall thickness is reused for unchanged triangles whose inward ray cannot
+  reach the changed region (its bounding box, including removed geometry).
+
+``revision_diff`` compares two states and lists added/removed features.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..models import HoleFeature, HoleTable, PocketFeature, PocketTable
+from .holes import extract_holes_from_shape
+from .pockets import extract_pockets_from_shape
+from .min_wall import face_thickness_map
+from .topology import FINGERPRINT_TOL_MM, ShapeIndex, hash_rows
+
+STATE_KIND_BREP = "brep"
+STATE_KIND_MESH = "mesh"
+
+
+def _uint64(values) -> np.ndarray:
+    return np.asarray(values if values is not None else [], dtype=np.uint64)
+
+
+def _lookup(keys: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """Position of each key in ``table``, or -1. Keys that occur twice in ``table`` are ambiguous and miss."""
+    if table.size == 0 or keys.size == 0:
+        return np.full(keys.shape[0], -1, dtype=np.int64)
+    order = np.argsort(table, kind="stable")
+    sorted_table = table[order]
+    pos = np.clip(np.searchsorted(sorted_table, keys), 0, table.size - 1)
+    found = sorted_table[pos] == keys
+    unique = np.ones(table.size, dtype=bool)
+    unique[1:] &= sorted_table[1:] != sorted_table[:-1]
+    unique[:-1] &= sorted_table[:-1] != sorted_table[1:]
+    found &= unique[pos]
+    return np.where(found, order[pos], -1)
+
+
+# --- B-rep: holes and pockets ----------------------------------------------
+
+
+def neighborhood_keys(index: ShapeIndex) -> np.ndarray:
+    """Per-face key over the face's own fingerprint and its neighbours' (order independent)."""
+    fps = index.fingerprints()
+    counts = np.diff(index.adj_offsets)
+    owners = np.repeat(np.arange(index.face_count), counts)
+    neighbor_fps = fps[index.adj_indices]
+    summed = np.zeros(index.face_count, dtype=np.uint64)
+    xored = np.zeros(index.face_count, dtype=np.uint64)
+    np.add.at(summed, owners, neighbor_fps)
+    np.bitwise_xor.at(xored, owners, neighbor_fps)
+    return hash_rows(np.column_stack([fps, summed, xored, counts.astype(np.uint64)]).view(np.int64))
+
+
+def brep_state(index: ShapeIndex, holes: List[HoleFeature], pockets: List[PocketFeature]) -> dict:
+    keys = neighborhood_keys(index)
+    return {
+        "kind": STATE_KIND_BREP,
+        "fingerprints": index.fingerprints(),
+        "holes": {"keys": keys[[h.face_id - 1 for h in holes]], **HoleTable.from_features(holes).columns()},
+        "pockets": {"keys": keys[[p.planar_face_ids[0] - 1 for p in pockets]],
+                    **PocketTable.from_features(pockets).columns()},
+    }
+
+
+def incremental_brep_features(
+    shape, index: ShapeIndex, base_state: dict
+) -> Tuple[List[HoleFeature], List[PocketFeature], dict]:
+    """Holes and pockets for a revision, reusing the base revision's unchanged features."""
+    fps = index.fingerprints()
+    keys = neighborhood_keys(index)
+    base_fps = _uint64(base_state.get("fingerprints"))
+    # Base face id -> face id in this revision (0 when the face changed)
+    base_to_new = np.zeros(base_fps.size + 1, dtype=np.int64)
+    base_to_new[1:] = _lookup(base_fps, fps) + 1
+
+    def remap(face_id) -> Optional[int]:
+        face_id = int(face_id)
+        if face_id <= 0 or face_id >= base_to_new.size:
+            return None
+        return int(base_to_new[face_id]) or None
+
+    base_holes = HoleTable.from_columns(base_state["holes"]).to_features()
+    hole_pos = _lookup(_uint64(base_state["holes"].get("keys")), keys)
+    reused_holes: Dict[int, HoleFeature] = {}
+    for hole, pos in zip(base_holes, hole_pos):
+        if pos < 0:
+            continue
+        hole.face_id = int(pos) + 1
+        hole.entry_face_id = remap(hole.entry_face_id or 0)
+        hole.exit_face_id = remap(hole.exit_face_id or 0)
+        reused_holes[hole.face_id] = hole
+
+    base_pockets = PocketTable.from_columns(base_state["pockets"]).to_features()
+    pocket_pos = _lookup(_uint64(base_state["pockets"].get("keys")), keys)
+    reused_pockets: Dict[int, PocketFeature] = {}
+    for pocket, pos in zip(base_pockets, pocket_pos):
+        if pos < 0:
+            continue
+        faces = [remap(f) for f in pocket.planar_face_ids]
+        if None in faces:
+            continue
+        pocket.planar_face_ids = faces
+        reused_pockets[faces[0]] = pocket
+
+    # A face is only re-examined if its own or a neighbour's fingerprint changed
+    unchanged = base_to_new[1:][base_to_new[1:] > 0] - 1
+    settled = np.zeros(index.face_count, dtype=bool)
+    settled[unchanged] = True
+    counts = np.diff(index.adj_offsets)
+    owners = np.repeat(np.arange(index.face_count), counts)
+    np.logical_and.at(settled, owners, settled[index.adj_indices].copy())
+    stale = np.flatnonzero(~settled)
+    stale = np.setdiff1d(stale, np.fromiter(list(reused_holes) + list(reused_pockets), np.int64) - 1)
+
+    fresh_holes = extract_holes_from_shape(shape, index, faces=stale)
+    fresh_pockets = extract_pockets_from_shape(shape, index, faces=stale)
+
+    # Same order and numbering as a full extraction: by anchor face
+    holes = sorted(list(reused_holes.values()) + fresh_holes, key=lambda h: h.face_id)
+    for n, hole in enumerate(holes, start=1):
+        hole.id = f"H-{n:03d}"
+    pockets = sorted(list(reused_pockets.values()) + fresh_pockets, key=lambda p: p.planar_face_ids[0])
+    for n, pocket in enumerate(pockets, start=1):
+        pocket.id = f"P-{n:03d}"
+
+    stats = {
+        "faces_total": index.face_count,
+        "faces_reused": int(unchanged.size),
+        "faces_recomputed": int(stale.size),
+        "holes_reused": len(reused_holes),
+        "pockets_reused": len(reused_pockets),
+    }
+    return holes, pockets, stats
+
+
+# --- Meshes: min-wall thickness ---------------------------------------------
+
+
+def mesh_fingerprints(mesh) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-triangle fingerprints, centroids and bounding radii.
+
+    Vertices are sorted inside each triangle so re-exported meshes that only
+    rotate vertex order still match.
+    """
+    triangles = np.asarray(mesh.triangles, dtype=float)
+    q = np.rint(triangles / FINGERPRINT_TOL_MM).astype(np.int64)
+    order = np.argsort(hash_rows(q.reshape(-1, 3)).reshape(-1, 3), axis=1)
+    q = np.take_along_axis(q, order[:, :, None], axis=1).reshape(-1, 9)
+    centroids = triangles.mean(axis=1)
+    radii = np.linalg.norm(triangles - centroids[:, None, :], axis=2).max(axis=1)
+    return hash_rows(q), centroids.astype(np.float32), radii.astype(np.float32)
+
+
+def mesh_state(fps: np.ndarray, centroids: np.ndarray, radii: np.ndarray, thickness: Optional[np.ndarray]) -> dict:
+    return {
+        "kind": STATE_KIND_MESH,
+        "fingerprints": fps,
+        "centroids": centroids,
+        "radii": radii,
+        "thickness": thickness.astype(np.float32) if thickness is not None else None,
+    }
+
+
+def _segments_hit_box(
+    origins: np.ndarray, directions: np.ndarray, lengths: np.ndarray, lo: np.ndarray, hi: np.ndarray
+) -> np.ndarray:
+    """Slab test: does the segment origin + t*direction, 0 <= t <= length, touch [lo, hi]?"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = 1.0 / directions
+        t0 = (lo - origins) * inv
+        t1 = (hi - origins) * inv
+    t_near = np.nanmax(np.minimum(t0, t1), axis=1)
+    t_far = np.nanmin(np.maximum(t0, t1), axis=1)
+    return (t_near <= t_far) & (t_far >= 0.0) & (t_near <= lengths)
+
+
+def incremental_face_thickness(
+    mesh,
+    fps: np.ndarray,
+    centroids: np.ndarray,
+    radii: np.ndarray,
+    base_state: dict,
+    *,
+    samples: int = 5000,
+    threshold_mm: float = 1.5,
+) -> Tuple[Optional[np.ndarray], dict]:
+    """Per-face thickness for a revised mesh, re-casting only rays that can see the changed region."""
+    base_fps = _uint64(base_state.get("fingerprints"))
+    base_thickness = base_state.get("thickness")
+    pos = _lookup(fps, base_fps)
+    unchanged = pos >= 0
+    n_faces = fps.size
+    if base_thickness is None or not unchanged.any():
+        thickness = face_thickness_map(mesh, samples=samples, threshold_mm=threshold_mm)
+        return thickness, {"faces_total": n_faces, "faces_reused": 0, "faces_recomputed": n_faces}
+
+    # Changed region: added triangles here plus triangles that disappeared from the base
+    removed = np.ones(base_fps.size, dtype=bool)
+    removed[pos[unchanged]] = False
+    base_centroids = np.asarray(base_state["centroids"], dtype=float)
+    base_radii = np.asarray(base_state["radii"], dtype=float)
+    region_points = np.concatenate([centroids[~unchanged], base_centroids[removed]])
+    region_radii = np.concatenate([radii[~unchanged], base_radii[removed]])
+
+    thickness = np.full(n_faces, np.nan)
+    thickness[unchanged] = np.asarray(base_thickness, dtype=float)[pos[unchanged]]
+    recompute = ~unchanged
+    if region_points.size:
+        lo = (region_points - region_radii[:, None]).min(axis=0)
+        hi = (region_points + region_radii[:, None]).max(axis=0)
+        keep = np.flatnonzero(unchanged)
+        # Refinement rays start anywhere on the triangle, so pad the box by its radius
+        pad = radii[keep].astype(float)[:, None]
+        extent = float(np.linalg.norm(np.ptp(np.asarray(mesh.bounds, dtype=float), axis=0))) + 1.0
+        lengths = thickness[keep].copy()
+        lengths[~np.isfinite(lengths)] = extent  # escaped or unsampled: the ray runs through the whole part
+        normals = np.asarray(mesh.face_normals, dtype=float)[keep]
+        hits = _segments_hit_box(centroids[keep].astype(float), -normals, lengths, lo - pad, hi + pad)
+        recompute[keep[hits]] = True
+
+    faces = np.flatnonzero(recompute)
+    if faces.size:
+        fresh = face_thickness_map(mesh, samples=samples, threshold_mm=threshold_mm, faces=faces)
+        if fresh is None:
+            return None, {"faces_total": n_faces, "faces_reused": 0, "faces_recomputed": 0}
+        thickness[faces] = fresh[faces]
+    stats = {
+        "faces_total": n_faces,
+        "faces_reused": int(n_faces - faces.size),
+        "faces_recomputed": int(faces.size),
+    }
+    return thickness, stats
+
+
+# --- Diff -------------------------------------------------------------------
+
+
+def _feature_changes(base: Optional[dict], current: Optional[dict], describe) -> dict:
+    base_keys = _uint64((base or {}).get("keys"))
+    keys = _uint64((current or {}).get("keys"))
+    added = np.flatnonzero(_lookup(keys, base_keys) < 0)
+    removed = np.flatnonzero(_lookup(base_keys, keys) < 0)
+    return {
+        "added": [describe(current, int(i)) for i in added],
+        "removed": [describe(base, int(i)) for i in removed],
+        "unchanged": int(keys.size - added.size),
+    }
+
+
+def _describe_hole(columns: dict, i: int) -> dict:
+    return {
+        "id": f"H-{i + 1:03d}",
+        "face_id": int(np.asarray(columns.get("face_id", [0] * (i + 1)))[i]) or None,
+        "diameter_mm": float(np.asarray(columns["diameter_mm"])[i]),
+        "depth_mm": float(np.asarray(columns["depth_mm"])[i]),
+        "through": bool(np.asarray(columns["through"])[i]),
+    }
+
+
+def _describe_pocket(columns: dict, i: int) -> dict:
+    offsets = np.asarray(columns["face_offsets"])
+    return {
+        "id": f"P-{i + 1:03d}",
+        "face_ids": np.asarray(columns["face_ids"])[offsets[i]:offsets[i + 1]].tolist(),
+        "depth_mm": float(np.asarray(columns["depth_mm"])[i]),
+        "mouth_area_mm2": float(np.asarray(columns["mouth_area_mm2"])[i]),
+    }
+
+
+def _global_min(thickness) -> Optional[float]:
+    if thickness is None:
+        return None
+    values = np.asarray(thickness, dtype=float)
+    finite = values[np.isfinite(values)]
+    return float(finite.min()) if finite.size else None
+
+
+def revision_diff(base_state: dict, state: dict) -> dict:
+    """Faces and features that differ between two revision states."""
+    base_fps = _uint64(base_state.get("fingerprints"))
+    fps = _uint64(state.get("fingerprints"))
+    added = int((_lookup(fps, base_fps) < 0).sum())
+    removed = int((_lookup(base_fps, fps) < 0).sum())
+    diff = {
+        "faces": {"added": added, "removed": removed, "unchanged": int(fps.size - added)},
+    }
+    if state.get("kind") == STATE_KIND_BREP and base_state.get("kind") == STATE_KIND_BREP:
+        diff["holes"] = _feature_changes(base_state.get("holes"), state.get("holes"), _describe_hole)
+        diff["pockets"] = _feature_changes(base_state.get("pockets"), state.get("pockets"), _describe_pocket)
+    if state.get("kind") == STATE_KIND_MESH and base_state.get("kind") == STATE_KIND_MESH:
+        diff["min_wall"] = {
+            "before_mm": _global_min(base_state.get("thickness")),
+            "after_mm": _global_min(state.get("thickness")),
+        }
+    return diff
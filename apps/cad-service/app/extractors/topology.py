@@ -0,0 +1,251 @@
+from __future__ import annotations
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+SURFACE_OTHER = 0
+SURFACE_PLANE = 1
+SURFACE_CYLINDER = 2
+
+FINGERPRINT_TOL_MM = 1e-3  # geometry closer than this is treated as unchanged between revisions
+FINGERPRINT_TOL_DIR = 1e-6
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def hash_rows(values: np.ndarray) -> np.ndarray:
+    """FNV-1a style 64-bit hash of each row of an integer matrix."""
+    values = np.atleast_2d(np.asarray(values)).astype(np.int64).view(np.uint64)
+    h = np.full(values.shape[0], _FNV_OFFSET, dtype=np.uint64)
+    for column in values.T:
+        h ^= column
+        h *= _FNV_PRIME
+    return h
+
+
+def _canonical_direction(d: np.ndarray) -> np.ndarray:
+    """Flip directions so the first significant component is positive (axes have no sign)."""
+    d = np.array(d, dtype=float)
+    significant = np.abs(d) > FINGERPRINT_TOL_DIR
+    first = np.where(significant.any(axis=1), significant.argmax(axis=1), 0)
+    sign = np.sign(d[np.arange(len(d)), first])
+    sign[sign == 0] = 1.0
+    return d * sign[:, None]
+
+
+class ShapeIndex:
+    """Topology index of a TopoDS_Shape, built once and shared by extractors.
+
+    Faces are addressed by 0-based position ``i``; ``face_id(i)`` returns the
+    1-based id used by OCC indexed maps (and by HoleFeature/PocketFeature).
+    Surface parameters are stored as flat NumPy arrays and face adjacency as a
+    CSR pair (``adj_offsets``, ``adj_indices``), so extractors never walk the
+    B-rep or downcast surfaces again.
+    """
+
+    def __init__(
+        self,
+        faces: list,
+        surface_kind: np.ndarray,
+        plane_origin: np.ndarray,
+        plane_normal: np.ndarray,
+        face_sign: np.ndarray,
+        cyl_radius: np.ndarray,
+        cyl_axis: np.ndarray,
+        cyl_origin: np.ndarray,
+        adj_offsets: np.ndarray,
+        adj_indices: np.ndarray,
+    ):
+        self.faces = faces
+        self.surface_kind = surface_kind
+        self.plane_origin = plane_origin
+        self.plane_normal = plane_normal
+        self.face_sign = face_sign
+        self.cyl_radius = cyl_radius
+        self.cyl_axis = cyl_axis
+        self.cyl_origin = cyl_origin
+        self.adj_offsets = adj_offsets
+        self.adj_indices = adj_indices
+        self._uv_bounds: dict[int, Optional[Tuple[float, float, float, float]]] = {}
+        self._areas: dict[int, float] = {}
+        self._vertices: dict[int, np.ndarray] = {}
+        self._fingerprints: Optional[np.ndarray] = None
+
+    @property
+    def face_count(self) -> int:
+        return len(self.faces)
+
+    @staticmethod
+    def face_id(i: int) -> int:
+        return int(i) + 1
+
+    def neighbors(self, i: int) -> np.ndarray:
+        return self.adj_indices[self.adj_offsets[i]:self.adj_offsets[i + 1]]
+
+    def outward_normal(self, i: int) -> np.ndarray:
+        """Plane normal pointing away from the material (surface normal flipped for reversed faces)."""
+        return self.plane_normal[i] * self.face_sign[i]
+
+    def faces_of_kind(self, kind: int) -> np.ndarray:
+        return np.flatnonzero(self.surface_kind == kind)
+
+    def uv_bounds(self, i: int) -> Optional[Tuple[float, float, float, float]]:
+        if i not in self._uv_bounds:
+            try:
+                from OCC.Core.BRepTools import breptools_UVBounds
+                umin, umax, vmin, vmax = breptools_UVBounds(self.faces[i])
+                self._uv_bounds[i] = (float(umin), float(umax), float(vmin), float(vmax))
+            except Exception:
+                self._uv_bounds[i] = None
+        return self._uv_bounds[i]
+
+    def face_area_mm2(self, i: int) -> float:
+        if i not in self._areas:
+            try:
+                from OCC.Core.GProp import GProp_GProps
+                from OCC.Core.BRepGProp import brepgprop_SurfaceProperties
+                props = GProp_GProps()
+                brepgprop_SurfaceProperties(self.faces[i], props)
+                # STEPControl_Reader converts to millimetres, so this is already mm^2
+                self._areas[i] = float(props.Mass())
+            except Exception:
+                self._areas[i] = 0.0
+        return self._areas[i]
+
+    def face_vertices(self, i: int) -> np.ndarray:
+        """(k, 3) positions of the face's B-rep vertices; empty if they cannot be read."""
+        if i not in self._vertices:
+            try:
+                from OCC.Core.BRep import BRep_Tool
+                from OCC.Core.TopAbs import TopAbs_VERTEX
+                from OCC.Core.TopExp import TopExp
+                from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+                from OCC.Core.TopoDS import topods
+                vertex_map = TopTools_IndexedMapOfShape()
+                TopExp.MapShapes(self.faces[i], TopAbs_VERTEX, vertex_map)
+                points = [BRep_Tool.Pnt(topods.Vertex(vertex_map.FindKey(k)))
+                          for k in range(1, vertex_map.Extent() + 1)]
+                self._vertices[i] = np.array([(p.X(), p.Y(), p.Z()) for p in points], dtype=float).reshape(-1, 3)
+            except Exception:
+                self._vertices[i] = np.zeros((0, 3), dtype=float)
+        return self._vertices[i]
+
+    def fingerprints(self) -> np.ndarray:
+        """Per-face uint64 fingerprint of surface type, surface parameters and face bounds.
+
+        Quantized to FINGERPRINT_TOL_MM, so an untouched face hashes the same in
+        the next revision of a part even though its position in the face map
+        may change.
+        """
+        if self._fingerprints is None:
+            n = self.face_count
+            bounds = np.zeros((n, 6), dtype=float)
+            try:
+                from OCC.Core.Bnd import Bnd_Box
+                from OCC.Core.BRepBndLib import brepbndlib_Add
+                for i, face in enumerate(self.faces):
+                    box = Bnd_Box()
+                    brepbndlib_Add(face, box)
+                    bounds[i] = box.Get()
+            except Exception:
+                pass
+            # Planes by (normal, offset) and cylinders by (axis, radius, axis line), not by
+            # their arbitrary parametrization origin
+            plane_offset = np.einsum("ij,ij->i", self.plane_normal, self.plane_origin)
+            axis = _canonical_direction(self.cyl_axis)
+            axis_point = self.cyl_origin - np.einsum("ij,ij->i", self.cyl_origin, axis)[:, None] * axis
+            lengths = np.column_stack([plane_offset, self.cyl_radius, axis_point, bounds]) / FINGERPRINT_TOL_MM
+            directions = np.column_stack([self.plane_normal, axis]) / FINGERPRINT_TOL_DIR
+            record = np.column_stack([self.surface_kind.astype(np.int64), np.rint(lengths), np.rint(directions)])
+            self._fingerprints = hash_rows(record)
+        return self._fingerprints
+
+    @classmethod
+    def build(cls, shape) -> Optional["ShapeIndex"]:
+        """Index faces, surface parameters and adjacency. Returns None without pythonOCC."""
+        try:
+            from OCC.Core.TopExp import TopExp
+            from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_EDGE, TopAbs_REVERSED
+            from OCC.Core.BRep import BRep_Tool
+            from OCC.Core.Geom import Geom_CylindricalSurface, Geom_Plane
+            from OCC.Core.TopTools import TopTools_IndexedMapOfShape, TopTools_IndexedDataMapOfShapeListOfShape
+        except Exception:
+            return None
+
+        face_map = TopTools_IndexedMapOfShape()
+        TopExp.MapShapes(shape, TopAbs_FACE, face_map)
+        n = face_map.Extent()
+
+        faces: list = []
+        surface_kind = np.zeros(n, dtype=np.int8)
+        plane_origin = np.zeros((n, 3), dtype=float)
+        plane_normal = np.zeros((n, 3), dtype=float)
+        face_sign = np.ones(n, dtype=float)
+        cyl_radius = np.zeros(n, dtype=float)
+        cyl_axis = np.zeros((n, 3), dtype=float)
+        cyl_origin = np.zeros((n, 3), dtype=float)
+
+        for i in range(n):
+            face = face_map.FindKey(i + 1)
+            faces.append(face)
+            if face.Orientation() == TopAbs_REVERSED:
+                face_sign[i] = -1.0
+            surf = BRep_Tool.Surface(face)
+            plane = Geom_Plane.DownCast(surf)
+            if plane is not None:
+                surface_kind[i] = SURFACE_PLANE
+                d = plane.Pln().Axis().Direction()
+                loc = plane.Location()
+                plane_normal[i] = (d.X(), d.Y(), d.Z())
+                plane_origin[i] = (loc.X(), loc.Y(), loc.Z())
+                continue
+            cyl = Geom_CylindricalSurface.DownCast(surf)
+            if cyl is not None:
+                surface_kind[i] = SURFACE_CYLINDER
+                c = cyl.Cylinder()
+                d = c.Axis().Direction()
+                loc = c.Location()
+                cyl_radius[i] = c.Radius()
+                cyl_axis[i] = (d.X(), d.Y(), d.Z())
+                cyl_origin[i] = (loc.X(), loc.Y(), loc.Z())
+
+        # Edge -> faces ancestry, flattened into undirected face pairs
+        edge_faces = TopTools_IndexedDataMapOfShapeListOfShape()
+        TopExp.MapShapesAndAncestors(shape, TopAbs_EDGE, TopAbs_FACE, edge_faces)
+        pairs: List[Tuple[int, int]] = []
+        for e in range(1, edge_faces.Extent() + 1):
+            owners: List[int] = []
+            it = edge_faces.FindFromIndex(e).cbegin()
+            while it.More():
+                fi = face_map.FindIndex(it.Value()) - 1
+                it.Next()
+                if fi >= 0 and fi not in owners:
+                    owners.append(fi)
+            for a in range(len(owners)):
+                for b in range(a + 1, len(owners)):
+                    pairs.append((owners[a], owners[b]))
+                    pairs.append((owners[b], owners[a]))
+
+        adj_offsets, adj_indices = _to_csr(pairs, n)
+        return cls(
+            faces,
+            surface_kind,
+            plane_origin,
+            plane_normal,
+            face_sign,
+            cyl_radius,
+            cyl_axis,
+            cyl_origin,
+            adj_offsets,
+            adj_indices,
+        )
+
+
+def _to_csr(pairs: List[Tuple[int, int]], n: int) -> Tuple[np.ndarray, np.ndarray]:
+    if not pairs:
+        return np.zeros(n + 1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    arr = np.unique(np.asarray(pairs, dtype=np.int64), axis=0)  # sorted by source, deduplicated
+    counts = np.bincount(arr[:, 0], minlength=n)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, arr[:, 1].astype(np.int32)
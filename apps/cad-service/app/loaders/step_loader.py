@@ -1,8 +1,11 @@
 from __future__ import annotations
+from functools import lru_cache
 from typing import Any
 
 
+@lru_cache(maxsize=1)
 def occ_available() -> bool:
+    """Whether pythonOCC imports; memoized so hot paths do not retry the import."""
     try:
         import OCC
         return True
@@ -30,16 +33,18 @@ def load_step_shape(path: str):
 
 
 def shape_mass_props(shape) -> tuple[float, float]:
-    """Return (volume_mm3, surface_area_mm2) for a TopoDS_Shape."""
+    """Return (volume_mm3, surface_area_mm2) for a TopoDS_Shape.
+    STEPControl_Reader converts to millimetres, so OCC's values need no scaling.
+    """
     from OCC.Core.GProp import GProp_GProps
     from OCC.Core.BRepGProp import brepgprop_VolumeProperties, brepgprop_SurfaceProperties
 
     props = GProp_GProps()
     brepgprop_VolumeProperties(shape, props)
-    vol = props.Mass() * 1e9  # m^3 -> mm^3 if kernel returns SI
+    vol = props.Mass()
 
     props2 = GProp_GProps()
     brepgprop_SurfaceProperties(shape, props2)
-    area = props2.Mass() * 1e6  # m^2 -> mm^2
+    area = props2.Mass()
     return float(vol), float(area)
 
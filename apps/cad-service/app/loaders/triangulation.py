@@ -0,0 +1,260 @@
+"""In-memory triangulation of OCC shapes.
+
+After ``BRepMesh_IncrementalMesh`` every face carries a ``Poly_Triangulation``.
+Reading those directly into preallocated NumPy arrays avoids writing an STL to
+disk and parsing it back, keeps vertices shared within each face, and records
+which B-rep face every triangle came from (``face_ids`` match
+``ShapeIndex.face_id``), so viewer highlights map back onto features.
+
+``auto_tessellate`` picks the linear deflection from the part's bounding-box
+diagonal and a triangle budget instead of a fixed absolute value: a coarse
+estimation pass counts triangles, and since the count on curved faces grows
+roughly as 1/deflection the final deflection is extrapolated from it.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from itertools import chain
+from typing import Callable, Iterator, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_TRIANGLE_BUDGET = int(os.getenv("TESSELLATION_TRIANGLE_BUDGET", "400000"))
+AUTO_ANGULAR_DEFLECTION = 0.5  # radians
+# Deflection bounds relative to the bbox diagonal; the estimation pass runs at the coarsest
+MIN_RELATIVE_DEFLECTION = 1e-4
+MAX_RELATIVE_DEFLECTION = 1e-2
+BUDGET_TOLERANCE = 1.5  # re-mesh once if the estimate overshoots the budget by more than this
+FACE_BATCH = int(os.getenv("TESSELLATION_FACE_BATCH", "64"))
+
+ProgressCallback = Callable[[int, int], None]  # (faces done, faces total)
+CancelCheck = Callable[[], bool]
+
+
+class TessellationCancelled(RuntimeError):
+    pass
+
+
+@dataclass(slots=True)
+class TessellationPlan:
+    linear_deflection: float  # mm, absolute
+    angular_deflection: float  # radians
+    diagonal_mm: float
+    target_triangles: int
+    triangles: int  # actual count after meshing
+
+
+@dataclass(slots=True)
+class TriangulatedShape:
+    vertices: np.ndarray  # float64 (n, 3)
+    triangles: np.ndarray  # int32 (m, 3), indices into vertices
+    face_ids: np.ndarray  # int32 (m,), 1-based B-rep face per triangle
+
+    @property
+    def triangle_count(self) -> int:
+        return int(self.triangles.shape[0])
+
+    def to_trimesh(self):
+        import trimesh
+        return trimesh.Trimesh(
+            vertices=self.vertices,
+            faces=self.triangles,
+            face_attributes={"face_id": self.face_ids},
+            process=False,
+        )
+
+
+def mesh_shape(
+    shape,
+    linear_deflection: float,
+    angular_deflection: float = 0.5,
+    *,
+    relative: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cancelled: Optional[CancelCheck] = None,
+) -> None:
+    """Tessellate ``shape`` in place (triangulations are stored on its faces).
+
+    BRepMesh meshes faces on OCC's own thread pool. With ``progress`` or
+    ``cancelled``, faces go through it in batches of FACE_BATCH, so progress is
+    reported and a cancel request honoured between batches. Edges shared with an
+    earlier batch keep their discretization, so seams stay conforming.
+    Raises TessellationCancelled when ``cancelled()`` turns true.
+    """
+    from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+    if progress is None and cancelled is None:
+        BRepMesh_IncrementalMesh(shape, linear_deflection, relative, angular_deflection, True).Perform()
+        return
+
+    from OCC.Core.BRep import BRep_Builder
+    from OCC.Core.TopoDS import TopoDS_Compound
+
+    faces = _faces(shape)
+    total = len(faces)
+    builder = BRep_Builder()
+    for start in range(0, total, FACE_BATCH):
+        if cancelled is not None and cancelled():
+            raise TessellationCancelled(f"Tessellation cancelled after {start} of {total} faces")
+        batch = TopoDS_Compound()
+        builder.MakeCompound(batch)
+        for face in faces[start:start + FACE_BATCH]:
+            builder.Add(batch, face)
+        BRepMesh_IncrementalMesh(batch, linear_deflection, relative, angular_deflection, True).Perform()
+        if progress is not None:
+            progress(min(start + FACE_BATCH, total), total)
+
+
+def _location_matrix(location) -> np.ndarray | None:
+    if location.IsIdentity():
+        return None
+    trsf = location.Transformation()
+    return np.array([[trsf.Value(r, c) for c in range(1, 5)] for r in range(1, 4)], dtype=float)
+
+
+def _faces(shape) -> list:
+    """Distinct faces in the same order as ShapeIndex, so ids agree across extractors and meshes."""
+    from OCC.Core.TopAbs import TopAbs_FACE
+    from OCC.Core.TopExp import TopExp
+    from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+    from OCC.Core.TopoDS import topods
+
+    face_map = TopTools_IndexedMapOfShape()
+    TopExp.MapShapes(shape, TopAbs_FACE, face_map)
+    return [topods.Face(face_map.FindKey(i)) for i in range(1, face_map.Extent() + 1)]
+
+
+def _face_triangulations(shape) -> list:
+    """(face id, triangulation, 3x4 location matrix or None, reversed) for each meshed face."""
+    from OCC.Core.BRep import BRep_Tool
+    from OCC.Core.TopAbs import TopAbs_REVERSED
+    from OCC.Core.TopLoc import TopLoc_Location
+
+    out = []
+    for i, face in enumerate(_faces(shape), start=1):
+        location = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation(face, location)
+        if triangulation is None or triangulation.NbTriangles() == 0:
+            continue
+        out.append((i, triangulation, _location_matrix(location), face.Orientation() == TopAbs_REVERSED))
+    return out
+
+
+# Neither pythonOCC nor OCP exposes Poly_Triangulation storage as a buffer, so
+# nodes and triangles are streamed through np.fromiter with as few binding calls
+# per element as possible (Coord()/Get() return all three values at once).
+# benchmarks/stages.py times this against the StlAPI_Writer round trip.
+
+
+def _face_nodes(tri, matrix: np.ndarray | None) -> np.ndarray:
+    n = tri.NbNodes()
+    coords = chain.from_iterable(tri.Node(k).Coord() for k in range(1, n + 1))
+    nodes = np.fromiter(coords, dtype=float, count=3 * n).reshape(n, 3)
+    if matrix is not None:
+        nodes = nodes @ matrix[:, :3].T + matrix[:, 3]
+    return nodes
+
+
+def _face_triangles(tri, reversed_: bool) -> np.ndarray:
+    n = tri.NbTriangles()
+    corners = chain.from_iterable(tri.Triangle(k).Get() for k in range(1, n + 1))
+    idx = np.fromiter(corners, dtype=np.int32, count=3 * n).reshape(n, 3)
+    if reversed_:
+        # Keep outward winding on reversed faces, as StlAPI_Writer does
+        idx[:, [1, 2]] = idx[:, [2, 1]]
+    return idx - 1  # 1-based -> 0-based, face-local
+
+
+def iter_face_meshes(shape) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """Yield (face id, vertices, face-local triangles) per meshed face, one face in memory at a time."""
+    for face_id, tri, matrix, reversed_ in _face_triangulations(shape):
+        yield face_id, _face_nodes(tri, matrix), _face_triangles(tri, reversed_)
+
+
+def triangle_count(shape) -> int:
+    return sum(tri.NbTriangles() for _, tri, _, _ in _face_triangulations(shape))
+
+
+def triangulation_arrays(shape) -> TriangulatedShape:
+    """Collect the per-face triangulations of an already meshed shape."""
+    faces = _face_triangulations(shape)
+    vertices = np.empty((sum(t.NbNodes() for _, t, _, _ in faces), 3), dtype=float)
+    triangles = np.empty((sum(t.NbTriangles() for _, t, _, _ in faces), 3), dtype=np.int32)
+    face_ids = np.empty(triangles.shape[0], dtype=np.int32)
+
+    v0 = t0 = 0
+    for face_id, tri, matrix, reversed_ in faces:
+        nv, nt = tri.NbNodes(), tri.NbTriangles()
+        vertices[v0:v0 + nv] = _face_nodes(tri, matrix)
+        triangles[t0:t0 + nt] = _face_triangles(tri, reversed_) + v0
+        face_ids[t0:t0 + nt] = face_id
+        v0 += nv
+        t0 += nt
+    return TriangulatedShape(vertices=vertices, triangles=triangles, face_ids=face_ids)
+
+
+def triangulate_shape(
+    shape,
+    linear_deflection: float,
+    angular_deflection: float = 0.5,
+    *,
+    relative: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    cancelled: Optional[CancelCheck] = None,
+) -> TriangulatedShape:
+    mesh_shape(shape, linear_deflection, angular_deflection, relative=relative, progress=progress, cancelled=cancelled)
+    return triangulation_arrays(shape)
+
+
+def bbox_diagonal(shape) -> float:
+    from OCC.Core.Bnd import Bnd_Box
+    from OCC.Core.BRepBndLib import brepbndlib_Add
+    box = Bnd_Box()
+    brepbndlib_Add(shape, box)
+    if box.IsVoid():
+        return 0.0
+    xmin, ymin, zmin, xmax, ymax, zmax = box.Get()
+    return float(np.linalg.norm([xmax - xmin, ymax - ymin, zmax - zmin]))
+
+
+def clear_triangulation(shape) -> None:
+    """Drop existing triangulations; BRepMesh only refines, it never coarsens in place."""
+    from OCC.Core.BRepTools import breptools_Clean
+    breptools_Clean(shape)
+
+
+def auto_tessellate(
+    shape,
+    target_triangles: Optional[int] = None,
+    *,
+    angular_deflection: float = AUTO_ANGULAR_DEFLECTION,
+    progress: Optional[ProgressCallback] = None,
+    cancelled: Optional[CancelCheck] = None,
+) -> TessellationPlan:
+    """Mesh ``shape`` in place with a deflection sized to its bbox and a triangle budget.
+    ``progress`` follows the final meshing pass; ``cancelled`` is checked throughout.
+    """
+    target = int(target_triangles or DEFAULT_TRIANGLE_BUDGET)
+    diagonal = bbox_diagonal(shape)
+    if diagonal <= 0.0:
+        mesh_shape(shape, 0.1, angular_deflection, progress=progress, cancelled=cancelled)
+        return TessellationPlan(0.1, angular_deflection, diagonal, target, triangle_count(shape))
+
+    lo, hi = diagonal * MIN_RELATIVE_DEFLECTION, diagonal * MAX_RELATIVE_DEFLECTION
+    # Estimation pass at the coarsest allowed deflection
+    mesh_shape(shape, hi, angular_deflection, cancelled=cancelled)
+    estimate = triangle_count(shape)
+    deflection = float(np.clip(hi * estimate / max(target, 1), lo, hi))
+    triangles = estimate
+    if deflection < hi:
+        mesh_shape(shape, deflection, angular_deflection, progress=progress, cancelled=cancelled)
+        triangles = triangle_count(shape)
+        if triangles > target * BUDGET_TOLERANCE:
+            deflection = min(hi, deflection * triangles / target)
+            clear_triangulation(shape)
+            mesh_shape(shape, deflection, angular_deflection, progress=progress, cancelled=cancelled)
+            triangles = triangle_count(shape)
+    elif progress is not None:
+        faces = len(_faces(shape))
+        progress(faces, faces)
+    return TessellationPlan(deflection, angular_deflection, diagonal, target, triangles)
@@ -6,6 +6,9 @@ from .routers import analyze, gltf, health
 from .workers.celery import celery_app
 from . import otel
 from . import logging_config
+from .utils.http_client import aclose_http_clients
+from .workers.bootstrap import preload_kernels
+from .workers.pool import shutdown_pool, warm_pool
 
 # Initialize OpenTelemetry first
 otel_initialized = False
@@ -52,6 +55,14 @@ def create_app():
     app.include_router(gltf.router, prefix="/gltf", tags=["gltf"])
     app.include_router(health.router, tags=["health"])
 
+    # Warm the kernels in the API process and start geometry workers before serving
+    app.add_event_handler("startup", preload_kernels)
+    app.add_event_handler("startup", warm_pool)
+
+    # Release pooled download/webhook connections
+    app.add_event_handler("shutdown", aclose_http_clients)
+    app.add_event_handler("shutdown", shutdown_pool)
+
     @app.get("/")
     async def root():
         return {"message": "CAD Service API", "version": "1.0.0"}
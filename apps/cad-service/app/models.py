@@ -2,11 +2,13 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import List, Literal, Tuple, Optional, Dict, Any
 
+import numpy as np
+
 
 HoleType = Literal["through", "blind"]
 
 
-@dataclass
+@dataclass(slots=True)
 class HoleFeature:
     id: str
     type: HoleType
@@ -16,9 +18,10 @@ class HoleFeature:
     entry_face_id: Optional[int] = None
     exit_face_id: Optional[int] = None
     tri_indices: List[int] = field(default_factory=list)
+    face_id: Optional[int] = None  # the cylindrical wall face
 
 
-@dataclass
+@dataclass(slots=True)
 class PocketFeature:
     id: str
     planar_face_ids: List[int]
@@ -27,33 +30,34 @@ class PocketFeature:
     aspect_ratio: float
 
 
-@dataclass
+@dataclass(slots=True)
 class MinWallSample:
     at: Tuple[float, float, float]
     thickness_mm: float
     face_ids: List[int]
 
 
-@dataclass
+@dataclass(slots=True)
 class MinWallData:
     global_min_mm: float
     samples: List[MinWallSample]
+    face_min_mm: Dict[int, float] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class MassProps:
     volume_mm3: float
     surface_area_mm2: float
 
 
-@dataclass
+@dataclass(slots=True)
 class BBox:
     x: float
     y: float
     z: float
 
 
-@dataclass
+@dataclass(slots=True)
 class FeaturesJson:
     version: str
     units: str
@@ -64,3 +68,130 @@ class FeaturesJson:
     min_wall: MinWallData
     source: Dict[str, Any]
 
+
+
+@dataclass(slots=True)
+class HoleTable:
+    """Columnar holes: row i of every array describes hole ``H-{i+1:03d}``.
+
+    Face ids use 0 for "no cap face". This is the wire/storage form; use
+    ``to_features`` for per-object access.
+    """
+    diameter_mm: np.ndarray  # float32 (n,)
+    depth_mm: np.ndarray  # float32 (n,)
+    axis: np.ndarray  # float32 (n, 3)
+    through: np.ndarray  # bool (n,)
+    entry_face_id: np.ndarray  # int32 (n,)
+    exit_face_id: np.ndarray  # int32 (n,)
+    face_id: np.ndarray  # int32 (n,)
+
+    def __len__(self) -> int:
+        return int(self.diameter_mm.shape[0])
+
+    @classmethod
+    def from_features(cls, holes: List[HoleFeature]) -> "HoleTable":
+        n = len(holes)
+        return cls(
+            diameter_mm=np.fromiter((h.diameter_mm for h in holes), np.float32, n),
+            depth_mm=np.fromiter((h.depth_mm for h in holes), np.float32, n),
+            axis=np.array([h.axis for h in holes], dtype=np.float32).reshape(n, 3),
+            through=np.fromiter((h.type == "through" for h in holes), np.bool_, n),
+            entry_face_id=np.fromiter((h.entry_face_id or 0 for h in holes), np.int32, n),
+            exit_face_id=np.fromiter((h.exit_face_id or 0 for h in holes), np.int32, n),
+            face_id=np.fromiter((h.face_id or 0 for h in holes), np.int32, n),
+        )
+
+    def to_features(self) -> List[HoleFeature]:
+        return [
+            HoleFeature(
+                id=f"H-{i + 1:03d}",
+                type="through" if self.through[i] else "blind",
+                diameter_mm=float(self.diameter_mm[i]),
+                depth_mm=float(self.depth_mm[i]),
+                axis=tuple(float(v) for v in self.axis[i]),
+                entry_face_id=int(self.entry_face_id[i]) or None,
+                exit_face_id=int(self.exit_face_id[i]) or None,
+                face_id=int(self.face_id[i]) or None,
+            )
+            for i in range(len(self))
+        ]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {
+            "diameter_mm": self.diameter_mm,
+            "depth_mm": self.depth_mm,
+            "axis": self.axis,
+            "through": self.through,
+            "entry_face_id": self.entry_face_id,
+            "exit_face_id": self.exit_face_id,
+            "face_id": self.face_id,
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any]) -> "HoleTable":
+        return cls(
+            diameter_mm=np.asarray(columns["diameter_mm"], dtype=np.float32),
+            depth_mm=np.asarray(columns["depth_mm"], dtype=np.float32),
+            axis=np.asarray(columns["axis"], dtype=np.float32).reshape(-1, 3),
+            through=np.asarray(columns["through"], dtype=np.bool_),
+            entry_face_id=np.asarray(columns["entry_face_id"], dtype=np.int32),
+            exit_face_id=np.asarray(columns["exit_face_id"], dtype=np.int32),
+            face_id=np.asarray(columns.get("face_id", np.zeros(len(columns["diameter_mm"]))), dtype=np.int32),
+        )
+
+
+@dataclass(slots=True)
+class PocketTable:
+    """Columnar pockets; floor face ids are stored CSR-style in ``face_ids``."""
+    depth_mm: np.ndarray  # float32 (n,)
+    mouth_area_mm2: np.ndarray  # float32 (n,)
+    aspect_ratio: np.ndarray  # float32 (n,)
+    face_offsets: np.ndarray  # int32 (n + 1,)
+    face_ids: np.ndarray  # int32 (face_offsets[-1],)
+
+    def __len__(self) -> int:
+        return int(self.depth_mm.shape[0])
+
+    @classmethod
+    def from_features(cls, pockets: List[PocketFeature]) -> "PocketTable":
+        n = len(pockets)
+        offsets = np.zeros(n + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum([len(p.planar_face_ids) for p in pockets], dtype=np.int64)
+        return cls(
+            depth_mm=np.fromiter((p.depth_mm for p in pockets), np.float32, n),
+            mouth_area_mm2=np.fromiter((p.mouth_area_mm2 for p in pockets), np.float32, n),
+            aspect_ratio=np.fromiter((p.aspect_ratio for p in pockets), np.float32, n),
+            face_offsets=offsets,
+            face_ids=np.array([f for p in pockets for f in p.planar_face_ids], dtype=np.int32),
+        )
+
+    def to_features(self) -> List[PocketFeature]:
+        return [
+            PocketFeature(
+                id=f"P-{i + 1:03d}",
+                planar_face_ids=self.face_ids[self.face_offsets[i]:self.face_offsets[i + 1]].tolist(),
+                depth_mm=float(self.depth_mm[i]),
+                mouth_area_mm2=float(self.mouth_area_mm2[i]),
+                aspect_ratio=float(self.aspect_ratio[i]),
+            )
+            for i in range(len(self))
+        ]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {
+            "depth_mm": self.depth_mm,
+            "mouth_area_mm2": self.mouth_area_mm2,
+            "aspect_ratio": self.aspect_ratio,
+            "face_offsets": self.face_offsets,
+            "face_ids": self.face_ids,
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any]) -> "PocketTable":
+        return cls(
+            depth_mm=np.asarray(columns["depth_mm"], dtype=np.float32),
+            mouth_area_mm2=np.asarray(columns["mouth_area_mm2"], dtype=np.float32),
+            aspect_ratio=np.asarray(columns["aspect_ratio"], dtype=np.float32),
+            face_offsets=np.asarray(columns["face_offsets"], dtype=np.int32),
+            face_ids=np.asarray(columns["face_ids"], dtype=np.int32),
+        )
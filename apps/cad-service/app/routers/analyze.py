@@ -1,6 +1,14 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import os
+import uuid
+
+from celery import chord, group
+from celery.exceptions import SoftTimeLimitExceeded
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 # from OCC.Core.BRepBndLib import brepbndlib_Add
 # from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
 # from OCC.Core.BRepGProp import brepgprop_VolumeProperties, brepgprop_SurfaceProperties
@@ -12,17 +20,37 @@ from typing import Optional
 # import numpy as np
 
 from ..workers.celery import celery_app
-from ..utils.download import download_to_temp
+from ..utils.download import download_file, download_file_async, sha256_of_file
+from ..utils.http_client import get_http_client
+from ..utils.result_cache import build_result_key, get_result_store
+from ..utils.singleflight import run_once_sync
 from ..utils.units import scale_to_mm
 from ..loaders.step_loader import occ_available, load_step_shape, shape_mass_props
 from ..loaders.stl_loader import load_stl, mesh_mass_props
 from ..extractors.holes import extract_holes_from_shape
 from ..extractors.pockets import extract_pockets_from_shape
-from ..extractors.min_wall import min_wall_mesh
-from ..models import FeaturesJson, BBox, MassProps, HoleFeature, PocketFeature, MinWallData
+from ..extractors.topology import ShapeIndex
+from ..extractors.min_wall import face_thickness_map, min_wall_from_thickness
+from ..extractors.revision import (
+    brep_state,
+    incremental_brep_features,
+    incremental_face_thickness,
+    mesh_fingerprints,
+    mesh_state,
+    revision_diff,
+    STATE_KIND_BREP,
+    STATE_KIND_MESH,
+)
+from ..workers.pool import run_in_pool
+from ..workers.routing import MemoryBudgetExceeded, route_for_source, workload_for_source
+from ..models import FeaturesJson, BBox, MassProps, HoleFeature, PocketFeature, MinWallData, HoleTable, PocketTable
+from ..utils.wire import decode_blob, encode_blob, negotiated_response, to_jsonable
 
 router = APIRouter()
 
+# Bump whenever analyze_file_path output changes so cached results are not reused.
+ANALYZER_VERSION = "6"
+
 class AnalysisRequest(BaseModel):
     file_id: str
     file_path: Optional[str] = None
@@ -30,6 +58,10 @@ class AnalysisRequest(BaseModel):
     units_hint: Optional[str] = None
     org_id: Optional[str] = None
     webhook_url: Optional[str] = None
+    file_size: Optional[int] = None  # bytes; used for queue routing when the file is remote
+    face_count: Optional[int] = None  # triangles (mesh) or B-rep faces, for the memory estimate
+    base_file_sha: Optional[str] = None  # sha256 of the previous revision, for incremental re-analysis
+    keep_revision_state: bool = False  # store per-face state so a later revision can name this file as its base
 
 class AnalysisResponse(BaseModel):
     file_id: str
@@ -40,16 +72,31 @@ def analyze_file_path(file_path: str, units_hint: Optional[str] = None) -> dict:
     """Analyze a CAD file (STEP/STL) and return normalized metrics.
     Returns a dict matching previous mock structure to limit integration changes.
     """
+    return analyze_with_state(file_path, units_hint)[0]
+
+def analyze_with_state(
+    file_path: str, units_hint: Optional[str] = None, base_state: Optional[dict] = None
+) -> Tuple[dict, dict, Optional[dict]]:
+    """Analyze a file and also return its revision state (see extractors.revision).
+    With the state of a previous revision, unchanged faces reuse its results;
+    the third value then reports what was reused.
+    """
     import os
     ext = os.path.splitext(file_path)[1].lower()
     scale = scale_to_mm(units_hint)
+    reuse = None
     if ext in (".stl",):
         mesh = load_stl(file_path, scale=scale)
         vol_mm3, area_mm2 = mesh_mass_props(mesh)
         bbox_min = mesh.bounds[0]
         bbox_max = mesh.bounds[1]
-        # Approximate min wall via ray casting
-        mw = min_wall_mesh(mesh)
+        # Approximate min wall via ray casting, re-casting only around changed triangles
+        fps, centroids, radii = mesh_fingerprints(mesh)
+        if base_state and base_state.get("kind") == STATE_KIND_MESH:
+            thickness, reuse = incremental_face_thickness(mesh, fps, centroids, radii, base_state)
+        else:
+            thickness = face_thickness_map(mesh)
+        mw = min_wall_from_thickness(mesh, thickness)
         metrics = {
             "volume": vol_mm3 / 1000.0,  # convert to cm^3 to keep parity with previous mock fields
             "surface_area": area_mm2 / 100.0,  # to cm^2
@@ -59,7 +106,7 @@ def analyze_file_path(file_path: str, units_hint: Optional[str] = None) -> dict:
             "primitive_features": {"holes": 0, "pockets": 0, "slots": 0, "faces": int(mesh.faces.shape[0])},
             "material_usage": None,
         }
-        return metrics
+        return metrics, mesh_state(fps, centroids, radii, thickness), reuse
     elif ext in (".step", ".stp"):
         if not occ_available():
             raise HTTPException(status_code=400, detail="STEP analysis requires pythonOCC; not available")
@@ -72,20 +119,107 @@ def analyze_file_path(file_path: str, units_hint: Optional[str] = None) -> dict:
         box = Bnd_Box()
         brepbndlib_Add(shape, box)
         xmin, ymin, zmin, xmax, ymax, zmax = box.Get()
-        holes = extract_holes_from_shape(shape)
-        pockets = extract_pockets_from_shape(shape)
+        # Walk the topology once and share it across extractors
+        index = ShapeIndex.build(shape)
+        if index is not None and base_state and base_state.get("kind") == STATE_KIND_BREP:
+            holes, pockets, reuse = incremental_brep_features(shape, index, base_state)
+        else:
+            holes = extract_holes_from_shape(shape, index)
+            pockets = extract_pockets_from_shape(shape, index)
         metrics = {
             "volume": vol_mm3 / 1000.0,
             "surface_area": area_mm2 / 100.0,
             "bbox": {"min": {"x": xmin, "y": ymin, "z": zmin}, "max": {"x": xmax, "y": ymax, "z": zmax}},
             "thickness": None,
             "primitive_features": {"holes": len(holes), "pockets": len(pockets)},
+            # Columnar NumPy arrays; msgpack-encoded on the wire when negotiated
+            "features": {
+                "holes": HoleTable.from_features(holes).columns(),
+                "pockets": PocketTable.from_features(pockets).columns(),
+            },
             "material_usage": None,
         }
-        return metrics
+        state = brep_state(index, holes, pockets) if index is not None else None
+        return metrics, state, reuse
     else:
         raise HTTPException(status_code=400, detail="Unsupported CAD format. Use STEP or STL.")
 
+def analysis_cache_key(file_sha: str, file_path: str, units_hint: Optional[str]) -> str:
+    import os
+    ext = os.path.splitext(file_path)[1].lower()
+    return build_result_key("analysis", file_sha, ext, units_hint or "mm", ANALYZER_VERSION)
+
+
+def revision_state_key(file_sha: str, file_path: str, units_hint: Optional[str]) -> str:
+    import os
+    ext = os.path.splitext(file_path)[1].lower()
+    return build_result_key("revision", file_sha, ext, units_hint or "mm", ANALYZER_VERSION)
+
+
+def analyze_file_cached(
+    file_path: str,
+    units_hint: Optional[str] = None,
+    *,
+    file_sha: Optional[str] = None,
+    base_sha: Optional[str] = None,
+    keep_revision_state: bool = False,
+) -> dict:
+    """Return metrics for a file, serving repeated uploads from the result store.
+    With ``base_sha`` (a previously analyzed revision of the same part), unchanged
+    faces reuse that revision's results and a ``revision_diff`` is attached.
+    Revision state is per face or triangle and about as large as the metrics, so
+    it is only stored for revisions and for files analyzed with ``keep_revision_state``.
+    """
+    sha = file_sha or sha256_of_file(file_path)
+    store = get_result_store()
+    key = analysis_cache_key(sha, file_path, units_hint)
+    state_key = revision_state_key(sha, file_path, units_hint)
+    base_key = revision_state_key(base_sha, file_path, units_hint) if base_sha and base_sha != sha else None
+    keep_state = keep_revision_state or base_key is not None
+    reuse: Optional[dict] = None
+
+    def load_state(k: Optional[str]) -> Optional[dict]:
+        if k is None:
+            return None
+        try:
+            return decode_blob(store.get(k))
+        except Exception:
+            return None
+
+    def compute() -> dict:
+        nonlocal reuse
+        metrics, state, reuse = analyze_with_state(file_path, units_hint, load_state(base_key))
+        try:
+            # State first: a visible result implies its state is there for later revisions
+            if keep_state and state is not None:
+                store.put(state_key, encode_blob(state))
+            store.put(key, encode_blob(metrics))
+        except Exception:
+            pass
+        return metrics
+
+    def ready() -> Optional[dict]:
+        if keep_state and not store.exists(state_key):
+            return None
+        return decode_blob(store.get(key))
+
+    metrics = ready()
+    if metrics is None:
+        # Identical uploads analyzed concurrently on other workers wait for the first result.
+        # A cached result without state (analyzed without keep_revision_state) is redone once.
+        flight = f"analysis:{key}:state" if keep_state else f"analysis:{key}"
+        metrics = run_once_sync(flight, compute, ready=ready)
+    if base_key is None:
+        return metrics
+
+    base_state, state = load_state(base_key), load_state(state_key)
+    diff = {"base_file_sha": base_sha, "available": base_state is not None and state is not None}
+    if diff["available"]:
+        diff.update(revision_diff(base_state, state))
+    if reuse is not None:
+        diff["reused"] = reuse
+    return {**metrics, "revision_diff": diff}
+
 def calculate_stock_size(bbox: dict, thickness: float = None) -> dict:
     """Calculate required stock material size."""
     x_size = bbox["max"]["x"] - bbox["min"]["x"]
@@ -105,53 +239,76 @@ def calculate_stock_size(bbox: dict, thickness: float = None) -> dict:
             "height": round(z_size + 15, 1)
         }
 
-@celery_app.task
-def analyze_file(file_id: str, file_path: str, units_hint: Optional[str] = None, file_url: Optional[str] = None, org_id: Optional[str] = None, webhook_url: Optional[str] = None):
+def analyze_source(
+    file_path: Optional[str],
+    units_hint: Optional[str] = None,
+    file_url: Optional[str] = None,
+    base_sha: Optional[str] = None,
+    keep_revision_state: bool = False,
+) -> dict:
+    """Resolve a local path (downloading file_url if needed) and return cached metrics.
+    A downloaded file is deleted afterwards; batches would otherwise fill the worker's disk.
+    """
+    if file_path:
+        return analyze_file_cached(file_path, units_hint, base_sha=base_sha, keep_revision_state=keep_revision_state)
+    if not file_url:
+        raise ValueError("file_path or file_url is required")
+    source = download_file(file_url)
     try:
-        local_path = file_path
-        if not local_path and file_url:
-            local_path = download_to_temp(file_url)
-        if not local_path:
-            raise ValueError("file_path or file_url is required")
+        return analyze_file_cached(
+            source.path, units_hint, file_sha=source.sha256, base_sha=base_sha, keep_revision_state=keep_revision_state
+        )
+    finally:
+        os.unlink(source.path)
+
+def post_webhook(webhook_url: str, payload: dict) -> None:
+    """Best-effort webhook delivery, HMAC-signed when GEOMETRY_WEBHOOK_SECRET is set."""
+    try:
+        headers = {'Content-Type': 'application/json'}
+        # Sign exactly the bytes that are sent
+        body = json.dumps(to_jsonable(payload))
+        secret = os.getenv('GEOMETRY_WEBHOOK_SECRET')
+        if secret:
+            headers['X-CAD-Webhook-Secret'] = secret
+            import hmac, hashlib
+            sig = hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+            headers['X-CAD-Webhook-Signature'] = f'sha256={sig}'
+        get_http_client().post(webhook_url, content=body, headers=headers, timeout=10.0)
+    except Exception:
+        pass
 
-        metrics = analyze_file_path(local_path, units_hint)
+@celery_app.task
+def analyze_file(file_id: str, file_path: str, units_hint: Optional[str] = None, file_url: Optional[str] = None, org_id: Optional[str] = None, webhook_url: Optional[str] = None, base_file_sha: Optional[str] = None, keep_revision_state: bool = False):
+    try:
+        metrics = analyze_source(file_path, units_hint, file_url, base_file_sha, keep_revision_state)
         # Fire-and-forget webhook if provided
         if webhook_url:
-            try:
-                import httpx
-                headers = {}
-                secret = None
-                try:
-                    import os
-                    secret = os.getenv('GEOMETRY_WEBHOOK_SECRET')
-                except Exception:
-                    secret = None
-                if secret:
-                    headers['X-CAD-Webhook-Secret'] = secret
-                payload = {
-                    "part_id": file_id,
-                    "org_id": org_id,
-                    "metrics": metrics,
-                    "file_url": file_url,
-                    "units_hint": units_hint,
-                    "loader": 'occ' if local_path.lower().endswith(('.step', '.stp')) else 'trimesh'
-                }
-                if secret:
-                    import hmac, hashlib, json
-                    body = json.dumps(payload)
-                    sig = hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
-                    headers['X-CAD-Webhook-Signature'] = f'sha256={sig}'
-                httpx.post(webhook_url, json=payload, headers=headers, timeout=10.0)
-            except Exception:
-                pass
+            post_webhook(webhook_url, {
+                "part_id": file_id,
+                "org_id": org_id,
+                "metrics": metrics,
+                "file_url": file_url,
+                "units_hint": units_hint,
+                "loader": 'occ' if (file_path or file_url or "").lower().split("?")[0].endswith(('.step', '.stp')) else 'trimesh'
+            })
         return {"file_id": file_id, "metrics": metrics}
+    except SoftTimeLimitExceeded:
+        return {"error": "Analysis exceeded its time limit"}
     except Exception as e:
         return {"error": str(e)}
 
 @router.post("/", response_model=AnalysisResponse)
 async def analyze_cad_file(request: AnalysisRequest):
-    # Queue the analysis task
-    task = analyze_file.delay(request.file_id, request.file_path or "", request.units_hint, request.file_url, request.org_id, request.webhook_url)
+    # Queue the analysis task on the queue for its workload class (mesh / OCC / large OCC)
+    try:
+        route = route_for_source(request.file_path, request.file_url, request.file_size, request.face_count)
+    except MemoryBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    task = analyze_file.apply_async(
+        (request.file_id, request.file_path or "", request.units_hint, request.file_url, request.org_id,
+         request.webhook_url, request.base_file_sha, request.keep_revision_state),
+        **route,
+    )
     
     return {
         "file_id": request.file_id,
@@ -160,27 +317,304 @@ async def analyze_cad_file(request: AnalysisRequest):
     }
 
 @router.get("/{task_id}", response_model=AnalysisResponse)
-async def get_analysis_result(task_id: str):
+async def get_analysis_result(task_id: str, http_request: Request):
     task = analyze_file.AsyncResult(task_id)
     
     if task.ready():
         result = task.get()
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
-        return result
+        return negotiated_response(http_request, result)
     else:
         raise HTTPException(status_code=202, detail="Analysis in progress")
 
 @router.post("/sync", response_model=AnalysisResponse)
-async def analyze_cad_file_sync(request: AnalysisRequest):
+async def analyze_cad_file_sync(request: AnalysisRequest, http_request: Request):
     """Synchronous analysis for immediate results (smaller files)."""
     try:
+        # Files that would need the large-memory workers are not run in the API's pool
+        if workload_for_source(request.file_path, request.file_url, request.file_size, request.face_count) == "occ-large":
+            raise HTTPException(status_code=413, detail="File is too large for synchronous analysis; use POST /analyze/")
         local_path = request.file_path
+        file_sha = None
+        downloaded = False
         if not local_path and request.file_url:
-            local_path = download_to_temp(request.file_url)
+            source = await download_file_async(request.file_url)
+            local_path, file_sha = source.path, source.sha256
+            downloaded = True
         if not local_path:
             raise HTTPException(status_code=400, detail="file_path or file_url is required")
-        metrics = analyze_file_path(local_path, request.units_hint)
-        return {"file_id": request.file_id, "metrics": metrics}
+        try:
+            # OCC/trimesh work runs in the geometry pool so the event loop stays responsive
+            metrics = await run_in_pool(
+                analyze_file_cached, local_path, request.units_hint, file_sha=file_sha, base_sha=request.base_file_sha,
+                keep_revision_state=request.keep_revision_state,
+            )
+        finally:
+            if downloaded:
+                os.unlink(local_path)
+        return negotiated_response(http_request, {"file_id": request.file_id, "metrics": metrics})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+# --- Batch analysis -------------------------------------------------------
+# One Celery task per unique file (group), aggregated by a chord callback.
+# Progress is derived from the per-part task states, which are pre-assigned
+# ids recorded in a small manifest in the result store. Any API replica may
+# serve the progress endpoints, so batches need a shared store (see
+# get_result_store) and are refused with 503 without one.
+
+BATCH_MAX_FILES = int(os.getenv("ANALYZE_BATCH_MAX_FILES", "500"))
+BATCH_POLL_INTERVAL_S = float(os.getenv("ANALYZE_BATCH_POLL_INTERVAL_S", "1.0"))
+BATCH_HEARTBEAT_S = 15.0
+# The event stream gives up after this long, or when every part has finished
+# but the aggregate has not appeared within the grace period
+BATCH_STREAM_TIMEOUT_S = float(os.getenv("ANALYZE_BATCH_STREAM_TIMEOUT_S", str(3 * 3600)))
+BATCH_AGGREGATE_GRACE_S = float(os.getenv("ANALYZE_BATCH_AGGREGATE_GRACE_S", "60"))
+
+class BatchFile(BaseModel):
+    file_id: str
+    file_path: Optional[str] = None
+    file_url: Optional[str] = None
+    sha256: Optional[str] = None  # lets identical uploads collapse before download
+    units_hint: Optional[str] = None
+    file_size: Optional[int] = None
+    face_count: Optional[int] = None
+
+class BatchAnalysisRequest(BaseModel):
+    files: List[BatchFile]
+    units_hint: Optional[str] = None
+    org_id: Optional[str] = None
+    webhook_url: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    batch_id: str
+    total_files: int
+    unique_files: int
+
+def batch_dedupe_key(file: BatchFile, units_hint: Optional[str]) -> str:
+    source = f"sha256:{file.sha256.lower()}" if file.sha256 else (file.file_url or file.file_path or "")
+    return f"{source}|{units_hint or 'mm'}"
+
+def batch_manifest_key(batch_id: str) -> str:
+    return f"analysis-batch-{batch_id}"
+
+@celery_app.task
+def analyze_batch_part(key: str, file_path: Optional[str], units_hint: Optional[str] = None, file_url: Optional[str] = None):
+    try:
+        return {"key": key, "metrics": analyze_source(file_path, units_hint, file_url)}
+    except SoftTimeLimitExceeded:
+        return {"key": key, "error": "Analysis exceeded its time limit"}
+    except Exception as e:
+        return {"key": key, "error": str(e)}
+
+def aggregate_batch_results(batch_id: str, members: Dict[str, List[str]], part_results: List[dict], rejected: Optional[Dict[str, str]] = None) -> dict:
+    """Fan per-unique-file results back out to every file_id and total them."""
+    by_key = {r.get("key"): r for r in part_results if r}
+    for key, error in (rejected or {}).items():
+        by_key[key] = {"key": key, "error": error}
+    results = []
+    totals = {"volume": 0.0, "surface_area": 0.0, "holes": 0, "pockets": 0}
+    succeeded = failed = 0
+    for key, file_ids in members.items():
+        part = by_key.get(key) or {"error": "missing result"}
+        for i, file_id in enumerate(file_ids):
+            entry = {"file_id": file_id}
+            if i:
+                entry["duplicate_of"] = file_ids[0]
+            if "metrics" in part:
+                metrics = part["metrics"]
+                entry["metrics"] = metrics
+                succeeded += 1
+                totals["volume"] += metrics.get("volume") or 0.0
+                totals["surface_area"] += metrics.get("surface_area") or 0.0
+                features = metrics.get("primitive_features") or {}
+                totals["holes"] += features.get("holes") or 0
+                totals["pockets"] += features.get("pockets") or 0
+            else:
+                entry["error"] = part.get("error")
+                failed += 1
+            results.append(entry)
+    return {
+        "batch_id": batch_id,
+        "total_files": succeeded + failed,
+        "unique_files": len(members),
+        "succeeded": succeeded,
+        "failed": failed,
+        "totals": totals,
+        "results": results,
+    }
+
+@celery_app.task
+def aggregate_batch(part_results: List[dict], batch_id: str, members: Dict[str, List[str]], org_id: Optional[str] = None, webhook_url: Optional[str] = None, rejected: Optional[Dict[str, str]] = None):
+    aggregate = aggregate_batch_results(batch_id, members, part_results, rejected)
+    if webhook_url:
+        post_webhook(webhook_url, {"batch_id": batch_id, "org_id": org_id, "result": aggregate})
+    return aggregate
+
+def batch_snapshot(manifest: dict, done: Optional[Dict[str, dict]] = None) -> dict:
+    """Current progress of a batch: counts plus the parts finished so far.
+    Pass the previous ``parts`` as ``done`` to skip re-polling finished tasks.
+    """
+    done = dict(done or {})
+    for key, error in manifest.get("rejected", {}).items():
+        done.setdefault(key, {"key": key, "error": error})
+    for key, task_id in manifest["part_tasks"].items():
+        if key in done:
+            continue
+        result = celery_app.AsyncResult(task_id)
+        if result.ready():
+            done[key] = result.result if isinstance(result.result, dict) else {"key": key, "error": str(result.result)}
+    aggregate = celery_app.AsyncResult(manifest["aggregate_id"])
+    result = error = None
+    if aggregate.ready():
+        if aggregate.successful() and isinstance(aggregate.result, dict):
+            result = aggregate.result
+        else:
+            # Failed or revoked callback; the result holds the exception
+            error = f"Batch aggregation failed: {aggregate.result or aggregate.state}"
+    return {
+        "batch_id": manifest["batch_id"],
+        "total_files": manifest["total_files"],
+        "unique_files": len(manifest["members"]),
+        "completed": len(done),
+        "failed": sum(1 for r in done.values() if "error" in r),
+        "parts": done,
+        "result": result,
+        "error": error,
+    }
+
+def load_batch_manifest(batch_id: str) -> dict:
+    manifest = get_result_store().get_json(batch_manifest_key(batch_id))
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return manifest
+
+@router.post("/batch", response_model=BatchAnalysisResponse)
+async def analyze_batch(request: BatchAnalysisRequest):
+    """Queue a multi-part analysis; identical files within the batch are analyzed once."""
+    if not request.files:
+        raise HTTPException(status_code=400, detail="files must not be empty")
+    if len(request.files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_FILES} files per batch")
+    store = get_result_store()
+    if not store.shared:
+        # A per-host store would leave other replicas unable to find the manifest
+        raise HTTPException(
+            status_code=503,
+            detail="Batch analysis needs a shared result store "
+                   "(RESULT_CACHE_BACKEND=redis or RESULT_CACHE_SHARED=1 on a shared volume)",
+        )
+
+    members: Dict[str, List[str]] = {}
+    sources: Dict[str, BatchFile] = {}
+    for file in request.files:
+        if not (file.file_path or file.file_url):
+            raise HTTPException(status_code=400, detail=f"{file.file_id}: file_path or file_url is required")
+        units = file.units_hint or request.units_hint
+        key = batch_dedupe_key(file, units)
+        members.setdefault(key, []).append(file.file_id)
+        sources.setdefault(key, file)
+
+    # Files over every memory budget are reported as failed parts instead of queued
+    routes: Dict[str, dict] = {}
+    rejected: Dict[str, str] = {}
+    for key, src in sources.items():
+        try:
+            routes[key] = route_for_source(src.file_path, src.file_url, src.file_size, src.face_count)
+        except MemoryBudgetExceeded as e:
+            rejected[key] = str(e)
+
+    batch_id = str(uuid.uuid4())
+    part_tasks = {key: str(uuid.uuid4()) for key in routes}
+    manifest = {
+        "batch_id": batch_id,
+        "total_files": len(request.files),
+        "members": members,
+        "part_tasks": part_tasks,
+        "rejected": rejected,
+        "aggregate_id": batch_id,
+    }
+    await asyncio.to_thread(store.put_json, batch_manifest_key(batch_id), manifest)
+
+    def dispatch() -> None:
+        callback = aggregate_batch.s(batch_id, members, request.org_id, request.webhook_url, rejected).set(task_id=batch_id)
+        if not routes:
+            callback.apply_async(args=([],))
+            return
+        header = group(
+            analyze_batch_part.s(key, src.file_path or "", src.units_hint or request.units_hint, src.file_url).set(
+                task_id=part_tasks[key], **routes[key]
+            )
+            for key, src in sources.items()
+            if key in routes
+        )
+        chord(header)(callback)
+
+    # Publishing to the broker blocks; keep it off the event loop
+    await asyncio.to_thread(dispatch)
+    return {"batch_id": batch_id, "total_files": len(request.files), "unique_files": len(members)}
+
+@router.get("/batch/{batch_id}")
+async def get_batch(batch_id: str, http_request: Request):
+    """Progress snapshot; ``result`` holds the aggregate once every part has finished."""
+    manifest = await asyncio.to_thread(load_batch_manifest, batch_id)
+    return negotiated_response(http_request, await asyncio.to_thread(batch_snapshot, manifest))
+
+@router.get("/batch/{batch_id}/events")
+async def stream_batch(batch_id: str):
+    """Server-sent events: ``part`` per finished file, ``progress`` counts, then ``result``.
+    The stream ends with an ``error`` event instead when the aggregate fails, does not
+    appear within BATCH_AGGREGATE_GRACE_S of the last part, or BATCH_STREAM_TIMEOUT_S passes.
+    """
+    manifest = await asyncio.to_thread(load_batch_manifest, batch_id)
+
+    def sse(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(to_jsonable(data), separators=(',', ':'))}\n\n"
+
+    def progress(snapshot: dict) -> dict:
+        return {k: snapshot[k] for k in ("completed", "failed", "unique_files", "total_files")}
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        seen = set()
+        parts: Dict[str, dict] = {}
+        started = last_sent = loop.time()
+        parts_done_at: Optional[float] = None
+        while True:
+            snapshot = await asyncio.to_thread(batch_snapshot, manifest, parts)
+            parts = snapshot["parts"]
+            new_parts = [k for k in snapshot["parts"] if k not in seen]
+            for key in new_parts:
+                seen.add(key)
+                yield sse("part", {"file_ids": manifest["members"][key], **snapshot["parts"][key]})
+            if new_parts:
+                yield sse("progress", progress(snapshot))
+                last_sent = loop.time()
+            if snapshot["result"] is not None:
+                yield sse("result", snapshot["result"])
+                return
+            now = loop.time()
+            error = snapshot["error"]
+            if error is None and snapshot["completed"] >= snapshot["unique_files"]:
+                # The chord failed or the aggregate result expired; it will not show up
+                parts_done_at = parts_done_at if parts_done_at is not None else now
+                if now - parts_done_at > BATCH_AGGREGATE_GRACE_S:
+                    error = "All parts finished but the batch aggregate is not available"
+            if error is None and now - started > BATCH_STREAM_TIMEOUT_S:
+                error = f"Batch did not finish within {BATCH_STREAM_TIMEOUT_S:.0f}s"
+            if error is not None:
+                yield sse("error", {"batch_id": batch_id, "error": error, **progress(snapshot)})
+                return
+            if now - last_sent > BATCH_HEARTBEAT_S:
+                yield ": keep-alive\n\n"
+                last_sent = now
+            await asyncio.sleep(BATCH_POLL_INTERVAL_S)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
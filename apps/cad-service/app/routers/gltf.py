@@ -1,28 +1,30 @@
 from __future__ import annotations
 
 import hashlib
-import json
 import os
-import tempfile
-from pathlib import Path
-from typing import Literal
+from typing import Callable, Literal
 
-from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
 from ..workers.celery import celery_app
-from ..utils.download import download_to_temp, sha256_of_file
+from ..utils.download import DownloadResult, download_file_async
+from ..utils.result_cache import get_result_store
 from ..loaders.stl_loader import load_stl
 from ..loaders.step_loader import occ_available, load_step_shape
+from ..loaders.triangulation import auto_tessellate, triangulate_shape, triangulation_arrays
+from ..utils.glb import pack_progressive_glb
+from ..utils.singleflight import get_singleflight
+from ..workers.pool import run_in_pool
 
 router = APIRouter()
 
 GLB_MIME_TYPE = "model/gltf-binary"
 CACHE_CONTROL_HEADER = "public, max-age=3600"
-CACHE_DIR = Path("/tmp/gltf-cache")
 DEFAULT_LODS: tuple[str, ...] = ("low", "med", "high")
 LOD_TARGETS: dict[str, int] = {"low": 50_000, "med": 150_000, "high": 400_000}
-STEP_DEFLECTION_BY_LOD: dict[str, float] = {"low": 0.5, "med": 0.2, "high": 0.05}
+PROGRESSIVE_LOD = "progressive"
 MISSING_FILE_URL_ERROR = "file_url is required"
 
 
@@ -37,12 +39,8 @@ class GltfResponse(BaseModel):
     task_id: str
 
 
-def ensure_cache_dir() -> None:
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def resolve_lod(lod: str | None) -> Literal["low", "med", "high"]:
-    if lod in LOD_TARGETS:
+def resolve_lod(lod: str | None) -> Literal["low", "med", "high", "progressive"]:
+    if lod in LOD_TARGETS or lod == PROGRESSIVE_LOD:
         return lod  # type: ignore[return-value]
     return "high"
 
@@ -55,12 +53,68 @@ def build_mesh_key(prefix: str, file_sha: str, lod: str, target: int) -> str:
     return f"{prefix}-{file_sha}-{lod}-{target}"
 
 
-def mesh_cache_path(cache_key: str) -> Path:
-    return CACHE_DIR / f"{cache_key}.glb"
+def mesh_store_key(cache_key: str) -> str:
+    return f"{cache_key}.glb"
+
+
+def metadata_store_key(cache_key: str) -> str:
+    return f"{cache_key}.json"
+
+
+def read_mesh(cache_key: str) -> bytes | None:
+    try:
+        return get_result_store().get(mesh_store_key(cache_key))
+    except Exception:
+        return None
+
+
+def write_mesh(cache_key: str, glb_bytes: bytes) -> None:
+    try:
+        get_result_store().put(mesh_store_key(cache_key), glb_bytes)
+    except Exception:
+        pass
+
+
+def mesh_etag(cache_key: str) -> str:
+    return f'"{cache_key}"'
 
 
-def metadata_cache_path(cache_key: str) -> Path:
-    return CACHE_DIR / f"{cache_key}.json"
+def etag_matches(request: Request, cache_key: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    etag = mesh_etag(cache_key)
+    tags = {tag.strip() for tag in header.split(",")}
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def serve_mesh(request: Request, cache_key: str) -> Response | None:
+    """Serve a cached GLB, or None on a miss.
+
+    Disk-cached meshes go through FileResponse, which streams from the file
+    (or hands the path to servers supporting ``http.response.pathsend``) and
+    answers Range requests, so the GLB is never buffered whole in Python.
+    ETag is the mesh version; a matching If-None-Match yields 304.
+    """
+    headers = {
+        "X-Mesh-Version": cache_key,
+        "Cache-Control": CACHE_CONTROL_HEADER,
+        "ETag": mesh_etag(cache_key),
+    }
+    try:
+        path = get_result_store().local_path(mesh_store_key(cache_key))
+    except Exception:
+        path = None
+    if path is not None:
+        if etag_matches(request, cache_key):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, media_type=GLB_MIME_TYPE, headers=headers)
+    glb_bytes = read_mesh(cache_key)
+    if glb_bytes is None:
+        return None
+    if etag_matches(request, cache_key):
+        return Response(status_code=304, headers=headers)
+    return Response(content=glb_bytes, media_type=GLB_MIME_TYPE, headers=headers)
 
 
 def build_mesh_metadata(
@@ -80,7 +134,7 @@ def build_mesh_metadata(
         "triangle_count": int(len(getattr(mesh, "faces", []))),
         "vertex_count": int(len(getattr(mesh, "vertices", []))),
         "target_triangles": target,
-        "available_lods": list(DEFAULT_LODS),
+        "available_lods": [*DEFAULT_LODS, PROGRESSIVE_LOD],
     }
     bounds = getattr(mesh, "bounds", None)
     if bounds is not None:
@@ -94,22 +148,30 @@ def build_mesh_metadata(
     return metadata
 
 
+def mesh_cached(cache_key: str) -> bool:
+    try:
+        return get_result_store().exists(mesh_store_key(cache_key))
+    except Exception:
+        return False
+
+
+def metadata_cached(cache_key: str) -> bool:
+    try:
+        return get_result_store().exists(metadata_store_key(cache_key))
+    except Exception:
+        return False
+
+
 def read_metadata(cache_key: str) -> dict | None:
-    path = metadata_cache_path(cache_key)
-    if path.exists():
-        try:
-            with path.open("r") as fh:
-                return json.load(fh)
-        except Exception:
-            return None
-    return None
+    try:
+        return get_result_store().get_json(metadata_store_key(cache_key))
+    except Exception:
+        return None
 
 
 def write_metadata(cache_key: str, metadata: dict) -> None:
-    path = metadata_cache_path(cache_key)
     try:
-        with path.open("w") as fh:
-            json.dump(metadata, fh)
+        get_result_store().put_json(metadata_store_key(cache_key), metadata)
     except Exception:
         pass
 
@@ -123,23 +185,164 @@ def simplify_mesh(mesh, target: int):
     return mesh
 
 
-def load_step_tri_mesh(path: str, deflection: float):
-    from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
-    from OCC.Core.StlAPI import StlAPI_Writer
-
+def load_step_tri_mesh(path: str, deflection: float | None):
+    """Tessellate a STEP file; ``deflection=None`` sizes it to the part for the high LOD budget."""
     shape = load_step_shape(path)
     angular_deflection = 0.5
-    BRepMesh_IncrementalMesh(shape, deflection, True, angular_deflection, True).Perform()
-    fd, tmp_path = tempfile.mkstemp(suffix=".stl")
-    os.close(fd)
+    if deflection is None:
+        plan = auto_tessellate(shape, lod_target("high"), angular_deflection=angular_deflection)
+        deflection = plan.linear_deflection
+        triangulated = triangulation_arrays(shape)
+    else:
+        # Absolute deflection in mm, as everywhere else (was passed as relative)
+        triangulated = triangulate_shape(shape, deflection, angular_deflection)
+    # Read face triangulations straight into arrays; triangles keep their B-rep face id
+    mesh = triangulated.to_trimesh()
+    mesh.metadata["deflection"] = deflection
+    # Weld face seams so decimation does not open cracks between faces
+    mesh.merge_vertices()
+    return mesh
+
+
+def lod_cache_keys(kind: str, file_sha: str, deflection: float | None = None) -> dict[str, str]:
+    """Cache keys for every LOD of one source file (plus the progressive GLB)."""
+    keys: dict[str, str] = {}
+    for lod in DEFAULT_LODS + (PROGRESSIVE_LOD,):
+        if kind == "step":
+            keys[lod] = build_step_cache_key(file_sha, lod, deflection)
+        else:
+            keys[lod] = build_mesh_key(kind, file_sha, lod, lod_target(lod))
+    return keys
+
+
+def step_deflection(deflection: float | None) -> float | None:
+    # All LODs are decimated from one tessellation; None sizes it to the part (see auto_tessellate).
+    return float(deflection) if deflection is not None else None
+
+
+def build_mesh_lods(
+    kind: str,
+    path: str,
+    file_sha: str,
+    cache_keys: dict[str, str],
+    deflection: float | None = None,
+) -> dict[str, dict]:
+    """Load a mesh once, decimate it progressively high -> med -> low and cache
+    every LOD plus a progressive GLB. Returns metadata per LOD.
+    Runs inside the geometry process pool; must stay picklable.
+    """
+    if kind == "step":
+        mesh = load_step_tri_mesh(path, deflection)
+    else:
+        mesh = load_stl(path)
+
+    lod_meshes = {}
+    current = mesh
+    for lod in sorted(DEFAULT_LODS, key=lod_target, reverse=True):
+        # Each level starts from the previous (smaller) one instead of the full mesh
+        current = simplify_mesh(current, lod_target(lod))
+        lod_meshes[lod] = current
+
+    metadata_by_lod: dict[str, dict] = {}
+    for lod in DEFAULT_LODS:
+        lod_mesh = lod_meshes[lod]
+        metadata = build_mesh_metadata(
+            lod_mesh,
+            prefix=kind,
+            file_sha=file_sha,
+            lod=lod,
+            target=lod_target(lod),
+            mesh_version=cache_keys[lod],
+        )
+        if "deflection" in mesh.metadata:
+            metadata["deflection"] = mesh.metadata["deflection"]
+        elif deflection is not None:
+            metadata["deflection"] = deflection
+        write_mesh(cache_keys[lod], lod_mesh.export(file_type="glb"))
+        metadata_by_lod[lod] = metadata
+
+    write_mesh(cache_keys[PROGRESSIVE_LOD], pack_progressive_glb([(lod, lod_meshes[lod]) for lod in DEFAULT_LODS]))
+    progressive = dict(metadata_by_lod["high"], lod=PROGRESSIVE_LOD, mesh_version=cache_keys[PROGRESSIVE_LOD])
+    progressive["levels"] = {
+        lod: {"triangle_count": meta["triangle_count"], "vertex_count": meta["vertex_count"]}
+        for lod, meta in metadata_by_lod.items()
+    }
+    metadata_by_lod[PROGRESSIVE_LOD] = progressive
+
+    # Metadata goes last: a metadata hit implies every GLB of the set is in place
+    for lod, metadata in metadata_by_lod.items():
+        write_metadata(cache_keys[lod], metadata)
+    return metadata_by_lod
+
+
+def discard_download(path: str | None) -> None:
+    if not path:
+        return
     try:
-        StlAPI_Writer().Write(shape, tmp_path)
-        return load_stl(tmp_path)
-    finally:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Downloads shared between concurrent requests for the same URL, by temp path
+_source_refs: dict[str, int] = {}
+
+
+async def fetch_source(file_url: str, cache_probe: Callable[[str], bool]) -> DownloadResult:
+    """Download ``file_url`` once per process even when several viewer requests race for it.
+    Every caller must hand the result back with ``release_source``.
+    """
+    source = await get_singleflight().do(
+        f"download:{file_url}",
+        lambda: download_file_async(file_url, on_origin_sha=cache_probe),
+    )
+    if source.path:
+        _source_refs[source.path] = _source_refs.get(source.path, 0) + 1
+    return source
+
+
+def release_source(source: DownloadResult) -> None:
+    if not source.path:
+        return
+    remaining = _source_refs.get(source.path, 1) - 1
+    if remaining > 0:
+        _source_refs[source.path] = remaining
+        return
+    _source_refs.pop(source.path, None)
+    discard_download(source.path)
+
+
+async def mesh_lods(
+    kind: str,
+    source: DownloadResult,
+    file_url: str,
+    deflection: float | None = None,
+) -> dict[str, dict]:
+    """Return metadata per LOD for a source file, joining any in-flight build.
+    Stream and metadata requests for any LOD share one build, so the mesh is
+    loaded once and every LOD lands in the cache together.
+    """
+    cache_keys = lod_cache_keys(kind, source.sha256, deflection)
+
+    async def build() -> dict[str, dict]:
+        fresh = None
+        path = source.path if source.path and os.path.exists(source.path) else None
+        if path is None:
+            # Body was skipped on an origin-hash cache hit that has since been evicted
+            fresh = (await download_file_async(file_url)).path
+            path = fresh
         try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+            return await run_in_pool(build_mesh_lods, kind, path, source.sha256, cache_keys, deflection)
+        finally:
+            discard_download(fresh)
+
+    def ready() -> dict[str, dict] | None:
+        metadata_by_lod = {lod: read_metadata(key) for lod, key in cache_keys.items()}
+        if all(metadata_by_lod.values()):
+            return metadata_by_lod
+        return None
+
+    return await get_singleflight().do(f"lods:{cache_keys[PROGRESSIVE_LOD]}", build, ready=ready)
 
 
 @celery_app.task
@@ -148,54 +351,32 @@ def convert_to_gltf(file_id: str, file_path: str):
     return {"error": "GLTF conversion currently unavailable"}
 
 
-@router.post("/{file_id}", response_model=GltfResponse)
-async def create_gltf(file_id: str, request: GltfRequest):
-    task = convert_to_gltf.delay(file_id, request.file_path)
-    return {
-        "file_id": file_id,
-        "gltf_url": "",
-        "task_id": task.id,
-    }
-
-
-@router.get("/{task_id}", response_model=GltfResponse)
-async def get_gltf_status(task_id: str):
-    task = convert_to_gltf.AsyncResult(task_id)
-    if task.ready():
-        result = task.get()
-        if "error" in result:
-            raise HTTPException(status_code=400, detail=result["error"])
-        return result
-    raise HTTPException(status_code=202, detail="Conversion in progress")
-
-
 @router.get("/stream")
-async def stream_gltf(file_url: str = Query(...), lod: str = Query("low")):
+async def stream_gltf(request: Request, file_url: str = Query(...), lod: str = Query("low")):
     """On-demand GLB streaming for mesh inputs (STL)."""
     if not file_url:
         raise HTTPException(status_code=400, detail=MISSING_FILE_URL_ERROR)
     try:
-        ensure_cache_dir()
-        path = download_to_temp(file_url)
         lod_value = resolve_lod(lod)
         target = lod_target(lod_value)
-        file_sha = sha256_of_file(path)
-        cache_key = build_mesh_key("stl", file_sha, lod_value, target)
-        cache_path = mesh_cache_path(cache_key)
-        if cache_path.exists():
-            headers = {"X-Mesh-Version": cache_key, "Cache-Control": CACHE_CONTROL_HEADER}
-            return Response(content=cache_path.read_bytes(), media_type=GLB_MIME_TYPE, headers=headers)
-        mesh = load_stl(path)
-        mesh = simplify_mesh(mesh, target)
-        glb_bytes = mesh.export(file_type="glb")
+        # Skip the body entirely when the origin's advertised hash is already cached
+        source = await fetch_source(
+            file_url, lambda sha: mesh_cached(build_mesh_key("stl", sha, lod_value, target))
+        )
         try:
-            cache_path.write_bytes(glb_bytes)
-        except Exception:
-            pass
-        metadata = build_mesh_metadata(mesh, prefix="stl", file_sha=file_sha, lod=lod_value, target=target)
-        write_metadata(cache_key, metadata)
-        headers = {"X-Mesh-Version": metadata["mesh_version"], "Cache-Control": CACHE_CONTROL_HEADER}
-        return Response(content=glb_bytes, media_type=GLB_MIME_TYPE, headers=headers)
+            cache_key = build_mesh_key("stl", source.sha256, lod_value, target)
+            cached = serve_mesh(request, cache_key)
+            if cached is not None:
+                return cached
+            await mesh_lods("stl", source, file_url)
+        finally:
+            release_source(source)
+        response = serve_mesh(request, cache_key)
+        if response is None:
+            raise HTTPException(status_code=503, detail="Mesh was generated but is no longer cached, retry")
+        return response
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
@@ -205,31 +386,35 @@ async def stream_gltf_metadata(file_url: str = Query(...), lod: str = Query("low
     if not file_url:
         raise HTTPException(status_code=400, detail=MISSING_FILE_URL_ERROR)
     try:
-        ensure_cache_dir()
-        path = download_to_temp(file_url)
         lod_value = resolve_lod(lod)
         target = lod_target(lod_value)
-        file_sha = sha256_of_file(path)
-        cache_key = build_mesh_key("stl", file_sha, lod_value, target)
-        cached = read_metadata(cache_key)
-        if cached:
-            return cached
-        mesh = load_stl(path)
-        mesh = simplify_mesh(mesh, target)
-        metadata = build_mesh_metadata(mesh, prefix="stl", file_sha=file_sha, lod=lod_value, target=target)
-        write_metadata(cache_key, metadata)
+        source = await fetch_source(
+            file_url, lambda sha: metadata_cached(build_mesh_key("stl", sha, lod_value, target))
+        )
+        try:
+            cache_key = build_mesh_key("stl", source.sha256, lod_value, target)
+            cached = read_metadata(cache_key)
+            if cached:
+                return cached
+            metadata = (await mesh_lods("stl", source, file_url))[lod_value]
+        finally:
+            release_source(source)
         return metadata
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
-def build_step_cache_key(file_sha: str, lod: str, deflection: float) -> str:
-    payload = f"{file_sha}|{lod}|{deflection:.5f}".encode()
+def build_step_cache_key(file_sha: str, lod: str, deflection: float | None) -> str:
+    tessellation = f"{deflection:.5f}mm" if deflection is not None else f"auto-{lod_target('high')}"
+    payload = f"{file_sha}|{lod}|{tessellation}".encode()
     return hashlib.sha256(payload).hexdigest()
 
 
 @router.get("/stream-step")
 async def stream_step_to_glb(
+    request: Request,
     file_url: str = Query(...),
     lod: str = Query("low"),
     deflection: float | None = Query(None),
@@ -240,36 +425,25 @@ async def stream_step_to_glb(
     if not file_url:
         raise HTTPException(status_code=400, detail=MISSING_FILE_URL_ERROR)
     try:
-        ensure_cache_dir()
-        path = download_to_temp(file_url)
         lod_value = resolve_lod(lod)
-        target = lod_target(lod_value)
-        deflection_value = float(deflection) if deflection is not None else STEP_DEFLECTION_BY_LOD[lod_value]
-        file_sha = sha256_of_file(path)
-        cache_key = build_step_cache_key(file_sha, lod_value, deflection_value)
-        cache_path = mesh_cache_path(cache_key)
-        if cache_path.exists():
-            headers = {"X-Mesh-Version": cache_key, "Cache-Control": CACHE_CONTROL_HEADER}
-            return Response(content=cache_path.read_bytes(), media_type=GLB_MIME_TYPE, headers=headers)
-        mesh = load_step_tri_mesh(path, deflection_value)
-        mesh = simplify_mesh(mesh, target)
-        glb_bytes = mesh.export(file_type="glb")
-        try:
-            cache_path.write_bytes(glb_bytes)
-        except Exception:
-            pass
-        metadata = build_mesh_metadata(
-            mesh,
-            prefix="step",
-            file_sha=file_sha,
-            lod=lod_value,
-            target=target,
-            mesh_version=cache_key,
+        deflection_value = step_deflection(deflection)
+        source = await fetch_source(
+            file_url, lambda sha: mesh_cached(build_step_cache_key(sha, lod_value, deflection_value))
         )
-        metadata["deflection"] = deflection_value
-        write_metadata(cache_key, metadata)
-        headers = {"X-Mesh-Version": cache_key, "Cache-Control": CACHE_CONTROL_HEADER}
-        return Response(content=glb_bytes, media_type=GLB_MIME_TYPE, headers=headers)
+        try:
+            cache_key = build_step_cache_key(source.sha256, lod_value, deflection_value)
+            cached = serve_mesh(request, cache_key)
+            if cached is not None:
+                return cached
+            await mesh_lods("step", source, file_url, deflection_value)
+        finally:
+            release_source(source)
+        response = serve_mesh(request, cache_key)
+        if response is None:
+            raise HTTPException(status_code=503, detail="Mesh was generated but is no longer cached, retry")
+        return response
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
@@ -285,28 +459,43 @@ async def stream_step_metadata(
     if not file_url:
         raise HTTPException(status_code=400, detail=MISSING_FILE_URL_ERROR)
     try:
-        ensure_cache_dir()
-        path = download_to_temp(file_url)
         lod_value = resolve_lod(lod)
-        target = lod_target(lod_value)
-        deflection_value = float(deflection) if deflection is not None else STEP_DEFLECTION_BY_LOD[lod_value]
-        file_sha = sha256_of_file(path)
-        cache_key = build_step_cache_key(file_sha, lod_value, deflection_value)
-        cached = read_metadata(cache_key)
-        if cached:
-            return cached
-        mesh = load_step_tri_mesh(path, deflection_value)
-        mesh = simplify_mesh(mesh, target)
-        metadata = build_mesh_metadata(
-            mesh,
-            prefix="step",
-            file_sha=file_sha,
-            lod=lod_value,
-            target=target,
-            mesh_version=cache_key,
+        deflection_value = step_deflection(deflection)
+        source = await fetch_source(
+            file_url, lambda sha: metadata_cached(build_step_cache_key(sha, lod_value, deflection_value))
         )
-        metadata["deflection"] = deflection_value
-        write_metadata(cache_key, metadata)
+        try:
+            cache_key = build_step_cache_key(source.sha256, lod_value, deflection_value)
+            cached = read_metadata(cache_key)
+            if cached:
+                return cached
+            metadata = (await mesh_lods("step", source, file_url, deflection_value))[lod_value]
+        finally:
+            release_source(source)
         return metadata
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+# Registered last: the catch-all path parameters would otherwise shadow /stream and /metadata
+@router.post("/{file_id}", response_model=GltfResponse)
+async def create_gltf(file_id: str, request: GltfRequest):
+    task = convert_to_gltf.delay(file_id, request.file_path)
+    return {
+        "file_id": file_id,
+        "gltf_url": "",
+        "task_id": task.id,
+    }
+
+
+@router.get("/{task_id}", response_model=GltfResponse)
+async def get_gltf_status(task_id: str):
+    task = convert_to_gltf.AsyncResult(task_id)
+    if task.ready():
+        result = task.get()
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        return result
+    raise HTTPException(status_code=202, detail="Conversion in progress")
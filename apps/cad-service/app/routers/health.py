@@ -7,6 +7,8 @@ import importlib.metadata
 import psutil
 import os
 from ..workers.celery import celery_app
+from ..workers.bootstrap import bootstrap_stats
+from ..workers.pool import pool_stats
 
 router = APIRouter()
 
@@ -66,6 +68,9 @@ async def health_check(response: Response):
         "details": {
             "status": "healthy" if is_healthy else "degraded",
             "celery": celery_status,
-            "system": system_health
+            "system": system_health,
+            "geometry_pool": pool_stats(),
+            "bootstrap": bootstrap_stats()
         }
     }
+    return health_data
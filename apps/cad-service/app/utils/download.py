@@ -1,37 +1,221 @@
+import base64
+import binascii
 import os
 import tempfile
 import urllib.parse
+from dataclasses import dataclass
+from typing import Callable, Optional
 import httpx
 import hashlib
 
+from .http_client import async_host_slot, get_async_http_client, get_http_client, host_slot
 
-def download_to_temp(url: str, *, max_bytes: int = 80 * 1024 * 1024) -> str:
-    """Download a URL to a temporary file and return the path.
-    Enforces a simple size limit to avoid excessive resource use.
+DEFAULT_MAX_BYTES = 80 * 1024 * 1024
+MAX_RESUMES = 3
+
+
+@dataclass
+class DownloadResult:
+    """Outcome of a streamed download.
+
+    ``path`` is None when the body was not fetched: either the origin answered
+    304 to ``If-None-Match`` (``not_modified``) or it advertised a content hash
+    the caller already has cached (``cache_hit``).
     """
-    parsed = urllib.parse.urlparse(url)
-    if parsed.scheme not in ("http", "https"):
-        raise ValueError("Only http(s) URLs are supported")
+    path: Optional[str]
+    sha256: Optional[str]
+    size: int
+    content_type: Optional[str]
+    etag: Optional[str] = None
+    not_modified: bool = False
+    cache_hit: bool = False
 
-    with httpx.stream('GET', url, timeout=30.0) as r:
-        r.raise_for_status()
+
+def origin_sha256(headers: httpx.Headers) -> Optional[str]:
+    """Return the hex SHA-256 the origin advertises for the full body, if any."""
+    for name in ("x-amz-meta-sha256", "x-content-sha256"):
+        value = headers.get(name)
+        if value and len(value) == 64:
+            return value.lower()
+    # S3 full-object checksum (multipart composite checksums carry a "-N" suffix)
+    value = headers.get("x-amz-checksum-sha256")
+    if value and "-" not in value:
+        return _b64_to_hex(value)
+    # RFC 9530 Repr-Digest: sha-256=:<b64>: and legacy RFC 3230 Digest: SHA-256=<b64>
+    for name in ("repr-digest", "digest"):
+        value = headers.get(name)
+        if not value:
+            continue
+        for part in value.split(","):
+            algo, _, digest = part.strip().partition("=")
+            if algo.lower() == "sha-256" and digest:
+                return _b64_to_hex(digest.strip(":"))
+    return None
+
+
+def _b64_to_hex(value: str) -> Optional[str]:
+    try:
+        raw = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return raw.hex() if len(raw) == 32 else None
+
+
+class _DownloadSink:
+    """Temp file + incremental SHA-256 shared by the sync and async downloaders."""
+
+    def __init__(self, url: str, *, max_bytes: int, if_none_match: Optional[str]):
+        parsed = urllib.parse.urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError("Only http(s) URLs are supported")
+        self.max_bytes = max_bytes
+        self.if_none_match = if_none_match
         suffix = os.path.splitext(parsed.path)[1].lower() or ""
-        fd, path = tempfile.mkstemp(suffix=suffix)
-        size = 0
+        fd, self.path = tempfile.mkstemp(suffix=suffix)
+        self.file = os.fdopen(fd, "wb")
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.content_type: Optional[str] = None
+        self.etag: Optional[str] = None
+        self.resumable = False
+        self.resumes = 0
+
+    def request_headers(self) -> dict:
+        headers = {}
+        if self.if_none_match:
+            headers["If-None-Match"] = self.if_none_match
+        if self.size:
+            headers["Range"] = f"bytes={self.size}-"
+            if self.etag:
+                headers["If-Range"] = self.etag
+        return headers
+
+    def begin(self, r: httpx.Response, on_origin_sha: Optional[Callable[[str], bool]]) -> Optional[DownloadResult]:
+        """Inspect response headers; return a result if the body should not be read."""
+        if r.status_code == 304:
+            self.abort()
+            return DownloadResult(None, None, 0, None, etag=r.headers.get("etag") or self.if_none_match, not_modified=True)
+        r.raise_for_status()
+        if self.size and r.status_code != 206:
+            # Origin ignored the range (or the entity changed): start over
+            self.file.seek(0)
+            self.file.truncate()
+            self.hash = hashlib.sha256()
+            self.size = 0
+        if not self.size:
+            self.content_type = r.headers.get("content-type")
+            self.etag = r.headers.get("etag")
+            advertised = origin_sha256(r.headers)
+            if advertised and on_origin_sha is not None and on_origin_sha(advertised):
+                self.abort()
+                size = int(r.headers.get("content-length") or 0)
+                return DownloadResult(None, advertised, size, self.content_type, etag=self.etag, cache_hit=True)
+            length = r.headers.get("content-length")
+            if length and int(length) > self.max_bytes:
+                raise ValueError("File exceeds maximum allowed size")
+        self.resumable = r.headers.get("accept-ranges", "").lower() == "bytes" or r.status_code == 206
+        return None
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self.size + len(chunk) > self.max_bytes:
+            raise ValueError("File exceeds maximum allowed size")
+        self.file.write(chunk)
+        self.hash.update(chunk)
+        self.size += len(chunk)
+
+    def can_resume(self) -> bool:
+        if not self.size or not self.resumable or self.resumes >= MAX_RESUMES:
+            return False
+        self.resumes += 1
+        return True
+
+    def finish(self) -> DownloadResult:
+        self.file.close()
+        return DownloadResult(self.path, self.hash.hexdigest(), self.size, self.content_type, etag=self.etag)
+
+    def abort(self) -> None:
         try:
-            with os.fdopen(fd, "wb") as f:
-                for chunk in r.iter_bytes():
-                    if chunk:
-                        size += len(chunk)
-                        if size > max_bytes:
-                            raise ValueError("File exceeds maximum allowed size")
-                        f.write(chunk)
+            self.file.close()
         except Exception:
-            try:
-                os.remove(path)
-            finally:
-                raise
-    return path
+            pass
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def download_file(
+    url: str,
+    *,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    if_none_match: Optional[str] = None,
+    on_origin_sha: Optional[Callable[[str], bool]] = None,
+) -> DownloadResult:
+    """Stream a URL to a temporary file, hashing it on the fly.
+
+    ``on_origin_sha`` is called with the origin-advertised SHA-256 as soon as
+    the response headers arrive; returning True skips the body entirely.
+    Interrupted transfers are resumed with HTTP Range when the origin allows it.
+    """
+    sink = _DownloadSink(url, max_bytes=max_bytes, if_none_match=if_none_match)
+    try:
+        client = get_http_client()
+        with host_slot(url):
+            while True:
+                try:
+                    with client.stream("GET", url, headers=sink.request_headers()) as r:
+                        early = sink.begin(r, on_origin_sha)
+                        if early is not None:
+                            return early
+                        for chunk in r.iter_bytes():
+                            sink.write(chunk)
+                    break
+                except (httpx.TransportError, httpx.StreamError):
+                    if not sink.can_resume():
+                        raise
+        return sink.finish()
+    except Exception:
+        sink.abort()
+        raise
+
+
+async def download_file_async(
+    url: str,
+    *,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    if_none_match: Optional[str] = None,
+    on_origin_sha: Optional[Callable[[str], bool]] = None,
+) -> DownloadResult:
+    """Async variant of download_file using the pooled AsyncClient."""
+    sink = _DownloadSink(url, max_bytes=max_bytes, if_none_match=if_none_match)
+    try:
+        client = get_async_http_client()
+        async with async_host_slot(url):
+            while True:
+                try:
+                    async with client.stream("GET", url, headers=sink.request_headers()) as r:
+                        early = sink.begin(r, on_origin_sha)
+                        if early is not None:
+                            return early
+                        async for chunk in r.aiter_bytes():
+                            sink.write(chunk)
+                    break
+                except (httpx.TransportError, httpx.StreamError):
+                    if not sink.can_resume():
+                        raise
+        return sink.finish()
+    except Exception:
+        sink.abort()
+        raise
+
+
+def download_to_temp(url: str, *, max_bytes: int = DEFAULT_MAX_BYTES) -> str:
+    """Download a URL to a temporary file and return the path.
+    Enforces a simple size limit to avoid excessive resource use.
+    """
+    return download_file(url, max_bytes=max_bytes).path
 
 
 def sha256_of_file(path: str) -> str:
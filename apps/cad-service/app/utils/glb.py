@@ -0,0 +1,111 @@
+"""GLB container helpers for multi-LOD output."""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+from typing import List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+MESHOPT_ENABLED = os.getenv("GLTF_MESHOPT", "0") == "1"
+
+
+def split_glb(data: bytes) -> Tuple[dict, bytes]:
+    """Return (gltf json, binary chunk) from a GLB byte string."""
+    magic, version, _ = struct.unpack_from("<4sII", data, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError("Not a glTF 2.0 binary")
+    offset = 12
+    gltf: dict = {}
+    bin_chunk = b""
+    while offset < len(data):
+        length, kind = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8:offset + 8 + length]
+        if kind == CHUNK_JSON:
+            gltf = json.loads(chunk.decode("utf-8").rstrip(" \x00"))
+        elif kind == CHUNK_BIN:
+            bin_chunk = chunk
+        offset += 8 + length
+    return gltf, bin_chunk
+
+
+def join_glb(gltf: dict, bin_chunk: bytes) -> bytes:
+    json_bytes = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    json_bytes += b" " * (-len(json_bytes) % 4)
+    bin_chunk = bin_chunk + b"\x00" * (-len(bin_chunk) % 4)
+    total = 12 + 8 + len(json_bytes) + (8 + len(bin_chunk) if bin_chunk else 0)
+    out = [struct.pack("<4sII", GLB_MAGIC, 2, total), struct.pack("<II", len(json_bytes), CHUNK_JSON), json_bytes]
+    if bin_chunk:
+        out += [struct.pack("<II", len(bin_chunk), CHUNK_BIN), bin_chunk]
+    return b"".join(out)
+
+
+def pack_progressive_glb(lods: Sequence[Tuple[str, object]]) -> bytes:
+    """Pack meshes ordered coarse -> fine into one GLB linked with MSFT_lod.
+
+    The coarsest mesh's buffers come first in the BIN chunk, so a viewer
+    reading the response incrementally can display it before the finer
+    levels have arrived.
+    """
+    import trimesh
+
+    scene = trimesh.Scene()
+    names: List[str] = []
+    for lod, mesh in lods:
+        name = f"lod_{lod}"
+        scene.add_geometry(mesh, node_name=name, geom_name=name)
+        names.append(name)
+    glb = scene.export(file_type="glb")
+    glb = link_lods(glb, list(reversed(names)))
+    if MESHOPT_ENABLED:
+        glb = meshopt_compress(glb)
+    return glb
+
+
+def link_lods(glb: bytes, names_fine_to_coarse: List[str]) -> bytes:
+    """Attach MSFT_lod to the finest node and detach the coarser ones from the scene graph."""
+    gltf, bin_chunk = split_glb(glb)
+    nodes = gltf.get("nodes", [])
+    index = {node.get("name"): i for i, node in enumerate(nodes)}
+    ids = [index[n] for n in names_fine_to_coarse if n in index]
+    if len(ids) < 2:
+        return glb
+    finest, coarser = ids[0], ids[1:]
+    nodes[finest].setdefault("extensions", {})["MSFT_lod"] = {"ids": coarser}
+    nodes[finest].setdefault("extras", {})["MSFT_screencoverage"] = [0.5, 0.2, 0.0][: len(coarser) + 1]
+    for node in nodes:
+        if "children" in node:
+            node["children"] = [c for c in node["children"] if c not in coarser]
+    for scene in gltf.get("scenes", []):
+        scene["nodes"] = [n for n in scene.get("nodes", []) if n not in coarser]
+    used = gltf.setdefault("extensionsUsed", [])
+    if "MSFT_lod" not in used:
+        used.append("MSFT_lod")
+    return join_glb(gltf, bin_chunk)
+
+
+def meshopt_compress(glb: bytes) -> bytes:
+    """Compress with gltfpack (EXT_meshopt_compression) when it is on PATH."""
+    exe = shutil.which("gltfpack")
+    if exe is None:
+        return glb
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "in.glb")
+        dst = os.path.join(tmp, "out.glb")
+        with open(src, "wb") as fh:
+            fh.write(glb)
+        try:
+            subprocess.run([exe, "-i", src, "-o", dst, "-cc", "-kn", "-ke"], check=True, capture_output=True, timeout=120)
+            with open(dst, "rb") as fh:
+                return fh.read()
+        except Exception as exc:
+            logger.warning("gltfpack compression failed, serving uncompressed GLB: %s", exc)
+            return glb
@@ -0,0 +1,119 @@
+"""Process-wide pooled HTTP clients for downloads and webhook delivery.
+
+Celery workers use the sync client; FastAPI routes use the async client.
+Both keep connections alive (HTTP/2 when ``h2`` is installed) so repeated
+downloads from the object store and webhook posts skip the TLS handshake.
+Per-host semaphores cap concurrent requests to any single origin.
+
+Redirects are not followed, as with the plain ``httpx.stream`` calls these
+clients replace: file and webhook URLs come from callers, and following a
+redirect would let them reach hosts that were never validated.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import threading
+import urllib.parse
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+import httpx
+
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+PER_HOST_CONCURRENCY = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "8"))
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") != "0" and importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+_async_host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(
+                    http2=HTTP2_ENABLED, limits=_limits(), timeout=DEFAULT_TIMEOUT, follow_redirects=False
+                )
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED, limits=_limits(), timeout=DEFAULT_TIMEOUT, follow_redirects=False
+        )
+    return _async_client
+
+
+def _host(url: str) -> str:
+    parsed = urllib.parse.urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+@contextmanager
+def host_slot(url: str):
+    """Hold one of the per-host concurrency slots for the duration of a request."""
+    host = _host(url)
+    with _lock:
+        sem = _host_semaphores.get(host)
+        if sem is None:
+            sem = _host_semaphores[host] = threading.BoundedSemaphore(PER_HOST_CONCURRENCY)
+    with sem:
+        yield
+
+
+@asynccontextmanager
+async def async_host_slot(url: str):
+    host = _host(url)
+    sem = _async_host_semaphores.get(host)
+    if sem is None:
+        sem = _async_host_semaphores[host] = asyncio.Semaphore(PER_HOST_CONCURRENCY)
+    async with sem:
+        yield
+
+
+def close_http_clients() -> None:
+    global _sync_client
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+
+
+async def aclose_http_clients() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    close_http_clients()
+
+
+def _reset_after_fork() -> None:
+    # Pooled sockets must not be shared between a parent and forked Celery children.
+    global _sync_client, _async_client, _lock
+    _sync_client = None
+    _async_client = None
+    _lock = threading.Lock()
+    _host_semaphores.clear()
+    _async_host_semaphores.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,408 @@
+"""Content-addressed result store shared by the analyze, gltf and conversion paths.
+
+Entries are addressed by the SHA-256 of the input file plus whatever parameters
+change the output (units hint, analyzer version, LOD, deflection, ...), so the
+same part uploaded twice is served from cache instead of re-running OCC.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; eviction then only serializes within a process
+    fcntl = None
+
+DEFAULT_CACHE_DIR = "/tmp/cad-result-cache"
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GiB
+EVICT_LOW_WATER = 0.9  # evict down to 90% of the budget to avoid thrashing
+# Each process only sees its own writes, so the directory is re-measured at least this often
+DISK_RESCAN_S = float(os.getenv("RESULT_CACHE_RESCAN_S", "30"))
+COPY_CHUNK_BYTES = 1024 * 1024
+REDIS_MAX_VALUE_BYTES = 512 * 1024 * 1024  # Redis string limit (proto-max-bulk-len)
+RECONCILE_BATCH = 500
+
+_SAFE_KEY = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def build_result_key(namespace: str, file_sha: str, *params: Any) -> str:
+    """Return a stable key for a (file, parameters) pair within a namespace."""
+    payload = "|".join([file_sha, *("" if p is None else str(p) for p in params)])
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return f"{namespace}-{digest}"
+
+
+class ResultStore(ABC):
+    """Byte-oriented key/value store with JSON helpers.
+
+    ``shared`` says whether every API and worker host sees the same entries;
+    handing data from the API to a Celery worker through the store needs it.
+    """
+
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        ...
+
+    def put_file(self, key: str, path: str | Path) -> None:
+        """Store the contents of a file; disk stores copy it without loading it into memory."""
+        self.put(key, Path(path).read_bytes())
+
+    def copy_to(self, key: str, fh) -> bool:
+        """Write an entry into an open binary file; False if it is missing."""
+        data = self.get(key)
+        if data is None:
+            return False
+        fh.write(data)
+        return True
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def exists(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Filesystem path of a cached entry, for zero-copy serving; None if not on local disk."""
+        return None
+
+    def get_json(self, key: str) -> Optional[Any]:
+        raw = self.get(key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except Exception:
+            return None
+
+    def put_json(self, key: str, value: Any) -> None:
+        self.put(key, json.dumps(value, separators=(",", ":")).encode())
+
+
+class DiskResultStore(ResultStore):
+    """Directory-backed store with size-bounded LRU eviction.
+
+    Recency is tracked through file mtimes (touched on every hit), so the
+    ordering survives restarts and is shared by all workers using the same
+    directory. Each process keeps a running size estimate; the directory is
+    re-measured under a file lock held by every process sharing it once that
+    estimate exceeds the budget and at least every DISK_RESCAN_S.
+    """
+
+    def __init__(self, root: str | Path, *, max_bytes: int = DEFAULT_MAX_BYTES, shared: bool = False):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.shared = shared  # only when root is a volume mounted on every host
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._scanned_at = 0.0
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / _SAFE_KEY.sub("_", key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def local_path(self, key: str) -> Optional[Path]:
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        self._write(key, lambda fh: fh.write(data), len(data))
+
+    def put_file(self, key: str, path: str | Path) -> None:
+        def copy(fh) -> None:
+            with open(path, "rb") as src:
+                shutil.copyfileobj(src, fh, COPY_CHUNK_BYTES)
+        self._write(key, copy, os.path.getsize(path))
+
+    def _write(self, key: str, write, size: int) -> None:
+        path = self._path(key)
+        try:
+            previous = path.stat().st_size
+        except OSError:
+            previous = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                write(fh)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            if self._size is not None:
+                self._size += size - previous
+        self._maybe_evict()
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for entry in os.scandir(self.root):
+            # Dot files are temp writes and the eviction lock
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return entries
+
+    @contextmanager
+    def _dir_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self.root / ".evict.lock", "ab") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _maybe_evict(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            stale = self._size is None or now - self._scanned_at >= DISK_RESCAN_S
+            if not stale and self._size <= self.max_bytes:
+                return
+            # Measure the directory itself: other processes write to it too
+            with self._dir_lock():
+                entries = sorted(self._entries())
+                total = sum(size for _, size, _ in entries)
+                if total > self.max_bytes:
+                    target = int(self.max_bytes * EVICT_LOW_WATER)
+                    for _, size, path in entries:
+                        if total <= target:
+                            break
+                        try:
+                            path.unlink()
+                            total -= size
+                        except OSError:
+                            pass
+            self._size = total
+            self._scanned_at = now
+
+
+class RedisResultStore(ResultStore):
+    """Redis-backed store with size-bounded LRU eviction across workers.
+
+    Values live under ``<prefix>:v:<key>``; a sorted set ordered by last access
+    and a hash of value sizes let any worker evict the least recently used
+    entries once the byte budget is exceeded. Values also expire through their
+    TTL, which Redis does without touching the bookkeeping, so the sizes are
+    reconciled against the values that still exist before anything is evicted.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        prefix: str = "cad:results",
+        ttl_seconds: Optional[int] = 7 * 24 * 3600,
+    ):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self._lru = f"{prefix}:lru"
+        self._sizes = f"{prefix}:sizes"
+        self._total = f"{prefix}:total"
+
+    def _value_key(self, key: str) -> str:
+        return f"{self.prefix}:v:{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.client.get(self._value_key(key))
+        if data is None:
+            return None
+        self.client.zadd(self._lru, {key: time.time()})
+        return data
+
+    def exists(self, key: str) -> bool:
+        return bool(self.client.exists(self._value_key(key)))
+
+    def put(self, key: str, data: bytes) -> None:
+        self._commit(key, len(data), lambda pipe: pipe.set(self._value_key(key), data, ex=self.ttl_seconds))
+
+    def put_file(self, key: str, path: str | Path) -> None:
+        """Append the file in chunks to a staging key, then rename it into place."""
+        size = os.path.getsize(path)
+        if size > REDIS_MAX_VALUE_BYTES:
+            raise ValueError(f"{size} bytes exceeds the Redis value limit of {REDIS_MAX_VALUE_BYTES}")
+        staging = f"{self.prefix}:staging:{uuid.uuid4().hex}"
+        try:
+            self.client.set(staging, b"", ex=3600)
+            with open(path, "rb") as src:
+                while chunk := src.read(COPY_CHUNK_BYTES):
+                    self.client.append(staging, chunk)
+
+            def publish(pipe) -> None:
+                pipe.rename(staging, self._value_key(key))
+                if self.ttl_seconds:
+                    pipe.expire(self._value_key(key), self.ttl_seconds)
+                else:
+                    pipe.persist(self._value_key(key))
+            self._commit(key, size, publish)
+        except Exception:
+            self.client.delete(staging)
+            raise
+
+    def copy_to(self, key: str, fh) -> bool:
+        value_key = self._value_key(key)
+        size = self.client.strlen(value_key)
+        if not size:
+            return self.exists(key)
+        for start in range(0, size, COPY_CHUNK_BYTES):
+            fh.write(self.client.getrange(value_key, start, start + COPY_CHUNK_BYTES - 1))
+        self.client.zadd(self._lru, {key: time.time()})
+        return True
+
+    def _commit(self, key: str, size: int, write) -> None:
+        pipe = self.client.pipeline()
+        pipe.hget(self._sizes, key)
+        write(pipe)
+        pipe.hset(self._sizes, key, size)
+        pipe.zadd(self._lru, {key: time.time()})
+        previous = pipe.execute()[0]
+        delta = size - int(previous or 0)
+        total = self.client.incrby(self._total, delta)
+        if total > self.max_bytes:
+            self._evict(int(self.max_bytes * EVICT_LOW_WATER))
+
+    def delete(self, key: str) -> None:
+        size = self.client.hget(self._sizes, key)
+        pipe = self.client.pipeline()
+        pipe.delete(self._value_key(key))
+        pipe.hdel(self._sizes, key)
+        pipe.zrem(self._lru, key)
+        if size is not None:
+            pipe.decrby(self._total, int(size))
+        pipe.execute()
+
+    def reconcile(self) -> int:
+        """Drop bookkeeping for values that expired; returns the corrected total."""
+        cursor = 0
+        while True:
+            cursor, sizes = self.client.hscan(self._sizes, cursor, count=RECONCILE_BATCH)
+            members = list(sizes.items())
+            if members:
+                pipe = self.client.pipeline()
+                for member, _ in members:
+                    key = member.decode() if isinstance(member, bytes) else member
+                    pipe.exists(self._value_key(key))
+                alive = pipe.execute()
+                dead = [(m, int(size)) for (m, size), live in zip(members, alive) if not live]
+                if dead:
+                    pipe = self.client.pipeline()
+                    for member, _ in dead:
+                        pipe.hdel(self._sizes, member)
+                        pipe.zrem(self._lru, member)
+                    removed = pipe.execute()[0::2]
+                    # Only subtract entries this call removed; another worker may be reconciling too
+                    freed = sum(size for (_, size), gone in zip(dead, removed) if gone)
+                    if freed:
+                        self.client.decrby(self._total, freed)
+            if not cursor:
+                break
+        return int(self.client.get(self._total) or 0)
+
+    def _evict(self, target: int) -> None:
+        total = self.reconcile()
+        while total > target:
+            oldest = self.client.zpopmin(self._lru, count=16)
+            if not oldest:
+                break
+            for member, _ in oldest:
+                key = member.decode() if isinstance(member, bytes) else member
+                size = int(self.client.hget(self._sizes, key) or 0)
+                pipe = self.client.pipeline()
+                pipe.delete(self._value_key(key))
+                pipe.hdel(self._sizes, key)
+                pipe.decrby(self._total, size)
+                total = pipe.execute()[-1]
+                if total <= target:
+                    break
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """Return the process-wide result store configured from the environment.
+
+    ``RESULT_CACHE_BACKEND`` selects ``disk`` (default) or ``redis``;
+    ``RESULT_CACHE_MAX_BYTES`` bounds the total size of cached results.
+    Set ``RESULT_CACHE_SHARED=1`` when ``RESULT_CACHE_DIR`` is a volume shared
+    by the API and the workers.
+    """
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            backend = os.getenv("RESULT_CACHE_BACKEND", "disk").lower()
+            max_bytes = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+            if backend == "redis":
+                url = os.getenv("RESULT_CACHE_REDIS_URL", os.getenv("REDIS_URL", "redis://redis:6379/0"))
+                _store = RedisResultStore(url, max_bytes=max_bytes)
+            else:
+                root = os.getenv("RESULT_CACHE_DIR", DEFAULT_CACHE_DIR)
+                shared = os.getenv("RESULT_CACHE_SHARED", "0") == "1"
+                _store = DiskResultStore(root, max_bytes=max_bytes, shared=shared)
+    return _store
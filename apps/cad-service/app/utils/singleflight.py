@@ -0,0 +1,209 @@
+"""Request coalescing for identical geometry jobs.
+
+Concurrent callers with the same key share one in-flight computation: within
+a process through a shared asyncio task, and across API/Celery workers through
+a Redis ``SET NX`` lock. The leader renews the lock while it computes, so
+jobs may run longer than the lock TTL. Callers that lose the lock poll
+``ready()`` (normally a result-store lookup) until the leader publishes its
+result; if the leader dies and the lock expires, one of them takes over.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+LOCK_TTL_MS = int(os.getenv("SINGLEFLIGHT_LOCK_TTL_MS", "300000"))
+# The leader extends its lock this often, well inside the TTL
+LOCK_RENEW_S = LOCK_TTL_MS / 3000.0
+POLL_INTERVAL_S = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL_S", "0.25"))
+# Waiters give up and compute themselves after this long; covers the longest
+# Celery time limit (occ-large, 3600 s) so a live leader is never duplicated
+MAX_WAIT_S = float(os.getenv("SINGLEFLIGHT_MAX_WAIT_S", "3600"))
+LOCK_PREFIX = "cad:singleflight:"
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _redis_url() -> Optional[str]:
+    if os.getenv("SINGLEFLIGHT_DISTRIBUTED", "1") == "0":
+        return None
+    return os.getenv("SINGLEFLIGHT_REDIS_URL", os.getenv("REDIS_URL", "redis://redis:6379/0"))
+
+
+class SingleFlight:
+    """Async single-flight group for FastAPI routes."""
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self._redis_url = redis_url
+        self._redis = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _client(self):
+        if self._redis is None and self._redis_url:
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.Redis.from_url(self._redis_url)
+            except Exception:
+                self._redis_url = None
+        return self._redis
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        ready: Optional[Callable[[], Optional[T]]] = None,
+    ) -> T:
+        """Run ``fn`` once per key; ``ready`` is a blocking lookup and runs in a worker thread."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn, ready))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+        # Shield so one disconnecting client does not cancel the shared job
+        return await asyncio.shield(task)
+
+    async def _run(self, key: str, fn, ready) -> T:
+        client = self._client()
+        if client is None or ready is None:
+            return await fn()
+        lock_key = LOCK_PREFIX + key
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + MAX_WAIT_S
+        while True:
+            try:
+                acquired = await client.set(lock_key, token, nx=True, px=LOCK_TTL_MS)
+            except Exception as exc:
+                logger.warning("singleflight lock unavailable, running locally: %s", exc)
+                return await fn()
+            if acquired:
+                renew = asyncio.ensure_future(self._keep_lock(client, lock_key, token))
+                try:
+                    return await fn()
+                finally:
+                    renew.cancel()
+                    try:
+                        await client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+                    except Exception:
+                        pass
+            # Another worker is computing it: wait for its result or for the lock to lapse
+            while True:
+                # ready() reads the result store, which blocks
+                value = await asyncio.to_thread(ready)
+                if value is not None:
+                    return value
+                if time.monotonic() > deadline:
+                    return await fn()
+                await asyncio.sleep(POLL_INTERVAL_S)
+                try:
+                    if not await client.exists(lock_key):
+                        break
+                except Exception:
+                    return await fn()
+
+    @staticmethod
+    async def _keep_lock(client, lock_key: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(LOCK_RENEW_S)
+            try:
+                if not await client.eval(_RENEW_SCRIPT, 1, lock_key, token, LOCK_TTL_MS):
+                    return  # lost the lock (expired and taken over); nothing left to renew
+            except Exception as exc:
+                logger.warning("singleflight lock renewal failed: %s", exc)
+
+
+def _keep_lock_sync(stop: threading.Event, client, lock_key: str, token: str) -> None:
+    import redis
+    while not stop.wait(LOCK_RENEW_S):
+        try:
+            if not client.eval(_RENEW_SCRIPT, 1, lock_key, token, LOCK_TTL_MS):
+                return
+        except redis.RedisError as exc:
+            logger.warning("singleflight lock renewal failed: %s", exc)
+
+
+def run_once_sync(key: str, fn: Callable[[], T], ready: Callable[[], Optional[T]]) -> T:
+    """Blocking cross-worker single-flight for Celery tasks."""
+    url = _redis_url()
+    if not url:
+        return fn()
+    try:
+        import redis
+        client = _sync_client(url)
+    except Exception:
+        return fn()
+    lock_key = LOCK_PREFIX + key
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + MAX_WAIT_S
+    while True:
+        try:
+            acquired = client.set(lock_key, token, nx=True, px=LOCK_TTL_MS)
+        except redis.RedisError:
+            return fn()
+        if acquired:
+            stop = threading.Event()
+            threading.Thread(
+                target=_keep_lock_sync, args=(stop, client, lock_key, token), name="singleflight-renew", daemon=True
+            ).start()
+            try:
+                return fn()
+            finally:
+                stop.set()
+                try:
+                    client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+                except redis.RedisError:
+                    pass
+        while True:
+            value = ready()
+            if value is not None:
+                return value
+            if time.monotonic() > deadline:
+                return fn()
+            time.sleep(POLL_INTERVAL_S)
+            try:
+                if not client.exists(lock_key):
+                    break
+            except redis.RedisError:
+                return fn()
+
+
+_sync_clients: Dict[str, object] = {}
+
+
+def _sync_client(url: str):
+    client = _sync_clients.get(url)
+    if client is None:
+        import redis
+        client = _sync_clients[url] = redis.Redis.from_url(url)
+    return client
+
+
+_group: Optional[SingleFlight] = None
+
+
+def get_singleflight() -> SingleFlight:
+    global _group
+    if _group is None:
+        _group = SingleFlight(_redis_url())
+    return _group
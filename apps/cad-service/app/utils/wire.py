@@ -0,0 +1,131 @@
+"""Binary wire format for analysis results.
+
+Results carry NumPy columns (see ``HoleTable``/``PocketTable``). With msgpack
+installed they are encoded as raw little-endian buffers in a msgpack ext
+type, so a part with thousands of holes serializes without per-element Python
+objects. The same encoding is used for the Celery result backend, the result
+store and HTTP responses when the client sends ``Accept: application/msgpack``.
+Without msgpack, everything falls back to JSON with arrays as lists.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import fields, is_dataclass
+from typing import Any, Optional
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:  # optional dependency
+    msgpack = None
+    HAS_MSGPACK = False
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+NDARRAY_EXT = 1
+
+_MSGPACK_TAG = b"m"
+_JSON_TAG = b"j"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        arr = np.ascontiguousarray(obj)
+        header = msgpack.packb([arr.dtype.str, list(arr.shape)])
+        return msgpack.ExtType(NDARRAY_EXT, header + arr.tobytes())
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if is_dataclass(obj):
+        return {f.name: getattr(obj, f.name) for f in fields(obj)}
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code != NDARRAY_EXT:
+        return msgpack.ExtType(code, data)
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(data)
+    dtype, shape = unpacker.unpack()
+    # Read-only view over the payload; callers copy if they need to mutate
+    return np.frombuffer(data, dtype=np.dtype(dtype), offset=unpacker.tell()).reshape(shape)
+
+
+def packb(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Arrays to lists, dataclasses to dicts, NumPy scalars to Python numbers."""
+    if isinstance(obj, dict):
+        return {k: to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if is_dataclass(obj):
+        return {f.name: to_jsonable(getattr(obj, f.name)) for f in fields(obj)}
+    return obj
+
+
+def encode_blob(obj: Any) -> bytes:
+    """Tagged bytes for storage: msgpack when available, JSON otherwise."""
+    if HAS_MSGPACK:
+        return _MSGPACK_TAG + packb(obj)
+    return _JSON_TAG + json.dumps(to_jsonable(obj), separators=(",", ":")).encode()
+
+
+def decode_blob(blob: Optional[bytes]) -> Any:
+    if not blob:
+        return None
+    tag, body = blob[:1], blob[1:]
+    if tag == _MSGPACK_TAG:
+        if not HAS_MSGPACK:
+            return None
+        return unpackb(body)
+    if tag == _JSON_TAG:
+        return json.loads(body)
+    return None
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    if not HAS_MSGPACK or not accept:
+        return False
+    return any(media in accept for media in MSGPACK_MEDIA_TYPES)
+
+
+def negotiated_response(request: Request, payload: Any, status_code: int = 200) -> Response:
+    """msgpack when the client asks for it, JSON otherwise."""
+    if wants_msgpack(request.headers.get("accept")):
+        return Response(packb(payload), status_code=status_code, media_type=MSGPACK_MEDIA_TYPE,
+                        headers={"Vary": "Accept"})
+    return JSONResponse(to_jsonable(payload), status_code=status_code, headers={"Vary": "Accept"})
+
+
+def register_celery_serializer() -> str:
+    """Register an ndarray-aware codec with kombu and return its name.
+
+    msgpack with raw array buffers when available, otherwise JSON with arrays
+    converted to lists (kombu's plain JSON codec rejects NumPy types).
+    """
+    from kombu.serialization import register
+    if HAS_MSGPACK:
+        register("cad-msgpack", packb, unpackb, content_type="application/x-cad-msgpack", content_encoding="binary")
+        return "cad-msgpack"
+    register(
+        "cad-json",
+        lambda obj: json.dumps(to_jsonable(obj), separators=(",", ":")),
+        json.loads,
+        content_type="application/x-cad-json",
+        content_encoding="utf-8",
+    )
+    return "cad-json"
@@ -0,0 +1,79 @@
+"""Warm start for geometry workers.
+
+Importing the OCC kernel bindings and trimesh costs seconds per process. The
+loaders import them lazily, so without warming every fresh Celery child or
+pool worker pays that on its first job. ``preload_kernels`` imports them once
+and records how long it took. Called in the Celery parent before the prefork
+pool starts, so forked and recycled children inherit warm modules. Spawned
+geometry pool workers call it from their initializer.
+"""
+from __future__ import annotations
+
+import importlib
+import os
+import time
+from typing import Dict, Optional
+
+OCC_MODULES = (
+    "OCC.Core.STEPControl",
+    "OCC.Core.IFSelect",
+    "OCC.Core.TopoDS",
+    "OCC.Core.TopAbs",
+    "OCC.Core.TopExp",
+    "OCC.Core.TopLoc",
+    "OCC.Core.TopTools",
+    "OCC.Core.BRep",
+    "OCC.Core.BRepAdaptor",
+    "OCC.Core.BRepBndLib",
+    "OCC.Core.BRepGProp",
+    "OCC.Core.BRepMesh",
+    "OCC.Core.Bnd",
+    "OCC.Core.GProp",
+    "OCC.Core.GeomAbs",
+    "OCC.Core.StlAPI",
+    "OCC.Core.gp",
+)
+MESH_MODULES = ("numpy", "trimesh")
+PRELOAD_ENABLED = os.getenv("GEOMETRY_PRELOAD", "1") != "0"
+
+_timings: Dict[str, float] = {}
+_process_started = time.monotonic()
+_warmed_at: Optional[float] = None
+
+
+def _timed_import(name: str) -> bool:
+    start = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    except Exception:
+        return False
+    _timings[name] = round((time.perf_counter() - start) * 1000.0, 2)
+    return True
+
+
+def preload_kernels() -> Dict[str, float]:
+    """Import the geometry stacks once per process; returns per-module import ms."""
+    global _warmed_at
+    if _warmed_at is not None or not PRELOAD_ENABLED:
+        return dict(_timings)
+    start = time.perf_counter()
+    for name in MESH_MODULES:
+        _timed_import(name)
+    from ..loaders.step_loader import occ_available
+    if occ_available():
+        for name in OCC_MODULES:
+            _timed_import(name)
+    _timings["total"] = round((time.perf_counter() - start) * 1000.0, 2)
+    _warmed_at = time.monotonic()
+    return dict(_timings)
+
+
+def bootstrap_stats() -> dict:
+    from ..loaders.step_loader import occ_available
+    return {
+        "pid": os.getpid(),
+        "warm": _warmed_at is not None,
+        "occ_available": occ_available(),
+        "startup_ms": round((_warmed_at - _process_started) * 1000.0, 2) if _warmed_at else None,
+        "import_ms": dict(_timings),
+    }
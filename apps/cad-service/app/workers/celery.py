@@ -1,5 +1,16 @@
 import os
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_init, worker_process_init
+from kombu import Queue
+
+from ..utils.wire import register_celery_serializer
+from .bootstrap import preload_kernels
+from .memory import task_finished, task_started
+from .routing import QUEUE_DEFAULT, TASK_ROUTES, WORKLOADS, PRIORITY_STEPS
+
+# Results carry NumPy feature columns, and chord callbacks receive those results
+# as task arguments; msgpack with raw buffers when installed
+RESULT_SERIALIZER = register_celery_serializer()
 
 # Get Redis URL from environment or use default
 REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
@@ -8,18 +19,60 @@ REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 celery_app = Celery(
     'cad',
     broker=os.getenv('CELERY_BROKER_URL', REDIS_URL),
-    backend=os.getenv('CELERY_RESULT_BACKEND', REDIS_URL)
+    backend=os.getenv('CELERY_RESULT_BACKEND', REDIS_URL),
+    # Tasks are defined next to their routes; workers must import them
+    include=['app.routers.analyze', 'app.routers.gltf', 'app.api.conversion'],
 )
 
 # Configure Celery
 celery_app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    task_serializer=RESULT_SERIALIZER,
+    accept_content=['json', RESULT_SERIALIZER],
+    result_accept_content=['json', RESULT_SERIALIZER],
+    result_serializer=RESULT_SERIALIZER,
     timezone='UTC',
     enable_utc=True,
     task_track_started=True,
     task_time_limit=3600,  # 1 hour max runtime
+    task_soft_time_limit=3000,
     worker_prefetch_multiplier=1,  # Process one task at a time
-    worker_max_tasks_per_child=100  # Restart worker after 100 tasks
+    # Children fork from a warmed parent, so recycling is cheap; keep them for longer
+    worker_max_tasks_per_child=int(os.getenv('CELERY_MAX_TASKS_PER_CHILD', '1000')),
+    # Replace a child after the task that pushes its RSS over this ceiling (KiB)
+    worker_max_memory_per_child=int(os.getenv('CELERY_MAX_MEMORY_PER_CHILD_MB', '2048')) * 1024,
+    # One queue per workload class, see app/workers/routing.py
+    task_queues=[Queue(w.queue) for w in WORKLOADS.values()],
+    task_default_queue=QUEUE_DEFAULT,
+    task_routes=TASK_ROUTES,
+    task_default_priority=PRIORITY_STEPS // 2,
+    broker_transport_options={
+        'queue_order_strategy': 'priority',
+        'priority_steps': list(range(PRIORITY_STEPS)),
+    },
 )
+
+
+@worker_init.connect
+def warm_worker_parent(**_):
+    # Runs in the main worker process before the prefork pool starts
+    preload_kernels()
+
+
+@worker_process_init.connect
+def warm_worker_child(**_):
+    # No-op when inherited from the parent; covers non-fork pools
+    preload_kernels()
+
+
+_QUEUE_BUDGETS = {w.queue: w.memory_budget for w in WORKLOADS.values()}
+
+
+@task_prerun.connect
+def track_task_memory_start(task_id=None, **_):
+    task_started(task_id)
+
+
+@task_postrun.connect
+def track_task_memory_end(task_id=None, task=None, **_):
+    queue = (getattr(task.request, 'delivery_info', None) or {}).get('routing_key') if task else None
+    task_finished(task_id, task.name if task else '?', _QUEUE_BUDGETS.get(queue))
@@ -0,0 +1,90 @@
+"""Per-task memory accounting for Celery workers.
+
+The kernel keeps a per-process RSS high-water mark (VmHWM). It is reset
+before each task (``/proc/self/clear_refs``, Linux >= 4.0) and read back
+afterwards, which gives the peak RSS of that task alone. Where the reset is
+unavailable, the process-lifetime peak is reported instead. Recycling
+itself is done by Celery's ``worker_max_memory_per_child``, which replaces a
+child after the task that pushed it over the ceiling.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import resource
+import sys
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RECENT_TASKS = 50
+
+_task_start_rss: Dict[str, int] = {}
+_recent: Deque[dict] = deque(maxlen=RECENT_TASKS)
+
+
+def _status_kib(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def current_rss_bytes() -> int:
+    kib = _status_kib("VmRSS")
+    if kib is not None:
+        return kib * 1024
+    return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    kib = _status_kib("VmHWM")
+    if kib is not None:
+        return kib * 1024
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KiB elsewhere
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """Reset the VmHWM high-water mark to the current RSS; False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def task_started(task_id: str) -> None:
+    reset_peak_rss()
+    _task_start_rss[task_id] = current_rss_bytes()
+
+
+def task_finished(task_id: str, task_name: str, budget_bytes: Optional[int] = None) -> dict:
+    start = _task_start_rss.pop(task_id, None)
+    peak = peak_rss_bytes()
+    end = current_rss_bytes()
+    entry = {
+        "task_id": task_id,
+        "task": task_name,
+        "pid": os.getpid(),
+        "start_rss_mb": round(start / 2**20, 1) if start is not None else None,
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "end_rss_mb": round(end / 2**20, 1),
+    }
+    _recent.append(entry)
+    if budget_bytes and peak > budget_bytes:
+        logger.warning("task %s peaked at %.1f MB RSS (budget %.1f MB)", task_name, peak / 2**20, budget_bytes / 2**20)
+    else:
+        logger.info("task %s peak RSS %.1f MB", task_name, peak / 2**20)
+    return entry
+
+
+def memory_stats() -> dict:
+    return {"rss_mb": round(current_rss_bytes() / 2**20, 1), "recent_tasks": list(_recent)}
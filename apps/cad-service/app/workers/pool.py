@@ -0,0 +1,125 @@
+"""Bounded process pool for CPU-heavy geometry work called from async routes.
+
+OCC is not thread-safe, so meshing, decimation, GLB export and analysis run in
+separate processes. Admission is capped: once ``GEOMETRY_POOL_MAX_QUEUE`` jobs
+are waiting behind the busy workers, new requests fail fast with 503 instead
+of piling up on the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from .bootstrap import bootstrap_stats, preload_kernels
+
+POOL_WORKERS = int(os.getenv("GEOMETRY_POOL_WORKERS", str(os.cpu_count() or 2)))
+POOL_MAX_QUEUE = int(os.getenv("GEOMETRY_POOL_MAX_QUEUE", str(POOL_WORKERS * 2)))
+POOL_START_METHOD = os.getenv("GEOMETRY_POOL_START_METHOD", "spawn")
+POOL_PREWARM = os.getenv("GEOMETRY_POOL_PREWARM", "1") != "0"
+RETRY_AFTER_SECONDS = 5
+
+_executor: Optional[ProcessPoolExecutor] = None
+_inflight = 0
+_warm_workers: dict = {}
+
+
+class PoolSaturated(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=503,
+            detail="Geometry workers are busy, retry shortly",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+
+
+class _RemoteHTTPError(Exception):
+    """Picklable carrier for HTTPExceptions raised inside pool workers."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _invoke(fn: Callable, args: tuple, kwargs: dict):
+    try:
+        return fn(*args, **kwargs)
+    except HTTPException as exc:
+        raise _RemoteHTTPError(exc.status_code, exc.detail) from None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=POOL_WORKERS,
+            mp_context=multiprocessing.get_context(POOL_START_METHOD),
+            # Spawned workers import OCC/trimesh before taking their first job
+            initializer=preload_kernels,
+        )
+    return _executor
+
+
+async def warm_pool() -> None:
+    """Start every pool worker up front so the first requests do not pay process start-up."""
+    if not POOL_PREWARM:
+        return
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    # One job per worker: the executor starts a new process for each job it cannot hand to an idle one
+    stats = await asyncio.gather(
+        *(loop.run_in_executor(pool, bootstrap_stats) for _ in range(POOL_WORKERS)),
+        return_exceptions=True,
+    )
+    for entry in stats:
+        if isinstance(entry, dict):
+            _warm_workers[entry["pid"]] = entry
+
+
+async def run_in_pool(fn: Callable, *args, **kwargs):
+    """Run a picklable, module-level function in the geometry pool.
+
+    Raises PoolSaturated (503) when the wait queue is full.
+    """
+    global _inflight, _executor
+    if _inflight >= POOL_WORKERS + POOL_MAX_QUEUE:
+        raise PoolSaturated()
+    _inflight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(get_pool(), partial(_invoke, fn, args, kwargs))
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in the kernel); replace the pool for later jobs.
+            _executor = None
+            _warm_workers.clear()
+            raise
+        except _RemoteHTTPError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.detail) from None
+    finally:
+        _inflight -= 1
+
+
+def pool_stats() -> dict:
+    return {
+        "workers": POOL_WORKERS,
+        "max_queue": POOL_MAX_QUEUE,
+        "inflight": _inflight,
+        "queued": max(0, _inflight - POOL_WORKERS),
+        "warm_workers": list(_warm_workers.values()),
+    }
+
+
+def shutdown_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _warm_workers.clear()
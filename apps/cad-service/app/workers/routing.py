@@ -0,0 +1,219 @@
+"""Queue routing for Celery geometry tasks.
+
+Work is split by workload class so a large STEP tessellation cannot sit in
+front of quick STL analyses:
+
+- ``cad.mesh``      STL/OBJ analysis (trimesh, seconds)
+- ``cad.occ``       STEP/IGES analysis below LARGE_FILE_BYTES
+- ``cad.occ.large`` STEP/IGES at or above LARGE_FILE_BYTES, on dedicated workers
+- ``cad.gltf``      GLB conversion
+- ``cad.default``   bookkeeping (batch aggregation)
+
+Within a queue, smaller files get a higher priority. Each workload also has a
+memory budget: files whose estimated peak memory exceeds it move to the large
+queue, and files over the large budget are rejected up front. Run one worker per queue
+group with its own concurrency::
+
+    python -m app.workers.routing mesh      # -Q cad.mesh -c 8 --prefetch-multiplier 4
+    python -m app.workers.routing occ       # -Q cad.occ -c 4
+    python -m app.workers.routing occ-large # -Q cad.occ.large -c 1
+"""
+from __future__ import annotations
+
+import os
+import struct
+import sys
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+QUEUE_DEFAULT = "cad.default"
+QUEUE_MESH = "cad.mesh"
+QUEUE_OCC = "cad.occ"
+QUEUE_OCC_LARGE = "cad.occ.large"
+QUEUE_GLTF = "cad.gltf"
+
+LARGE_FILE_BYTES = int(os.getenv("CELERY_LARGE_FILE_BYTES", str(50 * 1024 * 1024)))
+PRIORITY_STEPS = 10  # Redis transport: 0 is consumed first
+
+MESH_EXTENSIONS = (".stl", ".obj", ".ply", ".off", ".glb", ".gltf")
+
+# Rough peak-memory model, calibrated on typical parts
+MESH_BYTES_PER_TRIANGLE = 400  # trimesh arrays, caches and ray-cast acceleration
+BREP_BYTES_PER_FILE_BYTE = 12  # STEP text -> in-memory B-rep
+BREP_BYTES_PER_FACE = 64 * 1024  # per-face surfaces, triangulation and extractor indices
+BASE_PROCESS_BYTES = 300 * 1024 * 1024  # interpreter plus preloaded kernels
+
+
+class MemoryBudgetExceeded(ValueError):
+    def __init__(self, estimate_bytes: int, budget_bytes: int):
+        super().__init__(
+            f"Estimated memory {estimate_bytes / 2**20:.0f} MB exceeds the {budget_bytes / 2**20:.0f} MB budget"
+        )
+        self.estimate_bytes = estimate_bytes
+        self.budget_bytes = budget_bytes
+
+
+def _mb_env(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default))) * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Workload:
+    queue: str
+    concurrency: int
+    prefetch_multiplier: int
+    soft_time_limit: int
+    time_limit: int
+    memory_budget: int  # bytes per child; also the recycle ceiling
+
+
+WORKLOADS: Dict[str, Workload] = {
+    "mesh": Workload(QUEUE_MESH, int(os.getenv("CELERY_MESH_CONCURRENCY", "8")), 4, 60, 120,
+                     _mb_env("CELERY_MESH_MEMORY_MB", 1024)),
+    "occ": Workload(QUEUE_OCC, int(os.getenv("CELERY_OCC_CONCURRENCY", "4")), 1, 600, 900,
+                    _mb_env("CELERY_OCC_MEMORY_MB", 2048)),
+    "occ-large": Workload(QUEUE_OCC_LARGE, int(os.getenv("CELERY_OCC_LARGE_CONCURRENCY", "1")), 1, 3000, 3600,
+                          _mb_env("CELERY_OCC_LARGE_MEMORY_MB", 8192)),
+    "gltf": Workload(QUEUE_GLTF, int(os.getenv("CELERY_GLTF_CONCURRENCY", "2")), 1, 600, 900,
+                     _mb_env("CELERY_GLTF_MEMORY_MB", 2048)),
+    "default": Workload(QUEUE_DEFAULT, int(os.getenv("CELERY_DEFAULT_CONCURRENCY", "2")), 4, 60, 120,
+                        _mb_env("CELERY_DEFAULT_MEMORY_MB", 512)),
+}
+
+# Static routes for tasks whose workload does not depend on the input file
+TASK_ROUTES = {
+    "app.routers.gltf.convert_to_gltf": {"queue": QUEUE_GLTF},
+    "app.routers.analyze.aggregate_batch": {"queue": QUEUE_DEFAULT},
+}
+
+
+def source_extension(file_path: Optional[str], file_url: Optional[str]) -> str:
+    name = file_path or (urlparse(file_url).path if file_url else "")
+    return os.path.splitext(name)[1].lower()
+
+
+def source_size(file_path: Optional[str], size_bytes: Optional[int] = None) -> Optional[int]:
+    if size_bytes is not None:
+        return size_bytes
+    if file_path:
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return None
+    return None
+
+
+def size_priority(size_bytes: Optional[int]) -> int:
+    """Map file size onto 0 (small, first) .. 9 (large); unknown sizes sit in the middle."""
+    if size_bytes is None:
+        return PRIORITY_STEPS // 2
+    # One step per doubling from 256 KiB
+    step = max(0, int(size_bytes).bit_length() - 18)
+    return min(PRIORITY_STEPS - 1, step)
+
+
+def stl_triangle_count(file_path: Optional[str]) -> Optional[int]:
+    """Triangle count from a binary STL header without reading the body."""
+    if not file_path:
+        return None
+    try:
+        with open(file_path, "rb") as fh:
+            header = fh.read(84)
+        size = os.path.getsize(file_path)
+    except OSError:
+        return None
+    if len(header) < 84:
+        return None
+    count = struct.unpack_from("<I", header, 80)[0]
+    # ASCII files ("solid ...") do not carry a count; trust it only if sizes agree
+    return count if 84 + 50 * count == size else None
+
+
+def estimate_memory_bytes(
+    file_path: Optional[str],
+    file_url: Optional[str],
+    size_bytes: Optional[int] = None,
+    face_count: Optional[int] = None,
+) -> Optional[int]:
+    """Estimated peak RSS for analyzing a file; None when nothing is known about it.
+
+    ``face_count`` is triangles for meshes and B-rep faces for STEP/IGES.
+    """
+    size = source_size(file_path, size_bytes)
+    if source_extension(file_path, file_url) in MESH_EXTENSIONS:
+        triangles = face_count or stl_triangle_count(file_path)
+        if triangles is None and size is not None:
+            triangles = size // 50  # binary STL record size; ASCII overestimates, which is safe
+        if triangles is None:
+            return None
+        return BASE_PROCESS_BYTES + triangles * MESH_BYTES_PER_TRIANGLE
+    if size is None and face_count is None:
+        return None
+    return BASE_PROCESS_BYTES + (size or 0) * BREP_BYTES_PER_FILE_BYTE + (face_count or 0) * BREP_BYTES_PER_FACE
+
+
+def workload_for_source(
+    file_path: Optional[str],
+    file_url: Optional[str],
+    size_bytes: Optional[int] = None,
+    face_count: Optional[int] = None,
+) -> str:
+    """Workload name for a file, escalating to the large queue when over the memory budget.
+
+    Raises MemoryBudgetExceeded when even the large workers could not hold it.
+    """
+    size = source_size(file_path, size_bytes)
+    if source_extension(file_path, file_url) in MESH_EXTENSIONS:
+        name = "mesh"
+    elif size is not None and size >= LARGE_FILE_BYTES:
+        name = "occ-large"
+    else:
+        name = "occ"
+    estimate = estimate_memory_bytes(file_path, file_url, size_bytes, face_count)
+    if estimate is None or estimate <= WORKLOADS[name].memory_budget:
+        return name
+    largest = WORKLOADS["occ-large"].memory_budget
+    if estimate > largest:
+        raise MemoryBudgetExceeded(estimate, largest)
+    return "occ-large"
+
+
+def route_for_source(
+    file_path: Optional[str],
+    file_url: Optional[str],
+    size_bytes: Optional[int] = None,
+    face_count: Optional[int] = None,
+) -> dict:
+    """apply_async options (queue, priority, time limits) for a per-file geometry task."""
+    workload = WORKLOADS[workload_for_source(file_path, file_url, size_bytes, face_count)]
+    return {
+        "queue": workload.queue,
+        "priority": size_priority(source_size(file_path, size_bytes)),
+        "soft_time_limit": workload.soft_time_limit,
+        "time_limit": workload.time_limit,
+    }
+
+
+def worker_argv(name: str) -> list[str]:
+    workload = WORKLOADS[name]
+    return [
+        "worker",
+        "-Q", workload.queue,
+        "-c", str(workload.concurrency),
+        "--prefetch-multiplier", str(workload.prefetch_multiplier),
+        "--soft-time-limit", str(workload.soft_time_limit),
+        "--time-limit", str(workload.time_limit),
+        "--max-memory-per-child", str(workload.memory_budget // 1024),  # KiB
+        "-n", f"{name}@%h",
+        "--loglevel", os.getenv("CELERY_LOGLEVEL", "info"),
+    ]
+
+
+if __name__ == "__main__":
+    from .celery import celery_app
+
+    group = sys.argv[1] if len(sys.argv) > 1 else "default"
+    if group not in WORKLOADS:
+        sys.exit(f"unknown workload {group!r}; expected one of {', '.join(WORKLOADS)}")
+    celery_app.worker_main(worker_argv(group) + sys.argv[2:])
@@ -0,0 +1,164 @@
+"""Procedurally generated reference parts.
+
+Every part is deterministic for a given scale, so timings are comparable
+between runs and machines. STEP parts are built with OCC; the thin-walled
+mesh only needs NumPy.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+SCALES = {"small": 1, "medium": 4, "large": 16}
+
+# Binary STL triangle record (50 bytes, unpadded)
+STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+
+
+@dataclass(frozen=True)
+class PartSpec:
+    name: str
+    kind: str  # "step" or "stl"
+    write: Callable[[str], None]
+    description: str
+
+
+# --- OCC parts --------------------------------------------------------------
+
+
+def _grid(n: int, pitch: float) -> Tuple[int, int, List[Tuple[float, float]]]:
+    cols = max(1, math.ceil(math.sqrt(n)))
+    rows = max(1, math.ceil(n / cols))
+    centers = [(pitch * (k % cols + 0.5), pitch * (k // cols + 0.5)) for k in range(n)]
+    return cols, rows, centers
+
+
+def _cut_all(base, tools: list):
+    from OCC.Core.BRep import BRep_Builder
+    from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut
+    from OCC.Core.TopoDS import TopoDS_Compound
+
+    builder = BRep_Builder()
+    compound = TopoDS_Compound()
+    builder.MakeCompound(compound)
+    for tool in tools:
+        builder.Add(compound, tool)
+    return BRepAlgoAPI_Cut(base, compound).Shape()
+
+
+def plate_with_holes(n_holes: int, *, diameter: float = 6.0, pitch: float = 12.0, thickness: float = 10.0):
+    """Plate with a grid of holes; every other hole is blind at half depth."""
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCylinder
+    from OCC.Core.gp import gp_Ax2, gp_Dir, gp_Pnt
+
+    cols, rows, centers = _grid(n_holes, pitch)
+    plate = BRepPrimAPI_MakeBox(cols * pitch, rows * pitch, thickness).Shape()
+    tools = []
+    for k, (x, y) in enumerate(centers):
+        blind = k % 2 == 1
+        z0 = thickness / 2.0 if blind else -1.0
+        height = thickness - z0 + 1.0
+        axis = gp_Ax2(gp_Pnt(x, y, z0), gp_Dir(0.0, 0.0, 1.0))
+        tools.append(BRepPrimAPI_MakeCylinder(axis, diameter / 2.0, height).Shape())
+    return _cut_all(plate, tools)
+
+
+def pocketed_block(n_pockets: int, *, size: float = 10.0, depth: float = 5.0, pitch: float = 16.0, height: float = 20.0):
+    """Block with a grid of rectangular pockets cut from the top face."""
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+    from OCC.Core.gp import gp_Pnt
+
+    cols, rows, centers = _grid(n_pockets, pitch)
+    block = BRepPrimAPI_MakeBox(cols * pitch, rows * pitch, height).Shape()
+    tools = [
+        BRepPrimAPI_MakeBox(gp_Pnt(x - size / 2, y - size / 2, height - depth), size, size, depth + 1.0).Shape()
+        for x, y in centers
+    ]
+    return _cut_all(block, tools)
+
+
+def write_step(shape, path: str) -> None:
+    from OCC.Core.IFSelect import IFSelect_RetDone
+    from OCC.Core.STEPControl import STEPControl_AsIs, STEPControl_Writer
+
+    writer = STEPControl_Writer()
+    writer.Transfer(shape, STEPControl_AsIs)
+    if writer.Write(path) != IFSelect_RetDone:
+        raise RuntimeError(f"STEP write failed: {path}")
+
+
+# --- Mesh parts -------------------------------------------------------------
+
+
+def _box_surface(lo: np.ndarray, hi: np.ndarray, divisions: int, outward: bool) -> np.ndarray:
+    """Triangles (n, 3, 3) of an axis-aligned box with every side split into a divisions x divisions grid."""
+    t = np.linspace(0.0, 1.0, divisions + 1)
+    u, v = np.meshgrid(t[:-1], t[:-1], indexing="ij")
+    u, v = u.ravel(), v.ravel()
+    step = 1.0 / divisions
+    quads = np.stack([np.stack([u, v], 1), np.stack([u + step, v], 1),
+                      np.stack([u + step, v + step], 1), np.stack([u, v + step], 1)], axis=1)
+    triangles = []
+    for axis in range(3):
+        a, b = [i for i in range(3) if i != axis]
+        for side, sign in ((0, -1.0), (1, 1.0)):
+            pts = np.empty(quads.shape[:2] + (3,))
+            pts[..., axis] = (lo, hi)[side][axis]
+            pts[..., a] = lo[a] + quads[..., 0] * (hi[a] - lo[a])
+            pts[..., b] = lo[b] + quads[..., 1] * (hi[b] - lo[b])
+            tri = np.concatenate([pts[:, [0, 1, 2]], pts[:, [0, 2, 3]]])
+            # (a, b, axis) is right-handed for axis 0 and 2 only
+            normal_sign = sign * (1.0 if axis != 1 else -1.0) * (1.0 if outward else -1.0)
+            if normal_sign < 0:
+                tri = tri[:, [0, 2, 1]]
+            triangles.append(tri)
+    return np.concatenate(triangles)
+
+
+def thin_shell_triangles(divisions: int, *, size: float = 60.0, wall: float = 1.2) -> np.ndarray:
+    """Closed hollow cube: outer skin plus an inward-facing inner skin ``wall`` mm inside."""
+    outer = _box_surface(np.zeros(3), np.full(3, size), divisions, outward=True)
+    inner = _box_surface(np.full(3, wall), np.full(3, size - wall), divisions, outward=False)
+    return np.concatenate([outer, inner])
+
+
+def write_stl(triangles: np.ndarray, path: str) -> None:
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    records = np.zeros(len(triangles), dtype=STL_RECORD)
+    records["normal"] = normals
+    records["vertices"] = triangles
+    with open(path, "wb") as fh:
+        fh.write(b"cad-service benchmark part".ljust(80, b" "))
+        fh.write(np.uint32(len(triangles)).tobytes())
+        fh.write(records.tobytes())
+
+
+# --- Corpus -----------------------------------------------------------------
+
+
+def corpus(scale: str) -> List[PartSpec]:
+    factor = SCALES[scale]
+    holes = 16 * factor
+    pockets = 4 * factor
+    divisions = int(round(20 * math.sqrt(factor)))
+    return [
+        PartSpec(
+            f"plate_{holes}_holes", "step",
+            lambda path: write_step(plate_with_holes(holes), path),
+            f"plate with {holes} through/blind holes",
+        ),
+        PartSpec(
+            f"block_{pockets}_pockets", "step",
+            lambda path: write_step(pocketed_block(pockets), path),
+            f"block with {pockets} rectangular pockets",
+        ),
+        PartSpec(
+            f"thin_shell_{divisions}", "stl",
+            lambda path: write_stl(thin_shell_triangles(divisions), path),
+            f"1.2 mm hollow cube, {24 * divisions * divisions} triangles",
+        ),
+    ]
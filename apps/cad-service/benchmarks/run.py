@@ -0,0 +1,187 @@
+"""Geometry kernel benchmark runner.
+
+Generates the reference corpus (benchmarks/parts.py), times every pipeline
+stage (benchmarks/stages.py) and compares the results with stored baselines::
+
+    python -m benchmarks.run --scale small                  # compare, exit 1 on regression
+    python -m benchmarks.run --scale medium --update-baseline
+
+Wall time is the median of ``--repeats`` runs. Peak memory is the RSS
+high-water mark above the stage's starting RSS (reset per stage on Linux),
+so it includes OCC's native allocations. Baselines are machine specific;
+record them on the machine that runs the comparison.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_BASELINE = HERE / "baselines.json"
+MEMORY_SLACK_MB = 8.0  # small stages are dominated by allocator noise
+
+
+def _prepare_environment(workdir: Path) -> None:
+    # GLB stages write through the result store; keep that out of the shared cache
+    os.environ["RESULT_CACHE_BACKEND"] = "disk"
+    os.environ["RESULT_CACHE_DIR"] = str(workdir / "result-cache")
+    sys.path.insert(0, str(HERE.parent))
+
+
+def _measure(stage, ctx: dict, repeats: int) -> dict:
+    from app.workers.memory import current_rss_bytes, peak_rss_bytes, reset_peak_rss
+
+    gc.collect()
+    start_rss = current_rss_bytes()
+    peak_reset = reset_peak_rss()
+    times: List[float] = []
+    units = 0.0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        units = stage.run(ctx)
+        times.append(time.perf_counter() - t0)
+    wall = statistics.median(times)
+    peak_mb = (peak_rss_bytes() - start_rss) / 2**20 if peak_reset else None
+    return {
+        "wall_s": round(wall, 6),
+        "wall_min_s": round(min(times), 6),
+        "peak_mb": round(max(peak_mb, 0.0), 2) if peak_mb is not None else None,
+        "units": units,
+        "unit": stage.unit,
+        "throughput": round(units / wall, 2) if wall > 0 else None,
+    }
+
+
+def run_corpus(scale: str, repeats: int, workdir: Path, only: Optional[str]) -> Dict[str, dict]:
+    from app.loaders.step_loader import occ_available
+    from benchmarks.parts import corpus
+    from benchmarks.stages import STAGES
+
+    results: Dict[str, dict] = {}
+    for spec in corpus(scale):
+        if spec.kind == "step" and not occ_available():
+            print(f"skip {spec.name}: pythonOCC not available")
+            continue
+        path = workdir / f"{spec.name}.{spec.kind}"
+        if not path.exists():
+            spec.write(str(path))
+        ctx = {"name": spec.name, "path": str(path)}
+        for stage in STAGES[spec.kind]:
+            key = f"{scale}/{spec.name}/{stage.name}"
+            try:
+                if only and only not in key:
+                    # Still needed by the stages after it, just not measured
+                    stage.run(ctx)
+                    continue
+                results[key] = _measure(stage, ctx, repeats)
+            except ImportError as exc:
+                # Optional dependency missing (trimesh, OCC modules); later stages need this one
+                print(f"skip {key} and the rest of {spec.name}: {exc}")
+                break
+            except Exception:
+                traceback.print_exc()
+                results[key] = {"error": traceback.format_exc(limit=1).strip().splitlines()[-1]}
+                # Later stages of this part depend on this one
+                break
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], time_tol: float, memory_tol: float) -> List[str]:
+    regressions = []
+    for key, result in results.items():
+        if "error" in result:
+            regressions.append(f"{key}: failed ({result['error']})")
+            continue
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result["wall_s"] > base["wall_s"] * (1.0 + time_tol):
+            regressions.append(f"{key}: wall {result['wall_s']:.4f}s vs baseline {base['wall_s']:.4f}s")
+        if result.get("peak_mb") is not None and base.get("peak_mb") is not None:
+            if result["peak_mb"] > base["peak_mb"] * (1.0 + memory_tol) + MEMORY_SLACK_MB:
+                regressions.append(f"{key}: peak {result['peak_mb']:.1f}MB vs baseline {base['peak_mb']:.1f}MB")
+    return regressions
+
+
+def print_table(results: Dict[str, dict], baseline: Dict[str, dict]) -> None:
+    print(f"{'stage':<48} {'wall s':>10} {'base s':>10} {'peak MB':>9} {'throughput':>20}")
+    for key, r in results.items():
+        if "error" in r:
+            print(f"{key:<48} {'ERROR':>10}  {r['error']}")
+            continue
+        base = baseline.get(key, {}).get("wall_s")
+        base_s = f"{base:.4f}" if base is not None else "-"
+        peak = f"{r['peak_mb']:.1f}" if r["peak_mb"] is not None else "-"
+        rate = f"{r['throughput']:.0f} {r['unit']}/s" if r["throughput"] is not None else "-"
+        print(f"{key:<48} {r['wall_s']:>10.4f} {base_s:>10} {peak:>9} {rate:>20}")
+
+
+def load_baseline(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {"results": {}}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=["small", "medium", "large"], default="small")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", help="run only stages whose key contains this string")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="record these results as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=float(os.getenv("BENCH_TIME_TOLERANCE", "0.25")))
+    parser.add_argument("--memory-tolerance", type=float, default=float(os.getenv("BENCH_MEMORY_TOLERANCE", "0.20")))
+    parser.add_argument("--workdir", type=Path, help="where generated parts are kept (default: a temp dir)")
+    parser.add_argument("--json", type=Path, help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="cad-bench-") as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        _prepare_environment(workdir)
+        results = run_corpus(args.scale, args.repeats, workdir, args.only)
+
+    stored = load_baseline(args.baseline)
+    baseline = stored.get("results", {})
+    print_table(results, baseline)
+    if args.json:
+        args.json.write_text(json.dumps({"scale": args.scale, "results": results}, indent=2))
+
+    if args.update_baseline:
+        fresh = {k: v for k, v in results.items() if "error" not in v}
+        stored["results"] = {**baseline, **fresh}
+        stored["meta"] = {
+            "machine": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "repeats": args.repeats,
+        }
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"baseline updated: {len(fresh)} stages -> {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    missing = [k for k in results if k not in baseline]
+    if missing:
+        print(f"{len(missing)} stages have no baseline; record one with --update-baseline")
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Pipeline stages timed by the benchmark runner.
+
+Each stage takes the shared context of its part (file path plus outputs of
+earlier stages), may add to it, and returns the amount of work done in its
+throughput unit (faces, triangles or MB).
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+Context = Dict[str, object]
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    unit: str
+    run: Callable[[Context], float]
+
+
+def _load_step(ctx: Context) -> float:
+    from app.loaders.step_loader import load_step_shape
+    ctx["shape"] = load_step_shape(ctx["path"])
+    return os.path.getsize(ctx["path"]) / 2**20
+
+
+def _shape_index(ctx: Context) -> float:
+    from app.extractors.topology import ShapeIndex
+    ctx["index"] = ShapeIndex.build(ctx["shape"])
+    return ctx["index"].face_count
+
+
+def _mass_props(ctx: Context) -> float:
+    from app.loaders.step_loader import shape_mass_props
+    shape_mass_props(ctx["shape"])
+    return ctx["index"].face_count
+
+
+def _holes(ctx: Context) -> float:
+    from app.extractors.holes import extract_holes_from_shape
+    ctx["holes"] = len(extract_holes_from_shape(ctx["shape"], ctx["index"]))
+    return ctx["index"].face_count
+
+
+def _pockets(ctx: Context) -> float:
+    from app.extractors.pockets import extract_pockets_from_shape
+    ctx["pockets"] = len(extract_pockets_from_shape(ctx["shape"], ctx["index"]))
+    return ctx["index"].face_count
+
+
+def _tessellate(ctx: Context) -> float:
+    from app.loaders.triangulation import auto_tessellate, clear_triangulation
+    # BRepMesh skips faces that are already meshed; start from scratch on every repeat
+    clear_triangulation(ctx["shape"])
+    return auto_tessellate(ctx["shape"]).triangles
+
+
+def _triangulation_arrays(ctx: Context) -> float:
+    from app.loaders.triangulation import triangulation_arrays
+    return triangulation_arrays(ctx["shape"]).triangle_count
+
+
+def _stl_writer_roundtrip(ctx: Context) -> float:
+    # The path triangulation_arrays replaced: write the meshed shape as STL and parse it back
+    from OCC.Core.StlAPI import StlAPI_Writer
+    from app.loaders.stl_loader import load_stl
+    path = f"{ctx['path']}.roundtrip.stl"
+    try:
+        writer = StlAPI_Writer()
+        writer.SetASCIIMode(False)
+        writer.Write(ctx["shape"], path)
+        return len(load_stl(path).faces)
+    finally:
+        os.unlink(path)
+
+
+def _load_stl(ctx: Context) -> float:
+    from app.loaders.stl_loader import load_stl
+    ctx["mesh"] = load_stl(ctx["path"])
+    return len(ctx["mesh"].faces)
+
+
+def _min_wall(ctx: Context) -> float:
+    from app.extractors.min_wall import min_wall_mesh
+    ctx["min_wall_mm"] = min_wall_mesh(ctx["mesh"]).global_min_mm
+    return len(ctx["mesh"].faces)
+
+
+def _glb_pipeline(kind: str) -> Callable[[Context], float]:
+    def run(ctx: Context) -> float:
+        from app.routers.gltf import build_mesh_lods, lod_cache_keys
+        sha = f"bench-{ctx['name']}"
+        metadata = build_mesh_lods(kind, ctx["path"], sha, lod_cache_keys(kind, sha), None)
+        return metadata["high"]["triangle_count"]
+    return run
+
+
+STEP_STAGES: List[Stage] = [
+    Stage("load_step", "MB", _load_step),
+    Stage("shape_index", "faces", _shape_index),
+    Stage("mass_props", "faces", _mass_props),
+    Stage("holes", "faces", _holes),
+    Stage("pockets", "faces", _pockets),
+    Stage("tessellate", "triangles", _tessellate),
+    Stage("triangulation_arrays", "triangles", _triangulation_arrays),
+    Stage("stl_writer_roundtrip", "triangles", _stl_writer_roundtrip),
+    Stage("glb_pipeline", "triangles", _glb_pipeline("step")),
+]
+
+STL_STAGES: List[Stage] = [
+    Stage("load_stl", "triangles", _load_stl),
+    Stage("min_wall", "triangles", _min_wall),
+    Stage("glb_pipeline", "triangles", _glb_pipeline("stl")),
+]
+
+STAGES = {"step": STEP_STAGES, "stl": STL_STAGES}
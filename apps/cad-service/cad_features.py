@@ -10,9 +10,11 @@ Dependencies:
   pip install fastapi uvicorn python-multipart OCP numpy
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from typing import Dict, Any, List, Optional
+from fastapi import FastAPI, File, Header, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import multiprocessing
 import tempfile
 import os
 import json
@@ -20,21 +22,144 @@ import json
 try:
     from OCP.STEPControl import STEPControl_Reader
     from OCP.IGESControl import IGESControl_Reader
-    from OCP.TopExp import TopExp_Explorer
-    from OCP.TopAbs import TopAbs_SOLID, TopAbs_FACE, TopAbs_EDGE
+    from OCP.TopoDS import TopoDS, TopoDS_Iterator
+    from OCP.TopAbs import TopAbs_SOLID, TopAbs_SHELL, TopAbs_FACE, TopAbs_WIRE, TopAbs_EDGE, TopAbs_VERTEX
+    from OCP.TopTools import TopTools_IndexedMapOfShape
+    from OCP.GeomAbs import (
+        GeomAbs_Plane, GeomAbs_Cylinder, GeomAbs_Cone, GeomAbs_Sphere, GeomAbs_Torus,
+        GeomAbs_BSplineSurface, GeomAbs_BezierSurface, GeomAbs_SurfaceOfRevolution,
+        GeomAbs_SurfaceOfExtrusion, GeomAbs_Line, GeomAbs_Circle, GeomAbs_Ellipse,
+        GeomAbs_BSplineCurve, GeomAbs_BezierCurve,
+    )
+    from OCP.BRepAdaptor import BRepAdaptor_Surface, BRepAdaptor_Curve
+    from OCP.BRep import BRep_Tool
     from OCP.GProp import GProp_GProps
     from OCP.BRepGProp import brepgprop
     from OCP.BRepBndLib import brepbndlib
     from OCP.Bnd import Bnd_Box
     HAS_OCP = True
+
+    SURFACE_TYPES = {
+        GeomAbs_Plane: 'plane',
+        GeomAbs_Cylinder: 'cylinder',
+        GeomAbs_Cone: 'cone',
+        GeomAbs_Sphere: 'sphere',
+        GeomAbs_Torus: 'torus',
+        GeomAbs_BSplineSurface: 'freeform',
+        GeomAbs_BezierSurface: 'freeform',
+        GeomAbs_SurfaceOfRevolution: 'revolution',
+        GeomAbs_SurfaceOfExtrusion: 'extrusion',
+    }
+    CURVE_TYPES = {
+        GeomAbs_Line: 'line',
+        GeomAbs_Circle: 'circle',
+        GeomAbs_Ellipse: 'ellipse',
+        GeomAbs_BSplineCurve: 'freeform',
+        GeomAbs_BezierCurve: 'freeform',
+    }
+    CENSUS_KINDS = {
+        TopAbs_SOLID: 'solid', TopAbs_SHELL: 'shell', TopAbs_FACE: 'face',
+        TopAbs_WIRE: 'wire', TopAbs_EDGE: 'edge', TopAbs_VERTEX: 'vertex',
+    }
 except ImportError:
     HAS_OCP = False
     print("Warning: OpenCascade (OCP) not installed. Install with: pip install OCP")
 
 import numpy as np
 
+# Fixed key order keeps feature_vector positions stable for the pricing model
+SURFACE_KINDS = ['plane', 'cylinder', 'cone', 'sphere', 'torus', 'freeform', 'revolution', 'extrusion', 'other']
+CURVE_KINDS = ['line', 'circle', 'ellipse', 'freeform', 'other']
+
+# feature_vector layout. The first 21 positions are the original vector
+# (geometry, then file metadata); keys added later go after them so existing
+# indices never move.
+# Version 2: edge_count (and complexity_score, which uses it) counts distinct
+# edges; version 1 counted an edge once per face it bounds, so values differ
+# from version 1 and the pricing model must be retrained on version 2 vectors.
+FEATURE_VECTOR_VERSION = 2
+FEATURE_VECTOR_KEYS = [
+    'dim_x', 'dim_y', 'dim_z', 'max_dim', 'min_dim', 'dim_ratio',
+    'volume', 'surface_area', 'surface_to_volume_ratio',
+    'solid_count', 'face_count', 'edge_count', 'complexity_score',
+    'bbox_volume', 'bbox_utilization', 'centroid_x', 'centroid_y', 'centroid_z',
+    'file_name', 'file_size_bytes', 'format',
+    'shell_count', 'wire_count', 'vertex_count',
+    *(f'face_count_{kind}' for kind in SURFACE_KINDS),
+    *(f'area_fraction_{kind}' for kind in SURFACE_KINDS),
+    *(f'edge_count_{kind}' for kind in CURVE_KINDS),
+]
+
 app = FastAPI(title="CAD Feature Extractor", version="1.0.0")
 
+SUPPORTED_FORMATS = ['step', 'stp', 'iges', 'igs']
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+BATCH_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+BATCH_FILE_TIMEOUT_S = float(os.getenv("BATCH_EXTRACT_TIMEOUT_S", "120"))
+# Whole-request bound, time spent queued for a worker included
+BATCH_DEADLINE_S = float(os.getenv("BATCH_EXTRACT_DEADLINE_S", "600"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_pool: Optional["ExtractionPool"] = None
+
+
+def topology_census(shape) -> Dict[str, Any]:
+    """Walk the shape graph once, counting each distinct sub-shape a single time.
+
+    Shared sub-shapes (an edge bounding two faces, a vertex on three edges) are
+    deduplicated through per-kind indexed maps and only descended into on first
+    visit. Faces are classified by surface type with their area, edges by
+    curve type; the face areas also give the total surface area, so no
+    separate global surface-property pass is needed.
+    """
+    maps = {kind: TopTools_IndexedMapOfShape() for kind in CENSUS_KINDS}
+    stack = [shape]
+    while stack:
+        it = TopoDS_Iterator(stack.pop())
+        while it.More():
+            child = it.Value()
+            seen = maps.get(child.ShapeType())
+            if seen is None:
+                # Compounds / compsolids are containers only
+                stack.append(child)
+            else:
+                before = seen.Extent()
+                seen.Add(child)
+                if seen.Extent() > before:
+                    stack.append(child)
+            it.Next()
+
+    face_counts = dict.fromkeys(SURFACE_KINDS, 0)
+    face_areas = dict.fromkeys(SURFACE_KINDS, 0.0)
+    faces = maps[TopAbs_FACE]
+    for i in range(1, faces.Extent() + 1):
+        face = TopoDS.Face_s(faces.FindKey(i))
+        kind = SURFACE_TYPES.get(BRepAdaptor_Surface(face, False).GetType(), 'other')
+        props = GProp_GProps()
+        brepgprop.SurfaceProperties_s(face, props)
+        face_counts[kind] += 1
+        face_areas[kind] += props.Mass()
+
+    edge_counts = dict.fromkeys(CURVE_KINDS, 0)
+    edges = maps[TopAbs_EDGE]
+    for i in range(1, edges.Extent() + 1):
+        edge = TopoDS.Edge_s(edges.FindKey(i))
+        if BRep_Tool.Degenerated_s(edge):
+            continue
+        edge_counts[CURVE_TYPES.get(BRepAdaptor_Curve(edge).GetType(), 'other')] += 1
+
+    counts = {name: maps[kind].Extent() for kind, name in CENSUS_KINDS.items()}
+    if shape.ShapeType() in maps:
+        # The root itself (e.g. a bare solid) is not reached by iterating its children
+        counts[CENSUS_KINDS[shape.ShapeType()]] += 1
+    return {
+        'counts': counts,
+        'face_counts': face_counts,
+        'face_areas': face_areas,
+        'edge_counts': edge_counts,
+        'surface_area': sum(face_areas.values()),
+    }
+
 
 def extract_step_features(file_path: str) -> Dict[str, Any]:
     """Extract geometric features from STEP file using OpenCascade"""
@@ -68,32 +193,13 @@ def extract_step_features(file_path: str) -> Dict[str, Any]:
         'z': zmax - zmin,
     }
     
-    # Count topology elements
-    explorer = TopExp_Explorer()
-    
-    solid_count = 0
-    explorer.Init(shape, TopAbs_SOLID)
-    while explorer.More():
-        solid_count += 1
-        explorer.Next()
-    
-    face_count = 0
-    explorer.Init(shape, TopAbs_FACE)
-    while explorer.More():
-        face_count += 1
-        explorer.Next()
-    
-    edge_count = 0
-    explorer.Init(shape, TopAbs_EDGE)
-    while explorer.More():
-        edge_count += 1
-        explorer.Next()
-    
-    # Calculate complexity metrics
-    surface_area = 0.0
-    props_surf = GProp_GProps()
-    brepgprop.SurfaceProperties_s(shape, props_surf)
-    surface_area = props_surf.Mass()
+    # Count topology elements and surface area in one traversal
+    census = topology_census(shape)
+    counts = census['counts']
+    solid_count = counts['solid']
+    face_count = counts['face']
+    edge_count = counts['edge']
+    surface_area = census['surface_area']
     
     # Feature vector for ML (normalized)
     features = {
@@ -126,11 +232,168 @@ def extract_step_features(file_path: str) -> Dict[str, Any]:
         'centroid_x': centroid.X(),
         'centroid_y': centroid.Y(),
         'centroid_z': centroid.Z(),
+        
+        # Remaining topology counts
+        'shell_count': counts['shell'],
+        'wire_count': counts['wire'],
+        'vertex_count': counts['vertex'],
     }
     
+    # Surface / curve type breakdown; vector positions come from FEATURE_VECTOR_KEYS
+    for kind in SURFACE_KINDS:
+        features[f'face_count_{kind}'] = census['face_counts'][kind]
+    for kind in SURFACE_KINDS:
+        features[f'area_fraction_{kind}'] = census['face_areas'][kind] / (surface_area + 0.001)
+    for kind in CURVE_KINDS:
+        features[f'edge_count_{kind}'] = census['edge_counts'][kind]
+    
     return features
 
 
+def extract_file_features(file_path: str, format: str) -> Dict[str, Any]:
+    """Process-pool entry point: returns ``{"features": ...}`` or ``{"error": ...}``."""
+    try:
+        # IGES goes through the STEP path for now (see /extract-features)
+        return {"features": extract_step_features(file_path)}
+    except HTTPException as e:
+        return {"error": e.detail}
+    except Exception as e:
+        return {"error": f"Feature extraction failed: {str(e)}"}
+
+
+def _worker_main(conn) -> None:
+    """Extraction worker loop: one ``(file_path, format)`` job in, one outcome out."""
+    while True:
+        try:
+            file_path, format = conn.recv()
+        except EOFError:
+            return
+        conn.send(extract_file_features(file_path, format))
+
+
+def _exchange(conn, file_path: str, format: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """Send one job and wait for its outcome; None on timeout. Raises EOFError if the worker died."""
+    conn.send((file_path, format))
+    if not conn.poll(max(timeout, 0.0)):
+        return None
+    return conn.recv()
+
+
+class ExtractionWorker:
+    """One long-lived extraction process, talked to over a pipe so it can be killed mid-job."""
+
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self) -> None:
+        # The pipe is left to the garbage collector: a timed-out caller's thread may still be polling it
+        self.process.kill()
+        self.process.join()
+
+
+class ExtractionPool:
+    """Fixed set of extraction workers; a worker that times out or dies is killed and replaced.
+
+    A ProcessPoolExecutor cannot stop a call that has started, so a hung OCC
+    read would hold its worker for good and starve later batches.
+    """
+
+    def __init__(self, size: int):
+        # spawn: OpenCascade state is not fork-safe
+        self._ctx = multiprocessing.get_context("spawn")
+        self._size = size
+        self._workers: List[ExtractionWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+
+    async def _acquire(self) -> ExtractionWorker:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        if self._idle.empty() and len(self._workers) < self._size:
+            worker = ExtractionWorker(self._ctx)
+            self._workers.append(worker)
+            return worker
+        return await self._idle.get()
+
+    def _replace(self, worker: ExtractionWorker) -> None:
+        worker.stop()
+        self._workers.remove(worker)
+        fresh = ExtractionWorker(self._ctx)
+        self._workers.append(fresh)
+        self._idle.put_nowait(fresh)
+
+    async def run(self, file_path: str, format: str, timeout: float, deadline: float) -> Dict[str, Any]:
+        """Extract one file. ``timeout`` counts from when a worker takes the file;
+        ``deadline`` (event loop time) bounds the wait for a worker as well.
+        Raises asyncio.TimeoutError when either runs out.
+        """
+        loop = asyncio.get_running_loop()
+        worker = await asyncio.wait_for(self._acquire(), timeout=max(deadline - loop.time(), 0.0))
+        outcome = None
+        try:
+            budget = min(timeout, deadline - loop.time())
+            outcome = await asyncio.to_thread(_exchange, worker.conn, file_path, format, budget)
+        except EOFError:
+            raise RuntimeError("worker process exited") from None
+        finally:
+            # Killing the worker also stops a job that outlived its timeout or whose caller went away
+            if outcome is None:
+                self._replace(worker)
+            else:
+                self._idle.put_nowait(worker)
+        if outcome is None:
+            raise asyncio.TimeoutError()
+        return outcome
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.stop()
+        self._workers.clear()
+
+
+def get_pool() -> ExtractionPool:
+    global _pool
+    if _pool is None:
+        _pool = ExtractionPool(BATCH_WORKERS)
+    return _pool
+
+
+@app.on_event("shutdown")
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def detect_format(filename: Optional[str], format: Optional[str] = None) -> str:
+    if format is None:
+        format = filename.split('.')[-1].lower() if filename else 'step'
+    return format
+
+
+async def spool_upload(file: UploadFile, suffix: str) -> Tuple[str, int]:
+    """Copy an upload to a temp file in chunks; returns (path, size in bytes)."""
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            tmp.write(chunk)
+            size += len(chunk)
+    return tmp.name, size
+
+
+def remove_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
 @app.get("/")
 def root():
     return {"service": "CAD Feature Extractor", "version": "1.0.0", "opencascade": HAS_OCP}
@@ -153,17 +416,13 @@ async def extract_features(
     """
     
     # Determine format
-    if format is None:
-        format = file.filename.split('.')[-1].lower() if file.filename else 'step'
+    format = detect_format(file.filename, format)
     
-    if format not in ['step', 'stp', 'iges', 'igs']:
+    if format not in SUPPORTED_FORMATS:
         raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
     
     # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{format}') as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
+    tmp_path, size_bytes = await spool_upload(file, f'.{format}')
     
     try:
         # Extract features
@@ -177,13 +436,14 @@ async def extract_features(
         
         # Add metadata
         features['file_name'] = file.filename
-        features['file_size_bytes'] = len(content)
+        features['file_size_bytes'] = size_bytes
         features['format'] = format
         
         return JSONResponse(content={
             "success": True,
             "features": features,
-            "feature_vector": list(features.values()),  # For direct ML input
+            "feature_vector": [features[key] for key in FEATURE_VECTOR_KEYS],  # For direct ML input
+            "feature_vector_version": FEATURE_VECTOR_VERSION,
         })
         
     except Exception as e:
@@ -196,24 +456,79 @@ async def extract_features(
 
 
 @app.post("/batch-extract")
-async def batch_extract(files: List[UploadFile] = File(...)):
-    """Extract features from multiple CAD files"""
-    results = []
-    
-    for file in files:
+async def batch_extract(
+    files: List[UploadFile] = File(...),
+    stream: bool = False,
+    accept: Optional[str] = Header(None),
+):
+    """Extract features from multiple CAD files in parallel.
+
+    Each upload is spooled to disk and handed to a pool of extraction workers
+    sized to the cores as soon as it is written. Returns
+    ``{"batch_results": [...]}`` in upload order; with ``stream=true`` or
+    ``Accept: application/x-ndjson`` results are streamed as NDJSON lines in
+    completion order, followed by a summary line. Each file is bounded by
+    BATCH_EXTRACT_TIMEOUT_S from the moment a worker picks it up, and the whole
+    batch, queueing included, by BATCH_EXTRACT_DEADLINE_S.
+    """
+    pool = get_pool()
+    deadline = asyncio.get_running_loop().time() + BATCH_DEADLINE_S
+
+    async def run(filename, tmp_path, size_bytes, format) -> Dict[str, Any]:
         try:
-            result = await extract_features(file)
-            results.append({
-                "file": file.filename,
-                "features": result['features']
-            })
+            outcome = await pool.run(tmp_path, format, BATCH_FILE_TIMEOUT_S, deadline)
+        except asyncio.TimeoutError:
+            outcome = {"error": "Timed out waiting for extraction"}
         except Exception as e:
-            results.append({
-                "file": file.filename,
-                "error": str(e)
-            })
-    
-    return {"batch_results": results}
+            outcome = {"error": f"Feature extraction failed: {str(e)}"}
+        finally:
+            remove_quietly(tmp_path)
+        if "error" in outcome:
+            return {"file": filename, "error": outcome["error"]}
+        features = outcome["features"]
+        features['file_name'] = filename
+        features['file_size_bytes'] = size_bytes
+        features['format'] = format
+        return {"file": filename, "features": features}
+
+    async def unsupported(filename, format) -> Dict[str, Any]:
+        return {"file": filename, "error": f"Unsupported format: {format}"}
+
+    tasks = []
+    try:
+        for file in files:
+            format = detect_format(file.filename)
+            if format not in SUPPORTED_FORMATS:
+                tasks.append(asyncio.ensure_future(unsupported(file.filename, format)))
+                continue
+            tmp_path, size_bytes = await spool_upload(file, f'.{format}')
+            tasks.append(asyncio.ensure_future(run(file.filename, tmp_path, size_bytes, format)))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if not (stream or NDJSON_MEDIA_TYPE in (accept or "")):
+        try:
+            return {"batch_results": await asyncio.gather(*tasks)}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def ndjson():
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                failed += "error" in result
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"done": True, "count": len(tasks), "failed": failed}) + "\n"
+        finally:
+            # Client went away: stop running work and drop temp files
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson(), media_type=NDJSON_MEDIA_TYPE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+"""Tests for the batched triangle BVH (app/extractors/bvh.py)."""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+np = pytest.importorskip("numpy")
+
+from app.extractors.bvh import TriangleBVH  # noqa: E402
+from app.extractors.min_wall import face_thickness_map  # noqa: E402
+
+
+def brute_force(triangles, origins, directions):
+    """Nearest two-sided hit per ray by testing every triangle."""
+    dist = np.full(len(origins), np.inf)
+    index = np.full(len(origins), -1)
+    for r, (o, d) in enumerate(zip(origins, directions)):
+        for i, (a, b, c) in enumerate(triangles):
+            e1, e2 = b - a, c - a
+            p = np.cross(d, e2)
+            det = e1 @ p
+            if abs(det) < 1e-12:
+                continue
+            s = o - a
+            u = (s @ p) / det
+            q = np.cross(s, e1)
+            v = (d @ q) / det
+            t = (e2 @ q) / det
+            if u >= 0 and v >= 0 and u + v <= 1 and 1e-9 < t < dist[r]:
+                dist[r], index[r] = t, i
+    return dist, index
+
+
+def random_triangles(rng, n):
+    centers = rng.uniform(-10, 10, size=(n, 1, 3))
+    return centers + rng.uniform(-1.5, 1.5, size=(n, 3, 3))
+
+
+@pytest.mark.parametrize("leaf_size", [1, 4, 8, 64])
+def test_matches_brute_force(leaf_size):
+    rng = np.random.default_rng(7)
+    triangles = random_triangles(rng, 120)
+    origins = rng.uniform(-12, 12, size=(200, 3))
+    directions = rng.normal(size=(200, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+
+    dist, tri = TriangleBVH(triangles, leaf_size=leaf_size).intersects_first(origins, directions)
+    expected_dist, _ = brute_force(triangles, origins, directions)
+
+    np.testing.assert_allclose(dist, expected_dist, rtol=1e-9, atol=1e-9)
+    hit = np.isfinite(expected_dist)
+    assert hit.any()
+    np.testing.assert_array_equal(tri[~hit], -1)
+    # Triangles can tie on distance, so check the reported triangle is hit at that distance
+    for r in np.flatnonzero(hit):
+        own, _ = brute_force(triangles[tri[r]:tri[r] + 1], origins[r:r + 1], directions[r:r + 1])
+        assert own[0] == pytest.approx(expected_dist[r])
+
+
+def test_slab_between_two_planes():
+    # Two parallel squares 2 mm apart, each split into two triangles
+    square = np.array([[[0, 0, 0], [10, 0, 0], [10, 10, 0]], [[0, 0, 0], [10, 10, 0], [0, 10, 0]]], dtype=float)
+    top = square + np.array([0, 0, 2.0])
+    bvh = TriangleBVH(np.concatenate([square, top]), leaf_size=1)
+    origins = np.array([[5, 2, 0.0], [5, 2, 0.0], [20, 20, 1.0]])
+    directions = np.array([[0, 0, 1.0], [0, 0, -1.0], [0, 0, 1.0]])
+    dist, tri = bvh.intersects_first(origins, directions)
+    # A ray starting on a surface does not hit that surface itself
+    assert dist[0] == pytest.approx(2.0)
+    assert tri[0] in (2, 3)
+    assert np.isinf(dist[1]) and tri[1] == -1
+    assert np.isinf(dist[2]) and tri[2] == -1
+
+
+def test_axis_parallel_rays():
+    triangle = np.array([[[0, 0, 5], [4, 0, 5], [0, 4, 5]]], dtype=float)
+    bvh = TriangleBVH(triangle)
+    dist, tri = bvh.intersects_first(np.array([[1.0, 1.0, 0.0]]), np.array([[0.0, 0.0, 1.0]]))
+    assert dist[0] == pytest.approx(5.0)
+    assert tri[0] == 0
+
+
+def test_empty_mesh_misses_everything():
+    bvh = TriangleBVH(np.zeros((0, 3, 3)))
+    dist, tri = bvh.intersects_first(np.zeros((3, 3)), np.tile([0.0, 0.0, 1.0], (3, 1)))
+    assert np.isinf(dist).all()
+    assert (tri == -1).all()
+
+
+def test_more_rays_than_one_batch(monkeypatch):
+    import app.extractors.bvh as bvh_module
+
+    monkeypatch.setattr(bvh_module, "RAY_BATCH", 16)
+    triangle = np.array([[[-1, -1, 3], [1, -1, 3], [0, 1, 3]]], dtype=float)
+    origins = np.zeros((50, 3))
+    directions = np.tile([0.0, 0.0, 1.0], (50, 1))
+    dist, tri = TriangleBVH(triangle).intersects_first(origins, directions)
+    np.testing.assert_allclose(dist, 3.0)
+    assert (tri == 0).all()
+
+
+def box_mesh(size, degenerate):
+    """Closed box triangles with outward normals, followed by ``degenerate`` zero-area triangles."""
+    corners = np.array([[x, y, z] for x in (0, size) for y in (0, size) for z in (0, size)], dtype=float)
+    quads = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    triangles = [corners[[a, b, c]] for a, b, c, d in quads] + [corners[[a, c, d]] for a, b, c, d in quads]
+    triangles = np.array(triangles + [np.tile(corners[0], (3, 1))] * degenerate)
+    cross = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    area = np.linalg.norm(cross, axis=1) / 2
+    normals = np.zeros_like(cross)
+    normals[area > 0] = cross[area > 0] / (2 * area[area > 0, None])
+    outward = np.sign(np.einsum("ij,ij->i", normals, triangles.mean(axis=1) - size / 2))
+    normals *= np.where(outward == 0, 1.0, outward)[:, None]
+    return SimpleNamespace(
+        triangles=triangles, faces=np.arange(triangles.shape[0] * 3).reshape(-1, 3),
+        face_normals=normals, area_faces=area,
+    )
+
+
+def test_thickness_sampling_skips_degenerate_faces():
+    # More faces than samples, but fewer non-degenerate faces than samples
+    mesh = box_mesh(10.0, degenerate=30)
+    thickness = face_thickness_map(mesh, samples=20, threshold_mm=1.5)
+    np.testing.assert_allclose(thickness[:12], 10.0)
+    assert np.isnan(thickness[12:]).all()
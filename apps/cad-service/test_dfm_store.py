@@ -0,0 +1,99 @@
+"""Tests for the persistent DFM task store (app/dfm_store.py)."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import dfm_store  # noqa: E402
+from app.dfm_store import (  # noqa: E402
+    DFMTaskStore,
+    SQLiteDFMTaskStore,
+    create_dfm_store,
+    pack_result,
+    unpack_result,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteDFMTaskStore(str(tmp_path / "dfm.sqlite3"))
+
+
+def test_pack_result_round_trip():
+    small = '{"status":"Succeeded"}'
+    large = '{"checks":[' + ",".join('{"id":"c%d"}' % i for i in range(200)) + "]}"
+    assert pack_result(small)[:1] == b"j"
+    assert pack_result(large)[:1] == b"z"
+    assert len(pack_result(large)) < len(large)
+    assert unpack_result(pack_result(small)) == small
+    assert unpack_result(pack_result(large)) == large
+    assert unpack_result(None) is None
+
+
+def test_task_lifecycle(store):
+    store.create_task("t1", {"file_id": "part.step", "material": "aluminum"})
+    task = store.get_task("t1")
+    assert task["status"] == "Queued"
+    assert task["request"] == {"file_id": "part.step", "material": "aluminum"}
+    assert store.get_result("t1") is None
+
+    store.set_status("t1", "Processing")
+    assert store.get_task("t1")["status"] == "Processing"
+
+    store.set_result("t1", "Succeeded", '{"status":"Succeeded"}')
+    assert store.get_task("t1")["status"] == "Succeeded"
+    assert store.get_result("t1") == '{"status":"Succeeded"}'
+
+
+def test_unknown_task(store):
+    assert store.get_task("nope") is None
+    assert store.get_result("nope") is None
+    assert store.get_many(["nope"]) == {}
+    assert store.get_many([]) == {}
+
+
+def test_get_many_beyond_sqlite_parameter_limit(store):
+    ids = [f"task-{i}" for i in range(2500)]
+    for task_id in ids[::2]:
+        store.create_task(task_id, {})
+    store.set_result("task-0", "Succeeded", '{"ok":true}')
+
+    found = store.get_many(ids + ids[:10])
+    assert set(found) == set(ids[::2])
+    assert found["task-0"] == {"status": "Succeeded", "result": '{"ok":true}'}
+    assert found["task-2"] == {"status": "Queued", "result": None}
+
+
+def test_expired_tasks_are_hidden(tmp_path, monkeypatch):
+    store = SQLiteDFMTaskStore(str(tmp_path / "ttl.sqlite3"), ttl_seconds=60)
+    now = 1_000_000.0
+    monkeypatch.setattr(dfm_store.time, "time", lambda: now)
+    store.create_task("old", {})
+    now += 120
+    assert store.get_task("old") is None
+    assert store.get_many(["old"]) == {}
+
+
+def test_rows_are_pruned_to_max_rows(tmp_path, monkeypatch):
+    store = SQLiteDFMTaskStore(str(tmp_path / "rows.sqlite3"), max_rows=3)
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(dfm_store.time, "time", lambda: float(next(clock)))
+    for i in range(6):
+        store.create_task(f"t{i}", {})
+    # Pruning runs before each insert, so the newest max_rows survive plus the one just added
+    remaining = store.get_many([f"t{i}" for i in range(6)])
+    assert set(remaining) == {"t2", "t3", "t4", "t5"}
+
+
+def test_create_dfm_store_by_url(tmp_path):
+    assert isinstance(create_dfm_store(f"sqlite://{tmp_path}/x.sqlite3"), SQLiteDFMTaskStore)
+    with pytest.raises(ValueError):
+        create_dfm_store("postgres://db/dfm")
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        DFMTaskStore()
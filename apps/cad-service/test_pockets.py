@@ -0,0 +1,99 @@
+"""Tests for planar pocket detection (app/extractors/pockets.py) on hand-built topology."""
+
+import itertools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+np = pytest.importorskip("numpy")
+
+from app.dfm_analyzer import PartGeometry, compile_rules  # noqa: E402
+from app.extractors.pockets import extract_pockets_from_shape  # noqa: E402
+from app.extractors.topology import SURFACE_PLANE, ShapeIndex, _to_csr  # noqa: E402
+
+
+def planar_index(faces, adjacency):
+    """ShapeIndex over axis-aligned rectangles given as (outward normal, vertices, reversed)."""
+    n = len(faces)
+    plane_normal = np.zeros((n, 3))
+    face_sign = np.ones(n)
+    plane_origin = np.zeros((n, 3))
+    for i, (normal, vertices, reversed_) in enumerate(faces):
+        # A reversed face stores the opposite surface normal, as OCC does
+        face_sign[i] = -1.0 if reversed_ else 1.0
+        plane_normal[i] = np.asarray(normal, dtype=float) * face_sign[i]
+        plane_origin[i] = vertices[0]
+    pairs = [(a, b) for a, b in adjacency] + [(b, a) for a, b in adjacency]
+    adj_offsets, adj_indices = _to_csr(pairs, n)
+    index = ShapeIndex(
+        [None] * n,
+        np.full(n, SURFACE_PLANE, dtype=np.int8),
+        plane_origin,
+        plane_normal,
+        face_sign,
+        np.zeros(n),
+        np.zeros((n, 3)),
+        np.zeros((n, 3)),
+        adj_offsets,
+        adj_indices,
+    )
+    for i, (_, vertices, _) in enumerate(faces):
+        vertices = np.asarray(vertices, dtype=float)
+        index._vertices[i] = vertices
+        spans = np.ptp(vertices, axis=0)
+        index._areas[i] = float(np.prod(spans[spans > 0]))
+    return index
+
+
+def box_faces(lo, hi, outward=1.0):
+    """Six rectangles of the box [lo, hi]; ``outward=-1`` gives the walls of a cavity."""
+    lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+    faces = []
+    for axis, side in itertools.product(range(3), (0, 1)):
+        normal = np.zeros(3)
+        normal[axis] = (1.0 if side else -1.0) * outward
+        corners = [c for c in itertools.product(*zip(lo, hi)) if c[axis] == (hi if side else lo)[axis]]
+        faces.append((normal, corners, (axis + side) % 2 == 1))
+    return faces
+
+
+def box_adjacency(offset=0):
+    # Faces 2k and 2k+1 are opposite; every other pair shares an edge
+    return [(offset + a, offset + b) for a, b in itertools.combinations(range(6), 2) if a // 2 != b // 2]
+
+
+def test_plain_bar_has_no_pockets():
+    index = planar_index(box_faces([0, 0, 0], [10, 10, 50]), box_adjacency())
+    assert extract_pockets_from_shape(None, index) == []
+
+
+def test_plain_bar_has_no_pocket_warning():
+    geom = PartGeometry("bar.step", file_name="bar.step")
+    geom._values.update(shape=None, index=planar_index(box_faces([0, 0, 0], [10, 10, 50]), box_adjacency()))
+    rule = next(r for r in compile_rules("aluminum", "cnc_milling") if r.id == "pocket_depth_ratio")
+    assert rule.fn(geom) is None
+
+
+def test_open_pocket_depth():
+    # Top opening of a 10 x 10 x 8 cavity is missing, so faces 0-3 are the walls and 4 the floor
+    cavity = box_faces([15, 15, 12], [25, 25, 20], outward=-1.0)
+    faces = cavity[:5]
+    adjacency = [(a, b) for a, b in box_adjacency() if a < 5 and b < 5]
+    pockets = extract_pockets_from_shape(None, planar_index(faces, adjacency))
+    floor = next(p for p in pockets if p.planar_face_ids == [5])
+    assert floor.depth_mm == pytest.approx(8.0)
+    assert floor.mouth_area_mm2 == pytest.approx(100.0)
+    assert floor.aspect_ratio == pytest.approx(0.8)
+
+
+def test_boss_base_is_not_a_pocket():
+    # 40 x 40 plate top (z=10) with a 10 x 10 x 5 boss standing on it
+    top = ([0, 0, 1], [(0, 0, 10), (40, 0, 10), (40, 40, 10), (0, 40, 10)], False)
+    boss = box_faces([15, 15, 10], [25, 25, 15])[:4]
+    faces = [top] + boss
+    adjacency = [(0, k) for k in range(1, 5)] + [(1 + a, 1 + b) for a, b in box_adjacency() if a < 4 and b < 4]
+    pockets = extract_pockets_from_shape(None, planar_index(faces, adjacency))
+    assert all(p.planar_face_ids != [1] for p in pockets)
@@ -0,0 +1,58 @@
+"""Tests for the disk-backed result store (app/utils/result_cache.py)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import result_cache  # noqa: E402
+from app.utils.result_cache import DiskResultStore  # noqa: E402
+
+
+def disk_usage(root):
+    return sum(entry.stat().st_size for entry in os.scandir(root) if not entry.name.startswith("."))
+
+
+def test_put_get_delete(tmp_path):
+    store = DiskResultStore(tmp_path)
+    store.put_json("analysis-1", {"volume": 1.5})
+    assert store.get_json("analysis-1") == {"volume": 1.5}
+    assert store.exists("analysis-1")
+    store.delete("analysis-1")
+    assert store.get("analysis-1") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    store = DiskResultStore(tmp_path, max_bytes=1000)
+    store.put("a", b"x" * 400)
+    store.put("b", b"x" * 400)
+    os.utime(tmp_path / "a", (1, 1))
+    os.utime(tmp_path / "b", (2, 2))
+    store.get("a")  # touch: b is now the oldest
+    store.put("c", b"x" * 400)
+    assert store.exists("a") and store.exists("c")
+    assert not store.exists("b")
+
+
+def test_budget_holds_across_processes_sharing_the_directory(tmp_path, monkeypatch):
+    # Two stores on one directory stand in for two workers; neither sees the other's writes
+    monkeypatch.setattr(result_cache, "DISK_RESCAN_S", 0.0)
+    first = DiskResultStore(tmp_path, max_bytes=1000)
+    second = DiskResultStore(tmp_path, max_bytes=1000)
+    for i in range(10):
+        (first if i % 2 else second).put(f"k{i}", b"x" * 300)
+        assert disk_usage(tmp_path) <= 1000
+
+
+def test_rescans_after_interval(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: clock[0])
+    first = DiskResultStore(tmp_path, max_bytes=1000)
+    second = DiskResultStore(tmp_path, max_bytes=1000)
+    first.put("a", b"x" * 300)
+    second.put("b", b"x" * 300)
+    first.put("c", b"x" * 300)
+    # first's own estimate (600) is under budget, but the directory holds 900 + 300
+    clock[0] += result_cache.DISK_RESCAN_S
+    first.put("d", b"x" * 300)
+    assert disk_usage(tmp_path) <= 1000
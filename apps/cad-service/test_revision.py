@@ -0,0 +1,106 @@
+"""Tests for revision fingerprint lookup and diffing (app/extractors/revision.py)."""
+
+import math
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+np = pytest.importorskip("numpy")
+
+from app.extractors import revision  # noqa: E402
+from app.extractors.topology import hash_rows  # noqa: E402
+from app.models import HoleFeature, HoleTable, PocketTable  # noqa: E402
+
+
+def keys(*values):
+    return np.array(values, dtype=np.uint64)
+
+
+def test_lookup_finds_positions_and_misses():
+    pos = revision._lookup(keys(9, 5, 7, 1), keys(5, 1, 9))
+    np.testing.assert_array_equal(pos, [2, 0, -1, 1])
+
+
+def test_lookup_treats_duplicate_keys_as_ambiguous():
+    # 3 appears twice in the table, so it cannot identify a single face
+    pos = revision._lookup(keys(3, 9, 5), keys(5, 3, 9, 3))
+    np.testing.assert_array_equal(pos, [-1, 2, 0])
+
+
+def test_lookup_empty_inputs():
+    np.testing.assert_array_equal(revision._lookup(keys(1, 2), keys()), [-1, -1])
+    assert revision._lookup(keys(), keys(1, 2)).shape == (0,)
+
+
+def test_lookup_large_keys():
+    big = np.iinfo(np.uint64).max
+    pos = revision._lookup(keys(big, big - 1), keys(0, big - 1, big))
+    np.testing.assert_array_equal(pos, [2, 1])
+
+
+def test_hash_rows_is_deterministic():
+    rows = np.array([[1, 2, 3], [3, 2, 1], [1, 2, 3]], dtype=np.int64)
+    h = hash_rows(rows)
+    assert h.dtype == np.uint64
+    assert h[0] == h[2]
+    assert h[0] != h[1]
+    np.testing.assert_array_equal(hash_rows(rows.copy()), h)
+
+
+def test_mesh_fingerprints_ignore_vertex_order():
+    a, b, c = [0.0, 0.0, 0.0], [3.0, 0.0, 0.0], [0.0, 3.0, 0.0]
+    triangles = np.array([[a, b, c], [b, c, a], [a, c, b], [a, b, [0.0, 0.0, 3.0]]])
+    fps, centroids, radii = revision.mesh_fingerprints(SimpleNamespace(triangles=triangles))
+    assert fps[0] == fps[1] == fps[2]
+    assert fps[3] != fps[0]
+    np.testing.assert_allclose(centroids[0], [1.0, 1.0, 0.0])
+    assert radii[0] == pytest.approx(math.sqrt(5.0))
+
+
+def test_mesh_fingerprints_tolerate_float_noise():
+    triangle = np.array([[[0.0, 0.0, 0.0], [3.0, 0.0, 0.0], [0.0, 3.0, 0.0]]])
+    noisy = triangle + 1e-9
+    fps, _, _ = revision.mesh_fingerprints(SimpleNamespace(triangles=triangle))
+    noisy_fps, _, _ = revision.mesh_fingerprints(SimpleNamespace(triangles=noisy))
+    assert fps[0] == noisy_fps[0]
+
+
+def test_revision_diff_mesh():
+    base = revision.mesh_state(keys(1, 2, 3), np.zeros((3, 3)), np.zeros(3), np.array([1.0, np.nan, 2.0]))
+    current = revision.mesh_state(keys(2, 3, 4, 5), np.zeros((4, 3)), np.zeros(4), None)
+    diff = revision.revision_diff(base, current)
+    assert diff["faces"] == {"added": 2, "removed": 1, "unchanged": 2}
+    assert diff["min_wall"] == {"before_mm": 1.0, "after_mm": None}
+    assert "holes" not in diff
+
+
+def hole(face_id, diameter):
+    return HoleFeature(id="", type="through", diameter_mm=diameter, depth_mm=10.0, axis=(0.0, 0.0, 1.0),
+                       face_id=face_id)
+
+
+def brep_state(fps, hole_keys, holes):
+    return {
+        "kind": revision.STATE_KIND_BREP,
+        "fingerprints": keys(*fps),
+        "holes": {"keys": keys(*hole_keys), **HoleTable.from_features(holes).columns()},
+        "pockets": {"keys": keys(), **PocketTable.from_features([]).columns()},
+    }
+
+
+def test_revision_diff_brep_features():
+    base = brep_state([1, 2, 3], [10, 20], [hole(1, 6.0), hole(2, 4.0)])
+    current = brep_state([2, 3, 4], [20, 30], [hole(1, 4.0), hole(3, 8.0)])
+    diff = revision.revision_diff(base, current)
+    assert diff["faces"] == {"added": 1, "removed": 1, "unchanged": 2}
+    assert diff["holes"]["unchanged"] == 1
+    assert diff["holes"]["added"] == [
+        {"id": "H-002", "face_id": 3, "diameter_mm": 8.0, "depth_mm": 10.0, "through": True}
+    ]
+    assert [h["diameter_mm"] for h in diff["holes"]["removed"]] == [6.0]
+    assert diff["pockets"] == {"added": [], "removed": [], "unchanged": 0}
+    assert "min_wall" not in diff
@@ -0,0 +1,118 @@
+"""Tests for Celery queue, priority and memory routing (app/workers/routing.py)."""
+
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.workers import routing  # noqa: E402
+from app.workers.routing import (  # noqa: E402
+    BASE_PROCESS_BYTES,
+    BREP_BYTES_PER_FILE_BYTE,
+    MESH_BYTES_PER_TRIANGLE,
+    PRIORITY_STEPS,
+    QUEUE_MESH,
+    QUEUE_OCC,
+    QUEUE_OCC_LARGE,
+    WORKLOADS,
+    MemoryBudgetExceeded,
+)
+
+MB = 1024 * 1024
+
+
+def write_binary_stl(path, triangles):
+    with open(path, "wb") as fh:
+        fh.write(b"\0" * 80)
+        fh.write(struct.pack("<I", triangles))
+        fh.write(b"\0" * 50 * triangles)
+    return str(path)
+
+
+def test_source_extension():
+    assert routing.source_extension("/tmp/Part.STEP", None) == ".step"
+    assert routing.source_extension(None, "https://cdn.example.com/a/b.stl?sig=1") == ".stl"
+    assert routing.source_extension(None, None) == ""
+
+
+def test_size_priority_orders_small_files_first():
+    assert routing.size_priority(None) == PRIORITY_STEPS // 2
+    assert routing.size_priority(0) == 0
+    assert routing.size_priority(256 * 1024 - 1) == 0
+    assert routing.size_priority(256 * 1024) == 1
+    assert routing.size_priority(10 * 1024**4) == PRIORITY_STEPS - 1
+    sizes = [1, 300 * 1024, 2 * MB, 40 * MB, 900 * MB]
+    priorities = [routing.size_priority(s) for s in sizes]
+    assert priorities == sorted(priorities)
+
+
+def test_stl_triangle_count(tmp_path):
+    assert routing.stl_triangle_count(write_binary_stl(tmp_path / "a.stl", 12)) == 12
+    # ASCII STL: the header bytes are not a count
+    ascii_path = tmp_path / "b.stl"
+    ascii_path.write_text("solid part\n" + "facet normal 0 0 1\n" * 20 + "endsolid part\n")
+    assert routing.stl_triangle_count(str(ascii_path)) is None
+    assert routing.stl_triangle_count(str(tmp_path / "missing.stl")) is None
+    assert routing.stl_triangle_count(None) is None
+
+
+def test_estimate_memory(tmp_path):
+    stl = write_binary_stl(tmp_path / "part.stl", 1000)
+    assert routing.estimate_memory_bytes(stl, None) == BASE_PROCESS_BYTES + 1000 * MESH_BYTES_PER_TRIANGLE
+    # Remote mesh of known size: binary STL record size
+    assert routing.estimate_memory_bytes(None, "https://x/p.stl", size_bytes=5000) == (
+        BASE_PROCESS_BYTES + 100 * MESH_BYTES_PER_TRIANGLE
+    )
+    assert routing.estimate_memory_bytes(None, "https://x/p.step", size_bytes=MB) == (
+        BASE_PROCESS_BYTES + MB * BREP_BYTES_PER_FILE_BYTE
+    )
+    assert routing.estimate_memory_bytes(None, "https://x/p.step") is None
+
+
+def test_workload_by_type_and_size():
+    assert routing.workload_for_source(None, "https://x/p.stl", size_bytes=MB) == "mesh"
+    assert routing.workload_for_source(None, "https://x/p.step", size_bytes=MB) == "occ"
+    assert routing.workload_for_source(None, "https://x/p.step") == "occ"
+    large = routing.LARGE_FILE_BYTES
+    assert routing.workload_for_source(None, "https://x/p.step", size_bytes=large) == "occ-large"
+
+
+def test_workload_escalates_on_memory_budget():
+    budget = WORKLOADS["mesh"].memory_budget
+    triangles = (budget - BASE_PROCESS_BYTES) // MESH_BYTES_PER_TRIANGLE + 1
+    assert routing.workload_for_source(None, "https://x/p.stl", face_count=triangles) == "occ-large"
+    assert routing.workload_for_source(None, "https://x/p.stl", face_count=triangles - 2) == "mesh"
+
+
+def test_workload_rejects_files_over_every_budget():
+    largest = WORKLOADS["occ-large"].memory_budget
+    triangles = (largest - BASE_PROCESS_BYTES) // MESH_BYTES_PER_TRIANGLE + 1
+    with pytest.raises(MemoryBudgetExceeded) as exc:
+        routing.workload_for_source(None, "https://x/p.stl", face_count=triangles)
+    assert exc.value.budget_bytes == largest
+    assert exc.value.estimate_bytes > largest
+
+
+def test_route_for_source():
+    route = routing.route_for_source(None, "https://x/p.step", size_bytes=3 * MB)
+    assert route == {
+        "queue": QUEUE_OCC,
+        "priority": routing.size_priority(3 * MB),
+        "soft_time_limit": WORKLOADS["occ"].soft_time_limit,
+        "time_limit": WORKLOADS["occ"].time_limit,
+    }
+    assert routing.route_for_source(None, "https://x/p.stl", size_bytes=MB)["queue"] == QUEUE_MESH
+    big = routing.route_for_source(None, "https://x/p.step", size_bytes=routing.LARGE_FILE_BYTES)
+    assert big["queue"] == QUEUE_OCC_LARGE
+
+
+def test_worker_argv():
+    argv = routing.worker_argv("occ-large")
+    workload = WORKLOADS["occ-large"]
+    assert argv[0] == "worker"
+    assert argv[argv.index("-Q") + 1] == QUEUE_OCC_LARGE
+    assert argv[argv.index("-c") + 1] == str(workload.concurrency)
+    assert argv[argv.index("--max-memory-per-child") + 1] == str(workload.memory_budget // 1024)
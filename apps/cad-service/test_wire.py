@@ -0,0 +1,90 @@
+"""Round-trip tests for the result wire format (app/utils/wire.py)."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("fastapi")
+
+from app.utils import wire  # noqa: E402
+
+
+def step_metrics():
+    """Metrics shaped like a STEP analysis: scalars plus columnar feature tables."""
+    return {
+        "volume": 12.5,
+        "surface_area": 40.0,
+        "bbox": {"min": {"x": 0.0, "y": 0.0, "z": 0.0}, "max": {"x": 10.0, "y": 20.0, "z": 5.0}},
+        "thickness": None,
+        "primitive_features": {"holes": 2, "pockets": 1},
+        "features": {
+            "holes": {
+                "diameter_mm": np.array([6.0, 3.5], dtype=np.float32),
+                "depth_mm": np.array([10.0, 4.0], dtype=np.float32),
+                "axis": np.array([[0, 0, 1], [1, 0, 0]], dtype=np.float32),
+                "through": np.array([True, False]),
+                "entry_face_id": np.array([3, 7], dtype=np.int32),
+                "exit_face_id": np.array([4, 0], dtype=np.int32),
+                "face_id": np.array([5, 8], dtype=np.int32),
+            },
+            "pockets": {"depth_mm": np.array([2.5], dtype=np.float32)},
+        },
+        "material_usage": None,
+    }
+
+
+def assert_same(actual, expected):
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected)
+        for key in expected:
+            assert_same(actual[key], expected[key])
+    elif isinstance(expected, np.ndarray):
+        np.testing.assert_array_equal(np.asarray(actual), expected)
+    else:
+        assert actual == expected
+
+
+def test_to_jsonable_converts_arrays_and_scalars():
+    out = wire.to_jsonable({"a": np.arange(3, dtype=np.int32), "b": np.float32(1.5), "c": (1, 2)})
+    assert out == {"a": [0, 1, 2], "b": 1.5, "c": [1, 2]}
+    assert type(out["b"]) is float
+
+
+def test_blob_round_trip():
+    metrics = step_metrics()
+    assert_same(wire.decode_blob(wire.encode_blob(metrics)), metrics)
+
+
+def test_decode_blob_rejects_unknown_tags():
+    assert wire.decode_blob(None) is None
+    assert wire.decode_blob(b"") is None
+    assert wire.decode_blob(b"x{}") is None
+
+
+@pytest.mark.skipif(not wire.HAS_MSGPACK, reason="msgpack not installed")
+def test_msgpack_keeps_dtype_and_shape():
+    axis = np.arange(6, dtype=np.float32).reshape(2, 3)
+    out = wire.unpackb(wire.packb({"axis": axis}))["axis"]
+    assert out.dtype == np.float32
+    assert out.shape == (2, 3)
+    np.testing.assert_array_equal(out, axis)
+
+
+def test_chord_arguments_round_trip_through_task_serializer():
+    # Batch part results (STEP metrics included) reach aggregate_batch as task arguments
+    pytest.importorskip("celery")
+    from kombu.serialization import dumps, loads, prepare_accept_content
+
+    from app.workers.celery import celery_app
+
+    part = {"key": "sha256:abc|mm", "metrics": step_metrics()}
+    body = (([part], "batch-1", {"sha256:abc|mm": ["f1"]}), {}, {})
+    content_type, encoding, data = dumps(body, serializer=celery_app.conf.task_serializer)
+    # accept_content holds serializer names; loads() checks content types
+    accept = prepare_accept_content(celery_app.conf.accept_content)
+    args, _kwargs, _embed = loads(data, content_type, encoding, accept=accept)
+    assert_same(args[0][0]["metrics"], part["metrics"])